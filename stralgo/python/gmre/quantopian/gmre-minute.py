@@ -22,6 +22,14 @@
 # in for the coming month.
 #
 # This strategy processes MINUTE data to calculate rotation.
+#
+# Quantopian can't import gmrelib, so the parts of it this strategy uses
+# are inlined: RingBuffer (gmrelib.ringbuffer), PhaseProfiler
+# (gmrelib.profiling), OrderManager (gmrelib.orders), the daily bars of
+# the minutes (gmrelib.resample), the volatility estimators
+# (gmrelib.volatility) and the basket in listing order
+# (gmrelib.universe).  tests/test_quantopian.py checks them against
+# gmrelib.
 
 # ATTRIBUTION:
 # GMRE Strategy: Frank Grossman, 2013-08-09
@@ -32,8 +40,11 @@
 # Quantopian Author: David Quast, 2013-09-13
 # Quantopian Author: James Crocker, 2013-11-14 james@constantsc.net
 
+import bisect
 import math
+import numpy
 import pandas
+import time
 import pytz
 import datetime as dt
 from datetime import datetime, timedelta
@@ -76,6 +87,11 @@ def initialize(context):
         40513: sid(40513), # ZIV (VelocityShares Inverse VIX Medium-Term)
     }
     
+    # Basket ordered by listing date: the stocks listed before a date are
+    # a prefix found by bisect instead of checking every stock each bar
+    context.listed = sorted(context.basket.values(), key=lambda s: s.security_start_date)
+    context.listedDates = [s.security_start_date for s in context.listed]
+    
     # Set/Unset logging features for verbosity levels
     context.logWarn = False
     context.logBuy = False
@@ -87,11 +103,25 @@ def initialize(context):
     context.nextDate = None
     context.bars = None
     context.basketStockBest = None
-    context.basketPeriodOchlv = []
+    # Fixed symbol order of the lookback buffer
+    context.sids = sorted(context.basket.keys())
+    context.sidIndex = dict((sid, i) for i, sid in enumerate(context.sids))
+    # Daily OCHLV lookback (days x symbols x fields) of metricPeriod days
+    context.basketPeriodOchlv = RingBuffer(context.metricPeriod, (len(context.sids), len(OHLCV)))
     context.basketStocksActive = []
     context.p = {}; context.v = {} 
-    context.oidBuy = None
-    context.oidSell = None
+    context.orderManager = OrderManager(get_order)
+    
+    # Time the handle_data phases (PhaseProfiler), logged with the
+    # rotations. Functions are wrapped, the strategy is unchanged.
+    context.profilePhases = False
+    if context.profilePhases is True:
+        context.profiler = PhaseProfiler()
+        context.profiler.instrument(globals(), {'accumulateData': 'accumulate', 'basketPeriodOchlv': 'bars', 'getFiniteBars': 'bars',
+                                               'getBasketPeriodMetrics': 'metrics', 'getBestStock': 'ranking',
+                                               'sellPositions': 'orders', 'buyPositions': 'orders'})
+        context.orderManager.update = context.profiler.timed('orders', context.orderManager.update)
+        
     context.cashStart = None
     context.dateStart = None
     context.buyCount = 0
@@ -101,6 +131,116 @@ def initialize(context):
 
     
 def tree(): return defaultdict(tree)
+
+# Field order of the daily OCHLV rows
+OHLCV = ['open', 'close', 'high', 'low', 'volume']
+
+class RingBuffer(object):
+    # Preallocated ring buffer with O(1) push and zero-copy windows. Rows
+    # are written twice (slot i and i + capacity) so the last n rows are
+    # always one contiguous slice.
+    
+    def __init__(self, capacity, shape):
+        self.capacity = capacity
+        self.buffer = numpy.nan * numpy.ones((2 * capacity,) + shape)
+        self.count = 0
+        
+    def __len__(self):
+        return min(self.count, self.capacity)
+        
+    def push(self, row):
+        i = self.count % self.capacity
+        self.buffer[i] = row
+        self.buffer[i + self.capacity] = row
+        self.count += 1
+        
+    def window(self, n=None):
+        # View of the last n rows, oldest first
+        if n is None or n > len(self):
+            n = len(self)
+        end = self.count % self.capacity + self.capacity
+        return self.buffer[end - n:end]
+    
+class PhaseProfiler(object):
+    # Calls, time and a log2 histogram (<1us, <2us, <4us, ...) of the
+    # call times of every phase. Phases nest, times are inclusive.
+    
+    def __init__(self):
+        self.phases = {}
+        
+    def timed(self, phase, function):
+        stats = self.phases.setdefault(phase, [0, 0.0, []])
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                bucket = max(0, math.frexp(elapsed * 1e6)[1])
+                if bucket >= len(stats[2]):
+                    stats[2].extend([0] * (bucket + 1 - len(stats[2])))
+                stats[2][bucket] += 1
+        return wrapper
+    
+    def instrument(self, names, phases):
+        # Replaces the functions in names (globals()) with timed ones
+        for name, phase in phases.items():
+            names[name] = self.timed(phase, names[name])
+            
+    def report(self):
+        lines = []
+        for phase, (calls, total, buckets) in sorted(self.phases.items(), key=lambda p: -p[1][1]):
+            histogram = ' '.join('<%dus:%d' % (2 ** i, n) for i, n in enumerate(buckets) if n)
+            lines.append('PHASE %s CALLS %s TIME %.3fs %s' % (phase, calls, total, histogram))
+        return lines
+    
+class OrderManager(object):
+    # Tracks any number of open orders and calls back when they fill
+    # (filled == amount); update() checks them once per bar and then
+    # calls the callbacks of the groups whose orders have all filled.
+    
+    def __init__(self, getOrder):
+        self.getOrder = getOrder
+        self.open = {}
+        self.groups = []
+        
+    def submit(self, oid, onFilled=None):
+        # onFilled(oid, order, *args); None (no order placed) is ignored
+        if oid is not None:
+            self.open[oid] = onFilled
+        return oid
+        
+    def whenFilled(self, oids, callback):
+        # callback(*args) once every order of oids has filled
+        pending = set()
+        for oid in oids:
+            if oid is not None:
+                self.open.setdefault(oid, None)
+                pending.add(oid)
+        self.groups.append([pending, callback])
+        
+    def busy(self):
+        return len(self.open) > 0 or len(self.groups) > 0
+        
+    def update(self, *args):
+        filled = []
+        for oid in list(self.open):
+            o = self.getOrder(oid)
+            if o.filled == o.amount:
+                filled.append((oid, o, self.open.pop(oid)))
+        for oid, o, onFilled in filled:
+            if onFilled is not None:
+                onFilled(oid, o, *args)
+                
+        oids = set(f[0] for f in filled)
+        for group in self.groups:
+            group[0] -= oids
+        complete = [g for g in self.groups if not g[0]]
+        self.groups = [g for g in self.groups if g[0]]
+        for pending, callback in complete:
+            callback(*args)
     
 def getMinMax(arr):
     return min(arr.values()), max(arr.values())
@@ -112,128 +252,112 @@ def extendList(d1, d2):
         else:
             d1[s2].extend([d2[s2]])
             
+def firstFinite(values, reverse=False):
+    # First (or last) finite value of each row, NaN if none
+    finite = ~numpy.isnan(values)
+    if reverse:
+        i = values.shape[1] - 1 - finite[:, ::-1].argmax(axis=1)
+    else:
+        i = finite.argmax(axis=1)
+    return values[numpy.arange(len(values)), i]
+
 def getFiniteBars(context):
-    basket = context.basketStocksActive
+    # symbols x minutes arrays of the day plus the NaN count of each
+    # field (only counted when logWarn is on, they're only logged).
+    # NaN bars are skipped by the reductions in basketPeriodOchlv.
+    sids = [s.sid for s in context.basketStocksActive]
     bars = context.bars
-    finiteBars = tree()
     
-    for s in basket:
-        for item in bars:
-            finiteBars[item][s.sid] = [price for price in bars[item][s.sid] if not math.isnan(price)]
+    periodBars = {}; nanCounts = {}
+    for item in ['close_price', 'high', 'low', 'volume']:
+        periodBars[item] = numpy.asarray(bars[item][sids].values.T, dtype=float)
+        if context.logWarn is True:
+            nanCounts[item] = numpy.isnan(periodBars[item]).sum(axis=1)
             
-    if context.logWarn is True:
-        for s in basket:
-            for item in bars:
-                count = 0
-                for val in bars[item][s.sid]:
-                    if math.isnan(val):
-                        print('[%s] FOUND %s AT %s' % (s.sid, val, bars[item][s.sid].index[count]))
-                    count += 1
-            
-    return finiteBars
+    return sids, periodBars, nanCounts
         
 def basketPeriodOchlv(context):
+    # One day of OCHLV for the whole basket (symbols x fields), NaN for
+    # stocks that aren't active
     
-    basket = context.basketStocksActive
-    basketPeriodOchlv = tree()
+    sids, periodBars, nanCounts = getFiniteBars(context)
+    
+    # Reduce every symbol's minutes to the day in one pass
+    O = firstFinite(periodBars['close_price'])
+    C = firstFinite(periodBars['close_price'], reverse=True)
+    H = numpy.fmax.reduce(periodBars['high'], axis=1)
+    L = numpy.fmin.reduce(periodBars['low'], axis=1)
+    V = numpy.where(numpy.isnan(periodBars['volume']), 0.0, periodBars['volume']).sum(axis=1)
     
-    finiteBars = getFiniteBars(context)    
+    # Empty unless logWarn is on
+    for item in nanCounts:
+        for i in numpy.flatnonzero(nanCounts[item]):
+            log.warn('[%s] FOUND %s NaN %s' % (sids[i], nanCounts[item][i], item))
                 
-    for s in basket:
-        H = max(finiteBars['high'][s.sid])
-        L = min(finiteBars['low'][s.sid])
-        O = finiteBars['close_price'][s.sid][0]
-        C = finiteBars['close_price'][s.sid][-1]
-        V = sum(finiteBars['volume'][s.sid])
-
-        #print('[%s] O %s, C %s, H %s, L %s, V %s' % (s.sid, O, C, H, L, V))
-
-        #print bars
-        #prices = bars['close_price'][s.sid]
-        #O = prices[0]
-        #C = prices[-1]
-        #H = prices.max()
-        #L = prices.min()
-
-        basketPeriodOchlv[s.sid]['open'] = O
-        basketPeriodOchlv[s.sid]['close'] = C
-        basketPeriodOchlv[s.sid]['high'] = H
-        basketPeriodOchlv[s.sid]['low'] = L
-        basketPeriodOchlv[s.sid]['volume'] = V
+    basketPeriodOchlv = numpy.nan * numpy.ones((len(context.sids), len(OHLCV)))
+    rows = [context.sidIndex[sid] for sid in sids]
+    for i, values in enumerate([O, C, H, L, V]):
+        basketPeriodOchlv[rows, i] = values
     
     return basketPeriodOchlv
 
+# http://www.tsresearch.com/public/volatility/historical/
+# Daily volatility estimators over arrays of daily O, C, H, L prices.
+# Since 'daily' the 1/T (4^T for Parkinson) is skipped.
+
+def rsVolatility(O, C, H, L):
+    # Roger and Satchell
+    r = numpy.log(H/C) * numpy.log(H/O) + numpy.log(L/C) * numpy.log(L/O)
+    return numpy.sqrt(r)
+
+def gkVolatility(O, C, H, L):
+    # Garman & Klass
+    a = 0.511 * numpy.log(H/L) ** 2
+    b = 0.019 * numpy.log(C/O) * numpy.log((H*L) / O ** 2)
+    c = 2.0 * numpy.log(H/O) * numpy.log(L/O)
+    return numpy.sqrt(a - b - c)
+
+def paVolatility(O, C, H, L):
+    # Parkinson
+    r = (1 / (4 * math.log(2))) * numpy.log(H/L) ** 2
+    return numpy.sqrt(r)
+
+def dvVolatility(O, C, H, L):
+    # Classical Daily Volatility
+    return (H - L) / (H + L)
+
+VOLATILITY = {'RS': rsVolatility, 'GK': gkVolatility, 'PA': paVolatility, 'DV': dvVolatility}
+
 def getVolatility(context, prices):
+    # Daily volatility for every day in the arrays at once
+    estimator = VOLATILITY.get(context.algoVolatility, dvVolatility)
     
-    algo = context.algoVolatility
-
-    O = prices['open']
-    C = prices['close']
-    H = prices['high']
-    L = prices['low']
-    
-    v = None
-    
-    # http://www.tsresearch.com/public/volatility/historical/
-    if algo == 'RS':
-        # Calculate the daily Roger and Satchell volatility
-        # Since 'daily' the 1/T is skipped
-        a = math.log(H/C)
-        b = math.log(H/O)
-        c = math.log(L/C)
-        d = math.log(L/O)
-        r = (a * b) + (c * d)
-        v = math.sqrt(r)
-    elif algo == 'GK':
-        # Calculate the daily Garman & Klass volatility
-        # Since 'daily' the 1/T is skipped
-        a = 0.511 * math.pow((math.log(H/L)), 2)
-        b = 0.019 * math.log(C/O) * math.log((H*L)/math.pow(O, 2))
-        c = 2.0 * math.log(H/O) * math.log(L/O)
-        r = a - b - c
-        v = math.sqrt(r)
-    elif algo == 'PA':
-        # Calculate the daily Parkinson volatility
-        # Since 'daily' the 4^T is skipped
-        a = math.pow(math.log(H/L), 2)
-        b = 1 / (4 * math.log(2))
-        r = b * a
-        v = math.sqrt(r)
-    else:    
-        # Calculate the classical Daily Volatility
-        # Since 'daily' the 1/T is skipped
-        a = H - L
-        b = H + L
-        v = a/b
-        
-    return v
-    
+    return estimator(prices['open'], prices['close'], prices['high'], prices['low'])
 
 def getBasketPeriodMetrics(context):
     
-    basketPeriodOchlv = context.basketPeriodOchlv
+    # symbols x days views of the lookback
+    window = context.basketPeriodOchlv.window()
+    prices = dict((item, window[:, :, i].T) for i, item in enumerate(OHLCV))
     
-    beginOpen = {}; endClose = {}; p = {}; v = {}
-        
-    for values in basketPeriodOchlv:
-        for sid in values:
-            endClose[sid] = values[sid]['close']
-            if sid not in beginOpen:
-                beginOpen[sid] = values[sid]['open']
-            if sid not in v:
-                v[sid] = []
-                
-            print('[%s] VOLUME %s' % (sid, values[sid]['volume']))
-            
-            # Calculate period volatility
-            v[sid].append(getVolatility(context, values[sid]))
-            
-    for sid in beginOpen:
-        p[sid] = (endClose[sid] - beginOpen[sid]) / beginOpen[sid]
+    # Period performance from the first open to the last close
+    beginOpen = firstFinite(prices['open'])
+    endClose = firstFinite(prices['close'], reverse=True)
+    performance = (endClose - beginOpen) / beginOpen
+    
+    # Daily volatility for every day of the period
+    volatility = getVolatility(context, prices)
+    
+    if context.logDebug is True:
+        for i, sid in enumerate(context.sids):
+            log.debug('[%s] VOLUME %s' % (sid, numpy.nansum(prices['volume'][i])))
+    
+    p = dict(zip(context.sids, performance))
+    v = dict(zip(context.sids, volatility))
             
     return p, v
 
-def getBestStock(context, p, v, volume):
+def getBestStock(context, p, v):
            
     #if context.metricPeriodMeanCount <= context.metricPeriod / context.metricPeriod
     performances = {}; volatilities = {}; stockRanks = {}; bestStock = None
@@ -245,14 +369,13 @@ def getBestStock(context, p, v, volume):
                 
     for s in basket:
         performances[s.sid] = p[s.sid]
-        volatilities[s.sid] = sum(v[s.sid]) / period
-        volume
+        volatilities[s.sid] = numpy.nansum(v[s.sid]) / period
         #print('[%s] PERIOD : p %s, v %s' % (s, p[s.sid], v[s.sid]))
                   
-        # Determine min/max of each.  NOTE: volatility is switched
-        # since a low volatility should be weighted highly.
-        minP, maxP = getMinMax(performances)
-        maxV, minV = getMinMax(volatilities)
+    # Determine min/max of each.  NOTE: volatility is switched
+    # since a low volatility should be weighted highly.
+    minP, maxP = getMinMax(performances)
+    maxV, minV = getMinMax(volatilities)
                     
     # Normalize the performance and volatility values to a range
     # between [0..1] then rank them based on a 70/30 weighting.
@@ -273,17 +396,17 @@ def getBestStock(context, p, v, volume):
                     
             stockRanks[s] = rank
     
-        if len(stockRanks) > 0:
-            if context.logDebug is True and len(stockRanks) < len(basket):
-                log.debug('FEWER STOCK RANKINGS THAN IN STOCK BASKET!')
-            if context.logRank is True:
-                for s in sorted(stockRanks, key=stockRanks.get, reverse=True):
-                    log.info('RANK [%s] %s' % (s, stockRanks[s]))
-                
-            bestStock = max(stockRanks, key=stockRanks.get)
-        else:
-            if context.logDebug is True:
-                log.debug('NO STOCK RANKINGS FOUND IN BASKET; BEST STOCK IS: NONE')
+    if len(stockRanks) > 0:
+        if context.logDebug is True and len(stockRanks) < len(basket):
+            log.debug('FEWER STOCK RANKINGS THAN IN STOCK BASKET!')
+        if context.logRank is True:
+            for s in sorted(stockRanks, key=stockRanks.get, reverse=True):
+                log.info('RANK [%s] %s' % (s, stockRanks[s]))
+            
+        bestStock = max(stockRanks, key=stockRanks.get)
+    else:
+        if context.logDebug is True:
+            log.debug('NO STOCK RANKINGS FOUND IN BASKET; BEST STOCK IS: NONE')
                     
     return bestStock
 
@@ -297,7 +420,8 @@ def hasPositions(context):
     return hasPositions   
 
 def sellPositions(context):
-    oid = None
+    # Returns the oids of the sell orders
+    oids = []
     positions = context.portfolio.positions
            
     try:
@@ -329,9 +453,10 @@ def sellPositions(context):
                     log.info('SELL [%s] (%s) @ $%s (%s) MARKET' % (p.sid, -amount, price, orderValue))
                 oid = order(p.sid, -amount)
                 
+            oids.append(context.orderManager.submit(oid))
             context.sellCount += 1
             
-    return oid
+    return oids
 
 def buyPositions(context, data):
     oid = None
@@ -375,10 +500,22 @@ def buyPositions(context, data):
         else:
             oid = order(s, amount)
             
+        context.orderManager.submit(oid, buyFilled)
         context.buyCount += 1
 
     return oid
 
+def sellsFilled(context, data):
+    # Every sell of the rotation filled; buy the next holding
+    if context.logSell is True:
+        log.info('SELL ORDERS COMPLETED %s' % get_datetime())
+    buyPositions(context, data)
+    context.currentStock = context.basketStockBest
+    context.basketStockBest = None
+
+def buyFilled(oid, orderObj, context, data):
+    if context.logBuy is True:
+        log.info('BUY ORDER COMPLETED %s' % get_datetime())
                             
 '''
   The main proccessing function.  This is called and passed data
@@ -398,46 +535,21 @@ def handle_data(context, data):
             if now == context.lastDate:
                 context.bars = accumulateData(data)
             
-            # Collect OCHLV prices for the period
-            context.basketPeriodOchlv.append(basketPeriodOchlv(context))            
+            # Collect OCHLV prices for the day
+            context.basketPeriodOchlv.push(basketPeriodOchlv(context))
             
-            # Fill the lookback period and then get best stock once filled
-            if len(context.basketPeriodOchlv) == (context.metricPeriod + context.metricBuyPeriod):
+            # Fill the lookback period then get best stock every buy period
+            days = context.basketPeriodOchlv.count - context.metricPeriod
+            if days >= 0 and days % context.metricBuyPeriod == 0:
                 p, v = getBasketPeriodMetrics(context)
                 context.basketStockBest = getBestStock(context, p, v)
-                context.basketAnalyzed = True                
-                del context.basketPeriodOchlv[:context.metricBuyPeriod]
+                context.basketAnalyzed = True
                 
-            del context.basketStocksActive[:]
+            context.basketStocksActive = []
             context.nextDate = None
             
-    # Check if SELL completed        
-    if context.oidSell is not None:
-        orderObj = get_order(context.oidSell)
-        if orderObj.filled == orderObj.amount:
-            # Good to buy next holding
-            if context.logSell is True:
-                log.info('SELL ORDER COMPLETED %s' % now)
-            context.oidSell = None
-            context.oidBuy = buyPositions(context, data)
-            context.currentStock = context.basketStockBest
-            context.basketStockBest = None
-        else:
-            if context.logSell is True:
-                log.info('SELL ORDER *NOT* COMPLETED')
-            #return
-    
-    # Check if BUY completed
-    if context.oidBuy is not None:
-        orderObj = get_order(context.oidBuy)
-        if orderObj.filled == orderObj.amount:
-            if context.logBuy is True:
-                log.info('BUY ORDER COMPLETED %s' % now)
-            context.oidBuy = None
-        else:
-            if context.logBuy is True:
-                log.info('BUY ORDER *NOT* COMPLETED')
-            #return
+    # Calls buyFilled/sellsFilled for the orders filled on this bar
+    context.orderManager.update(context, data)
                         
     if context.basketAnalyzed is True:
         if context.basketStockBest is not None:
@@ -449,18 +561,22 @@ def handle_data(context, data):
                 # Buy best
                 log.info('BUYING [%s]' % context.basketStockBest)
                 context.currentStock = context.basketStockBest
-                context.oidBuy = buyPositions(context, data)
+                buyPositions(context, data)
             else:
                 # Sell ALL and Buy best
                 log.info('BUYING [%s]' % context.basketStockBest)
                 if hasPositions(context):
-                    context.oidSell = sellPositions(context)
+                    context.orderManager.whenFilled(sellPositions(context), sellsFilled)
                 else:
-                    context.oidBuy = buyPositions(context, data)
+                    buyPositions(context, data)
         else:
             if context.logWarn is True:
                 log.warn('COULD NOT FIND A BEST STOCK! BEST STOCK IS *NONE*')
                 
+        if context.profilePhases is True:
+            for line in context.profiler.report():
+                log.info(line)
+                
         context.basketAnalyzed = False
         
     # NOTE: record() can ONLY handle five elements in the graph. Any more than that will runtime error once 5 are exceeded.      
@@ -476,9 +592,7 @@ def handle_data(context, data):
         # Ensure stocks are only traded if possible.  
         # (e.g) EDV doesn't start trading until late 2007, without
         # this, any backtest run before that date would fail.
-        for s in context.basket.values():
-            if now > s.security_start_date:
-                context.basketStocksActive.append(s)
+        context.basketStocksActive = context.listed[:bisect.bisect_left(context.listedDates, now)]
                 
         context.nextDate = dt.datetime(int(now.year), int(now.month), int(now.day), 0, 0, 0, 0, pytz.utc) + dt.timedelta(days=1)
         #print('now %s, nextDate %s' % (now, context.nextDate))
@@ -20,6 +20,12 @@
 # basis.  Each month the performance and mean 20-day volatility over
 # the last 3 months are used to rank which ETF should be invested 
 # in for the coming month.
+#
+# Quantopian can't import gmrelib, so the parts of it this strategy uses
+# are inlined: PhaseProfiler (gmrelib.profiling), OrderManager
+# (gmrelib.orders), rsVolatility (gmrelib.volatility) and the basket in
+# listing order (gmrelib.universe).  tests/test_quantopian.py checks
+# them against gmrelib.
 
 # ATTRIBUTION:
 # GMRE Strategy: Frank Grossman, 2013-08-09
@@ -30,8 +36,11 @@
 # Quantopian Author: David Quast, 2013-09-13
 # Quantopian Author: James Crocker, 2013-11-14 james@constantsc.net
 
+import bisect
 import math
+import numpy
 import pandas
+import time
 
 # window_length SHOULD EQUAL context.metricPeriod
 @batch_transform(window_length=63)
@@ -89,6 +98,11 @@ def initialize(context):
         #23911: sid(23911), # SHY
     } 
     
+    # Basket ordered by listing date: the stocks listed before a date are
+    # a prefix found by bisect instead of checking every stock each bar
+    context.listed = sorted(context.basket.values(), key=lambda s: s.security_start_date)
+    context.listedDates = [s.security_start_date for s in context.listed]
+    
     # Set/Unset logging features for verbosity levels
     context.logWarn = False
     context.logBuy = False
@@ -105,29 +119,119 @@ def initialize(context):
     context.currentMonth = None
     context.currentStock = None
     context.nextStock = None
-    context.oidBuy = None
-    context.oidSell = None
+    
+    # Open orders, checked once per bar
+    context.orderManager = OrderManager(get_order)
+    
+    # Time the handle_data phases (PhaseProfiler), logged with the
+    # CAGR. Functions are wrapped, the strategy is unchanged.
+    context.profilePhases = False
+    if context.profilePhases is True:
+        context.profiler = PhaseProfiler()
+        context.profiler.instrument(globals(), {'accumulateData': 'accumulate', 'getStockMetrics': 'metrics', 'getBestStock': 'ranking',
+                                               'sellPositions': 'orders', 'buyPositions': 'orders'})
+        context.orderManager.update = context.profiler.timed('orders', context.orderManager.update)
     
     context.buyCount = 0
     context.sellCount = 0
     
+class PhaseProfiler(object):
+    # Calls, time and a log2 histogram (<1us, <2us, <4us, ...) of the
+    # call times of every phase. Phases nest, times are inclusive.
+    
+    def __init__(self):
+        self.phases = {}
+        
+    def timed(self, phase, function):
+        stats = self.phases.setdefault(phase, [0, 0.0, []])
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                bucket = max(0, math.frexp(elapsed * 1e6)[1])
+                if bucket >= len(stats[2]):
+                    stats[2].extend([0] * (bucket + 1 - len(stats[2])))
+                stats[2][bucket] += 1
+        return wrapper
+    
+    def instrument(self, names, phases):
+        # Replaces the functions in names (globals()) with timed ones
+        for name, phase in phases.items():
+            names[name] = self.timed(phase, names[name])
+            
+    def report(self):
+        lines = []
+        for phase, (calls, total, buckets) in sorted(self.phases.items(), key=lambda p: -p[1][1]):
+            histogram = ' '.join('<%dus:%d' % (2 ** i, n) for i, n in enumerate(buckets) if n)
+            lines.append('PHASE %s CALLS %s TIME %.3fs %s' % (phase, calls, total, histogram))
+        return lines
+    
+class OrderManager(object):
+    # Tracks any number of open orders and calls back when they fill
+    # (filled == amount); update() checks them once per bar and then
+    # calls the callbacks of the groups whose orders have all filled.
+    
+    def __init__(self, getOrder):
+        self.getOrder = getOrder
+        self.open = {}
+        self.groups = []
+        
+    def submit(self, oid, onFilled=None):
+        # onFilled(oid, order, *args); None (no order placed) is ignored
+        if oid is not None:
+            self.open[oid] = onFilled
+        return oid
+        
+    def whenFilled(self, oids, callback):
+        # callback(*args) once every order of oids has filled
+        pending = set()
+        for oid in oids:
+            if oid is not None:
+                self.open.setdefault(oid, None)
+                pending.add(oid)
+        self.groups.append([pending, callback])
+        
+    def busy(self):
+        return len(self.open) > 0 or len(self.groups) > 0
+        
+    def update(self, *args):
+        filled = []
+        for oid in list(self.open):
+            o = self.getOrder(oid)
+            if o.filled == o.amount:
+                filled.append((oid, o, self.open.pop(oid)))
+        for oid, o, onFilled in filled:
+            if onFilled is not None:
+                onFilled(oid, o, *args)
+                
+        oids = set(f[0] for f in filled)
+        for group in self.groups:
+            group[0] -= oids
+        complete = [g for g in self.groups if not g[0]]
+        self.groups = [g for g in self.groups if g[0]]
+        for pending, callback in complete:
+            callback(*args)
+    
 def getMinMax(arr):
     return min(arr.values()), max(arr.values())
 
 def rsVolatility(period, openPrices, closePrices, highPrices, lowPrices):
-    # Rogers and Satchell (1991)
-    r = []
-    
-    for i in xrange(0, period):
-        a = math.log(highPrices[i] / closePrices[i])
-        b = math.log(highPrices[i] / openPrices[i])
-        c = math.log(lowPrices[i] / closePrices[i])
-        d = math.log(lowPrices[i] / openPrices[i])
-        r.append( a*b + c*d )
-        
-    # Take the square root of the sum over the period - 1.  Then multiply
-    # that by the square root of the number of trading days in a year
-    vol = math.sqrt(sum(r) / period) * math.sqrt(252/period)
+    # Rogers and Satchell (1991) - vectorized over the bars
+    O = numpy.asarray(openPrices[:period], dtype=float)
+    C = numpy.asarray(closePrices[:period], dtype=float)
+    H = numpy.asarray(highPrices[:period], dtype=float)
+    L = numpy.asarray(lowPrices[:period], dtype=float)
+    
+    r = numpy.log(H / C) * numpy.log(H / O) + numpy.log(L / C) * numpy.log(L / O)
+    
+    # Take the square root of the sum over the period.  Then multiply
+    # that by the square root of the number of trading days in a year.
+    # NOTE: cumsum keeps the left to right summing order of sum()
+    vol = math.sqrt(numpy.cumsum(r)[-1] / period) * math.sqrt(252 // period)
     
     return vol
     
@@ -240,7 +344,8 @@ def hasPositions(context):
     return hasPositions   
 
 def sellPositions(context):
-    oid = None
+    # Returns the oids of the sell orders
+    oids = []
     positions = context.portfolio.positions
            
     try:
@@ -272,9 +377,10 @@ def sellPositions(context):
                     log.info('SELL [%s] (%s) @ $%s (%s) MARKET' % (p.sid, -amount, price, orderValue))
                 oid = order(p.sid, -amount)
                 
+            oids.append(context.orderManager.submit(oid))
             context.sellCount += 1
             
-    return oid
+    return oids
 
 def buyPositions(context, data):
     oid = None
@@ -318,10 +424,23 @@ def buyPositions(context, data):
         else:
             oid = order(s, amount)
             
+        context.orderManager.submit(oid, buyFilled)
         context.buyCount += 1
 
     return oid
 
+def sellsFilled(context, data):
+    # Every sell of the rotation filled; buy the next holding
+    if context.logSell is True:
+        log.info('SELL ORDERS COMPLETED')
+    buyPositions(context, data)
+    context.currentStock = context.nextStock
+    context.nextStock = None
+
+def buyFilled(oid, orderObj, context, data):
+    if context.logBuy is True:
+        log.info('BUY ORDER COMPLETED')
+
 '''
   The main proccessing function.  This is called and passed data
 '''
@@ -340,31 +459,12 @@ def handle_data(context, data):
     if context.logWarn is True and context.portfolio.cash < 0:
         log.warn('NEGATIVE CASH %s' % context.portfolio.cash)
             
-    if context.oidSell is not None:
-        orderObj = get_order(context.oidSell)
-        if orderObj.filled == orderObj.amount:
-            # Good to buy next holding
-            if context.logSell is True:
-                log.info('SELL ORDER COMPLETED')
-            context.oidSell = None
-            context.oidBuy = buyPositions(context, data)
-            context.currentStock = context.nextStock
-            context.nextStock = None
-        else:
-            if context.logSell is True:
-                log.info('SELL ORDER *NOT* COMPLETED')
-            return
-            
-    if context.oidBuy is not None:
-        orderObj = get_order(context.oidBuy)
-        if orderObj.filled == orderObj.amount:
-            if context.logBuy is True:
-                log.info('BUY ORDER COMPLETED')
-            context.oidBuy = None
-        else:
-            if context.logBuy is True:
-                log.info('BUY ORDER *NOT* COMPLETED')
-            return
+    # Calls buyFilled/sellsFilled for the orders filled on this bar
+    context.orderManager.update(context, data)
+    if context.orderManager.busy():
+        if context.logWarn is True:
+            log.warn('ORDERS *NOT* COMPLETED')
+        return
    
     datapanel = accumulateData(data)
     
@@ -389,10 +489,7 @@ def handle_data(context, data):
     # Ensure stocks are only traded if possible.  
     # (e.g) EDV doesn't start trading until late 2007, without
     # this, any backtest run before that date would fail.
-    stocks = []
-    for s in context.basket.values():
-        if date > s.security_start_date:
-            stocks.append(s)
+    stocks = context.listed[:bisect.bisect_left(context.listedDates, date)]
     
     best = getBestStock(context, datapanel, stocks)
     
@@ -406,15 +503,15 @@ def handle_data(context, data):
             # Buy best
             context.currentStock = best
             context.nextStock = best
-            context.oidBuy = buyPositions(context, data)
+            buyPositions(context, data)
         else:
             # Sell ALL and Buy best
             context.nextStock = best
             log.info('BUYING [%s]' % best)
             if hasPositions(context):
-                context.oidSell = sellPositions(context)
+                context.orderManager.whenFilled(sellPositions(context), sellsFilled)
             else:
-                context.oidBuy = buyPositions(context, data)
+                buyPositions(context, data)
     else:
         if context.logWarn is True:
             log.warn('COULD NOT FIND A BEST STOCK! BEST STOCK IS *NONE*')
@@ -431,3 +528,7 @@ def handle_data(context, data):
         cagr = pow(performance, inverseYears) - 1.0
         
         log.info('CAGR %s%%, PNL $%s, CASH $%s, PORTFOLIO $%s' % ((cagr * 100), context.portfolio.pnl, context.portfolio.cash, context.portfolio.portfolio_value))
+        
+        if context.profilePhases is True:
+            for line in context.profiler.report():
+                log.info(line)
@@ -0,0 +1,203 @@
+# Global Market Rotation Enhanced (GMRE) - Benchmarks
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# Times the GMRE hot paths on synthetic bars (gmrelib.synthetic) of a
+# configurable size and reports the time, throughput and peak memory of
+# each (gmrelib.benchmark):
+#   - GMRE.rsVolatility, GMRE.getStockMetrics, GMRE.getBestStock and a
+#     full GMRE run (zipline/gmre.py, skipped when Zipline isn't
+#     installed)
+#   - getFiniteBars, basketPeriodOchlv and getVolatility of
+#     quantopian/gmre-minute.py, on one day of minute bars
+#   - the gmrelib paths they use (volatility, features, ranking, the
+#     fast backtest and the bar window of every bar)
+# The results are compared to baselinePath; a case more than tolerance
+# slower than its baseline is reported as a REGRESSION and the script
+# exits with status 1.  The baseline is written when it doesn't exist
+# yet or updateBaseline is set.  Keep the sizes fixed between runs that
+# are compared.
+
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from gmrelib import backtest
+from gmrelib import barwindow
+from gmrelib import benchmark
+from gmrelib import features
+from gmrelib import ranking
+from gmrelib import synthetic
+from gmrelib import volatility as gmreVolatility
+
+try:
+    from gmre import GMRE
+    ziplineError = None
+except ( ImportError, SyntaxError ) as e:
+    # gmre.py needs Zipline (Python 2)
+    GMRE = None
+    ziplineError = '%s: %s' % ( type( e ).__name__, e )
+
+baselinePath = 'gmre-benchmark.json'
+updateBaseline = False
+tolerance = 0.25  # Fraction slower than the baseline that is a regression
+repeat = 5
+
+symbols = 500  # Basket size of the ranking and metric cases
+days = 2520  # Ten years of daily bars
+minutes = 390  # One trading day of minute bars
+minuteNaN = 0.01  # Fraction of missing minute bars
+runSymbols = 8  # Basket of the full GMRE run
+runDays = 504
+seed = 0
+
+metricPeriod = 63
+periodVolatility = 21
+
+minuteScript = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), '..', 'quantopian', 'gmre-minute.py' )
+
+Security = namedtuple( 'Security', 'sid' )
+
+
+class Context( object ):
+    pass
+
+
+def loadMinuteScript():
+    # gmre-minute.py with the two Quantopian names its module level needs;
+    # only its pure bar functions are called
+    namespace = {
+        '__name__': 'gmre_minute',
+        'batch_transform': lambda **kwargs: ( lambda function: function ),
+        'log': None,
+    }
+    with open( minuteScript ) as f:
+        exec( compile( f.read(), minuteScript, 'exec' ), namespace )
+    return namespace
+
+
+def minuteContext( bars ):
+    # Quantopian context of one day of minute bars for the whole basket
+    context = Context()
+    context.sids = list( range( symbols ) )
+    context.sidIndex = dict( ( sid, i ) for i, sid in enumerate( context.sids ) )
+    context.basketStocksActive = [Security( sid ) for sid in context.sids]
+    context.logWarn = False
+    context.algoVolatility = 'RS'
+    context.bars = dict( ( item, pd.DataFrame( bars[field].T, columns = context.sids ) ) for item, field in
+                         [( 'close_price', 'close' ), ( 'high', 'high' ), ( 'low', 'low' ), ( 'volume', 'volume' )] )
+    return context
+
+
+def gmrelibCases( dates, bars ):
+    O, C, H, L = [bars[field] for field in features.FIELDS]
+    window = [p[:, -metricPeriod:] for p in ( O, C, H, L )]
+    performance, volatility = features.computeFeatures( O, C, H, L, metricPeriod, periodVolatility )
+    last = len( dates ) - 1
+    barWindow = barwindow.BarWindow( dates, synthetic.symbols( symbols ), np.array( [p.T for p in ( O, C, H, L )] ) )
+    barDates = [pd.Timestamp( str( d ) ) for d in dates]
+
+    def slide():
+        # One metricPeriod window per bar of the whole run
+        barWindow.end = 0
+        for date in barDates:
+            barWindow.window( date, metricPeriod )
+
+    return [
+        benchmark.measure( 'gmrelib.rsVolatility', lambda: gmreVolatility.rsVolatility( metricPeriod, *window ),
+                           symbols * metricPeriod, repeat ),
+        benchmark.measure( 'gmrelib.computeFeatures', lambda: features.computeFeatures( O, C, H, L, metricPeriod, periodVolatility ),
+                           symbols * days, repeat ),
+        benchmark.measure( 'gmrelib.rankBasket', lambda: ranking.rankBasket( performance[last], volatility[last], 0.7, 0.3 ),
+                           symbols, repeat ),
+        benchmark.measure( 'gmrelib.runBacktest', lambda: backtest.runBacktest( dates, C, bars['volume'], performance, volatility,
+                                                                                 0.7, 0.3, metricPeriod ),
+                           symbols * days, repeat ),
+        benchmark.measure( 'gmrelib.BarWindow', slide, days, repeat ),
+    ]
+
+
+def minuteCases( dates, bars ):
+    script = loadMinuteScript()
+    minuteBars = synthetic.minuteBars( symbols, minutes, seed, minuteNaN )
+    context = minuteContext( minuteBars )
+    daily = dict( ( field, bars[field][:, -metricPeriod:] ) for field in synthetic.FIELDS )
+
+    return [
+        benchmark.measure( 'getFiniteBars', lambda: script['getFiniteBars']( context ), symbols * minutes, repeat ),
+        benchmark.measure( 'basketPeriodOchlv', lambda: script['basketPeriodOchlv']( context ), symbols * minutes, repeat ),
+        benchmark.measure( 'getVolatility', lambda: script['getVolatility']( context, daily ), symbols * metricPeriod, repeat ),
+    ]
+
+
+def gmreCases( dates, bars ):
+    names = ['rsVolatility', 'getStockMetrics', 'getBestStock', 'GMRE.run', 'GMRE.run skipAhead']
+    if GMRE is None:
+        return [benchmark.skipped( name, ziplineError ) for name in names]
+
+    stocks = synthetic.symbols( symbols )
+    algo = GMRE()
+    algo.configure( basket = stocks, logWarn = False, logBuy = False, logSell = False, logHold = False, logInfo = False )
+
+    window = [bars[field][:, -metricPeriod:] for field in synthetic.FIELDS]
+    algo.barWindow = barwindow.BarWindow( dates, stocks, np.array( [bars[field].T for field in features.FIELDS] ) )
+    dataWindow = algo.barWindow.window( pd.Timestamp( str( dates[-1] ) ), metricPeriod )
+    dateStr = str( dates[-1] )
+
+    runStocks = stocks[:runSymbols]
+    runDates = dates[:runDays]
+    runBars = dict( ( field, bars[field][:runSymbols, :runDays] ) for field in synthetic.FIELDS )
+    data = synthetic.panel( runDates, runStocks, runBars )
+
+    def run( skipAhead = False ):
+        gmre = GMRE()
+        gmre.configure( basket = runStocks, skipAhead = skipAhead, logWarn = False, logBuy = False, logSell = False, logHold = False,
+                        logInfo = False )
+        gmre.run( data )
+
+    return [
+        benchmark.measure( 'rsVolatility', lambda: algo.rsVolatility( metricPeriod, *window[:4] ), symbols * metricPeriod, repeat ),
+        benchmark.measure( 'getStockMetrics', lambda: algo.getStockMetrics( *window[:4] ), symbols * metricPeriod, repeat ),
+        benchmark.measure( 'getBestStock', lambda: algo.getBestStock( dateStr, dataWindow, stocks ), symbols * metricPeriod, repeat ),
+        benchmark.measure( 'GMRE.run', run, runSymbols * runDays, 1 ),
+        benchmark.measure( 'GMRE.run skipAhead', lambda: run( True ), runSymbols * runDays, 1 ),
+    ]
+
+
+if __name__ == '__main__':
+    dates, bars = synthetic.dailyBars( symbols, days, seed )
+    sizes = {'symbols': symbols, 'days': days, 'minutes': minutes, 'runSymbols': runSymbols, 'runDays': runDays}
+
+    results = gmreCases( dates, bars ) + minuteCases( dates, bars ) + gmrelibCases( dates, bars )
+
+    baseline = benchmark.loadBaseline( baselinePath )
+    if baseline and baseline.get( 'sizes' ) != sizes:
+        print( 'BASELINE SIZES %s DIFFER FROM %s, NOT COMPARED' % ( baseline.get( 'sizes' ), sizes ) )
+        baseline = {}
+    regressions = benchmark.compare( results, baseline, tolerance )
+
+    print( benchmark.report( results, regressions ) )
+
+    if updateBaseline or not os.path.exists( baselinePath ):
+        benchmark.writeBaseline( baselinePath, results, sizes )
+        print( 'BASELINE WRITTEN TO %s' % baselinePath )
+
+    if regressions:
+        sys.exit( 1 )
@@ -36,25 +36,40 @@ from zipline import TradingAlgorithm
 from zipline.finance import trading, performance, slippage
 from zipline.finance.blotter import Blotter
 from zipline.finance.commission import *
-from zipline.transforms import batch_transform
 from zipline.utils.factory import load_bars_from_yahoo
+from gmrelib import allocation
+from gmrelib import analytics
+from gmrelib import barstore
+from gmrelib import barwindow
+from gmrelib import columnar
+from gmrelib import eventlog
+from gmrelib import features
+from gmrelib import orders
+from gmrelib import ranking
+from gmrelib import recorder as gmreRecorder
+from gmrelib import schedule
+from gmrelib import universe
+from gmrelib import volatility as gmreVolatility
 import math
+import numpy as np
 import pytz
 
 
 ziplineDataPath = '/home/<userName>/.zipline/data/*'
 removeCommand = '/bin/rm'
 
-# NOTE: The stocks in the basket must exist in the date range. If not it will error.
-# Looking for Zipline code similar to Quantopian "security_start_date"
+# NOTE: Yahoo's loader needs the stocks in the basket to exist in the date range.
+# Stocks listed later (listingDates, Quantopian's "security_start_date", or
+# missing bars in the bar store) are only ranked once they have metricPeriod
+# bars (gmrelib.universe).
 startDateTime = [2011, 01, 01, 0, 0, 0, 0, pytz.utc]
 endDateTime = [2014, 10, 20, 0, 0, 0, 0, pytz.utc]
 basket = ['MDY', 'IEV', 'EEM', 'ILF', 'EPP', 'EDV', 'ZIV', 'SHY']
 priceAdjusted = True  # Load Yahoo Bars with adjusted prices or not
-
-@batch_transform
-def accumulateData( data ):
-    return data
+barStorePath = None  # Local bar store (gmrelib.barstore) or None to download from Yahoo every run
+columnarPath = None  # Memory-mapped daily or minute bars (gmrelib.columnar) to load instead, or None
+featurePath = None  # Directory for precomputed metrics (gmrelib.features) or None to compute every rebalance
+listingDates = {}  # First trading day of stocks listed after the start, e.g. {'EDV': '2007-12-10'}
 
 class GMRE( TradingAlgorithm ):
 
@@ -63,16 +78,28 @@ class GMRE( TradingAlgorithm ):
         # Adjust slippage
         self.set_slippage( slippage.VolumeShareSlippage( volume_limit = 1.0, price_impact = 0.01 ) )
 
-        # Trade on boundary of first trading day of MONTH or set DAYS
-        # DAYS|MONTH
-        # self.boundaryTrade = 'DAYS'
-        # self.boundaryDays = 21
+        # Trade on boundary of first trading day of MONTH, WEEK, every
+        # boundaryDays trading DAYS or MONTH plus boundaryDays calendar days
+        # DAYS|MONTH|WEEK|MONTH_DAYS (gmrelib.schedule)
         self.boundaryTrade = 'MONTH'
+        self.boundaryDays = 21
 
         # Set Performance vs. Volatility factors (7.0, 3.0 from Grossman GMRE
         self.factorPerformance = 0.7
         self.factorVolatility = 0.3
 
+        # Volatility ranking weight per stock (default 1.0). Adjust volatility for EDV by 50%
+        self.volatilityWeights = {'EDV': 0.5}
+
+        # Holdings (gmrelib.allocation) 'BEST|TOP|SCORE': all in the best rank, equal
+        # weights over the topCount best or weighted by rank over the topCount best
+        self.allocation = 'BEST'
+        self.topCount = 3
+        self.rebalanceBand = 0.02  # TOP|SCORE skip trades under this fraction of the portfolio value
+
+        # Volatility estimator (see gmrelib.volatility) 'RS|GK|PA|DV|YZ'
+        self.algoVolatility = 'RS'
+
         # Period Volatility and Performance period in DAYS
         self.metricPeriod = 63  # 3 months LOOKBACK
         self.periodVolatility = 21  # Volatility period. Chose a MULTIPLE of metricPeriod
@@ -113,44 +140,79 @@ class GMRE( TradingAlgorithm ):
         self.logHold = True
         self.logRank = False
         self.logDebug = False
+        self.logInfo = True  # CAGR, period performance and trade decisions
+        self.logPath = None  # JSON lines event log (gmrelib.eventlog) or None
+
+        # Every bar's portfolio, positions and rankings (gmrelib.recorder) are
+        # written to this .npz when the run ends, or None
+        self.recordPath = None
+
+        # Skip-ahead: only the rebalance days and the days with open orders
+        # run the strategy; the bars between just mark to market
+        self.skipAhead = False
 
         # SHOULDN'T NEED TO MODIFY REMAINING VARIABLES
 
-        self.accumulateData = accumulateData( window_length = self.metricPeriod )
+        self.eventLog = eventlog.fromFlags( self, self.logPath )
+
+        # Precomputed performance/volatility (set from featurePath before run)
+        self.featureStore = None
+
+        # Symbols x dates availability (gmrelib.universe, set from the data
+        # before run) or None to rank the whole basket
+        self.universe = None
+        self.scheduler = None  # gmrelib.schedule.Scheduler, built by run()
+        self.barWindow = None  # gmrelib.barwindow.BarWindow of the loaded bars, built by run()
+
+        self.recorder = gmreRecorder.Recorder()
+        self.labelRecorder()
+
+        # Equity curve, drawdown, CAGR, Sharpe/Sortino and monthly returns
+        self.tracker = analytics.PerformanceTracker()
 
         # Keep track of the current period
-        self.cashStart = None
-        self.dateStart = None
-        self.currentDayNum = None
-        self.currentMonth = None
         self.currentStock = None
         self.nextStock = None
-        self.oidBuy = None
-        self.oidSell = None
-        self.period_start_portfolio_value = None
+        self.targets = None  # TOP|SCORE (stocks, weights) of the last rebalance
+
+        # Open orders, checked once per bar (gmrelib.orders)
+        self.orderManager = orders.OrderManager( lambda oid: self.blotter.orders[oid] )
 
         self.buyCount = 0
         self.sellCount = 0
 
-    def getMinMax( self, arr ):
-        return min( arr.values() ), max( arr.values() )
+    def configure( self, **settings ):
+        # Override initialize() settings (e.g. from a parameter sweep) and
+        # rebuild the state that depends on them
+        for name, value in settings.items():
+            if not hasattr( self, name ):
+                raise AttributeError( 'GMRE has no setting %s' % name )
+            if name == 'basket' and not isinstance( value, dict ):
+                value = dict( enumerate( value ) )
+            setattr( self, name, value )
+
+        self.eventLog.close()
+        self.eventLog = eventlog.fromFlags( self, self.logPath )
+        self.labelRecorder()
+
+    def labelRecorder( self ):
+        # Rankings are recorded in basket order, whichever stocks are live
+        for name in ( 'rank', 'performance', 'volatility' ):
+            self.recorder.label( name, list( self.basket.values() ) )
+
+    def recordRanks( self, stocks, **values ):
+        # One column per basket stock, NaN for the stocks not ranked
+        basket = list( self.basket.values() )
+        columns = [basket.index( s ) for s in stocks]
+        for name, value in values.items():
+            row = np.nan * np.ones( len( basket ) )
+            row[columns] = value
+            values[name] = row
+        self.recorder.record( self.get_datetime(), **values )
 
     def rsVolatility( self, period, openPrices, closePrices, highPrices, lowPrices ):
-        # Rogers and Satchell (1991)
-        r = []
-
-        for i in xrange( 0, period ):
-            a = math.log( highPrices[i] / closePrices[i] )
-            b = math.log( highPrices[i] / openPrices[i] )
-            c = math.log( lowPrices[i] / closePrices[i] )
-            d = math.log( lowPrices[i] / openPrices[i] )
-            r.append( a * b + c * d )
-
-        # Take the square root of the sum over the period - 1.  Then multiply
-        # that by the square root of the number of trading days in a year
-        vol = math.sqrt( sum( r ) / period ) * math.sqrt( 252 / period )
-
-        return vol
+        # Rogers and Satchell (1991) - vectorized in gmrelib.volatility
+        return gmreVolatility.rsVolatility( period, openPrices, closePrices, highPrices, lowPrices )
 
     def getStockMetrics( self, openPrices, closePrices, highPrices, lowPrices ):
         # Get the prices
@@ -164,30 +226,25 @@ class GMRE( TradingAlgorithm ):
 
         period = self.metricPeriod
         periodV = self.periodVolatility
-        volDays = periodV - 1
-        periodRange = period / volDays
 
         # Calculate the period performance
-        start = closePrices[-period]  # First item
-        end = closePrices[-1]  # Last item
+        closePrices = gmreVolatility.asPrices( closePrices )
+        start = closePrices[..., -period]  # First item
+        end = closePrices[..., -1]  # Last item
 
         performance = ( end - start ) / start
 
-        # Calculate 20-day volatility for the given period
-        v = []
-        x = 0
-        for i in xrange( -periodRange, 0 ):
-            x = i * periodV
-            y = x + volDays
-            v.append( self.rsVolatility( volDays, openPrices[x:y], closePrices[x:y], highPrices[x:y], lowPrices[x:y] ) )
-
-            x += 1
-
-        volatility = sum( v ) / periodRange
+        # Calculate mean 20-day volatility for the given period
+        volatility = gmreVolatility.blockVolatility( self.algoVolatility, period, periodV, openPrices, closePrices, highPrices, lowPrices )
 
         return performance, volatility
 
-    def getBestStock( self, date, data, stocks ):
+    def dataWindow( self, date ):
+        # fields x metricPeriod x symbols view of the loaded bars ending at
+        # date (gmrelib.barwindow), None until metricPeriod bars
+        return self.barWindow.window( date, self.metricPeriod )
+
+    def rankStocks( self, date, window, stocks ):
 
         # Frank GrossmannComments (114)
         # For the ranking, I also use the volatility of the ETFs.
@@ -197,58 +254,121 @@ class GMRE( TradingAlgorithm ):
         # spikes during small market turbulence and the model would switch too early between shares (our 5 ETFs)
         # and treasuries .
 
-        performances = {}
-        volatilities = {}
-
-        # Get performance and volatility for all the stocks
-        for s in stocks:
-            p, v = self.getStockMetrics( data['open'][s], data['close'][s], data['high'][s], data['low'][s] )
-            performances[s] = p
-            volatilities[s] = v
+        # Get performance and volatility for all the stocks at once (stocks x days)
+        if self.featureStore is not None:
+            performances, volatilities = self.featureStore.metrics( date, stocks )
+        else:
+            prices = self.barWindow.prices
+            performances, volatilities = self.getStockMetrics( prices( window, 'open', stocks ), prices( window, 'close', stocks ),
+                                                               prices( window, 'high', stocks ), prices( window, 'low', stocks ) )
 
-        # Determine min/max of each.  NOTE: volatility is switched
-        # since a low volatility should be weighted highly.
-        minP, maxP = self.getMinMax( performances )
-        minV, maxV = self.getMinMax( volatilities )
+        if self.eventLog.enabled( 'DEBUG' ):
+            p, v = ranking.normalizeMetrics( performances, volatilities )
+            for i, s in enumerate( stocks ):
+                self.eventLog.event( 'DEBUG', date, '[%s] p %s, v %s', s, p[i], v[i], symbol = s )
 
         # Normalize the performance and volatility values to a range
         # between [0..1] then rank them based on a 70/30 weighting.
-        stockRanks = {}
-        for s in stocks:
-            p = ( performances[s] - minP ) / ( maxP - minP )
-            v = ( 1 - ( volatilities[s] - minV ) / ( maxV - minV ) )
-            if self.logDebug is True:
-                print( '[%s] p %s, v %s' % ( s, p, v ) )
+        # NOTE: volatility is switched since a low volatility should be weighted highly.
+        weights = [self.volatilityWeights.get( s, 1.0 ) for s in stocks]
+        stockRanks, best = ranking.rankBasket( performances, volatilities, self.factorPerformance, self.factorVolatility, weights )
 
-            pFactor = self.factorPerformance
-            vFactor = self.factorVolatility
+        if self.recordPath is not None:
+            self.recordRanks( stocks, rank = stockRanks, performance = performances, volatility = volatilities )
 
-            if math.isnan( p ) or math.isnan( v ):
-                rank = None
-            else:
-                # Adjust volatility for EDV by 50%
-                if s == 'EDV':
-                    rank = ( p * pFactor ) + ( ( v * 0.5 ) * vFactor )
-                else:
-                    rank = ( p * pFactor ) + ( v * vFactor )
+        if best is not None:
+            if self.eventLog.enabled( 'DEBUG' ) and len( ranking.rankOrder( stockRanks ) ) < len( stocks ):
+                self.eventLog.event( 'DEBUG', date, 'FEWER STOCK RANKINGS THAN IN STOCK BASKET!' )
+            if self.eventLog.enabled( 'RANK' ):
+                for i in ranking.rankOrder( stockRanks ):
+                    self.eventLog.event( 'RANK', date, 'RANK [%s] %s', stocks[i], stockRanks[i], symbol = stocks[i], rank = stockRanks[i] )
+        else:
+            self.eventLog.event( 'DEBUG', date, 'NO STOCK RANKINGS FOUND IN BASKET; BEST STOCK IS: NONE' )
 
-            if rank is not None:
-                stockRanks[s] = rank
+        # Ranks of the stocks and the index of the best (None if unranked)
+        return stockRanks, best
 
-        bestStock = None
-        if len( stockRanks ) > 0:
-            if self.logDebug is True and len( stockRanks ) < len( stocks ):
-                    print( '%s: FEWER STOCK RANKINGS THAN IN STOCK BASKET!' % date )
-            if self.logRank is True:
-                for s in sorted( stockRanks, key = stockRanks.get, reverse = True ):
-                    print( '%s: RANK [%s] %s' % ( date, s, stockRanks[s] ) )
+    def getBestStock( self, date, window, stocks ):
+        stockRanks, best = self.rankStocks( date, window, stocks )
+        if best is None:
+            return None
+        return stocks[best]
 
-            bestStock = max( stockRanks, key = stockRanks.get )
+    def targetDeltas( self, data, stocks, weights ):
+        # Prices and share deltas from the positions to the weights; a
+        # stock without a bar has no price and isn't traded
+        prices = np.array( [data[s]['price'] if s in data else np.nan for s in stocks], dtype = np.float64 )
+        positions = self.portfolio.positions
+        held = [positions[s].amount if s in positions else 0 for s in stocks]
+        deltas = allocation.rebalanceOrders( weights, prices, held, self.portfolio.portfolio_value, self.priceBuyFactor, self.rebalanceBand )
+        return prices, deltas
+
+    def rebalance( self, data, date, stocks, weights ):
+        # TOP|SCORE: sell down to the target weights, the buys follow
+        # once every sell has filled (buyTargets).  Held stocks that
+        # aren't ranked (e.g. no longer live) get a 0 target
+        positions = self.portfolio.positions
+        unranked = sorted( s for s in positions if positions[s].amount != 0 and s not in stocks )
+        stocks = list( stocks ) + unranked
+        weights = np.concatenate( ( np.asarray( weights, dtype = np.float64 ), np.zeros( len( unranked ) ) ) )
+        prices, deltas = self.targetDeltas( data, stocks, weights )
+
+        sells = []
+        for i in np.flatnonzero( deltas < 0 ):
+            self.eventLog.event( 'SELL', date, 'SELL [%s] (%s) @ $%s MARKET', stocks[i], deltas[i], prices[i],
+                                 symbol = stocks[i], amount = deltas[i], price = prices[i] )
+            sells.append( self.orderManager.submit( self.order( stocks[i], int( deltas[i] ) ) ) )
+            self.sellCount += 1
+
+        self.targets = ( stocks, weights )
+        if sells:
+            self.orderManager.whenFilled( sells, self.buyTargets )
         else:
-            if self.logDebug is True:
-                print( '%s: NO STOCK RANKINGS FOUND IN BASKET; BEST STOCK IS: NONE' % date )
+            # Nothing to sell: buy on this bar, as gmrelib.backtest does
+            self.buyTargets( data, date )
+
+    def buyTargets( self, data, date ):
+        # Buy up to the target weights with the cash left after the sells
+        stocks, weights = self.targets
+        prices, deltas = self.targetDeltas( data, stocks, weights )
+        buys = allocation.affordableBuys( deltas, prices, self.portfolio.cash, self.priceBuyFactor )
+
+        for i in np.flatnonzero( buys > 0 ):
+            self.eventLog.event( 'BUY', date, 'BUY [%s] %s @ $%s MARKET', stocks[i], buys[i], prices[i],
+                                 symbol = stocks[i], amount = buys[i], price = prices[i] )
+            self.orderManager.submit( self.order( stocks[i], int( buys[i] ) ), self.buyFilled )
+            self.buyCount += 1
 
-        return bestStock
+    def recordBar( self, date ):
+        # Portfolio and per stock positions of every bar
+        if self.recordPath is None:
+            return
+
+        stocks = list( self.basket.values() )
+        if self.recorder.rows == 0:
+            self.recorder.label( 'positions', stocks )
+
+        positions = self.portfolio.positions
+        amounts = [positions[s].amount if s in positions else 0 for s in stocks]
+
+        self.recorder.record( date, cash = self.portfolio.cash, pnl = self.portfolio.pnl, portfolioValue = self.portfolio.portfolio_value,
+                              buy = self.buyCount, sell = self.sellCount, positions = amounts )
+
+    def run( self, *args, **kwargs ):
+        # Rebalance days from the days of the bars (source panel)
+        source = args[0] if args else kwargs['source']
+        if self.scheduler is None:
+            self.scheduler = schedule.fromPanel( source, self.boundaryTrade, self.boundaryDays )
+        if self.barWindow is None:
+            self.barWindow = barwindow.fromPanel( source, list( self.basket.values() ) )
+        try:
+            perf = TradingAlgorithm.run( self, *args, **kwargs )
+        finally:
+            # Flush the JSON events (a later event reopens the file)
+            self.eventLog.close()
+        if self.recordPath is not None:
+            self.recorder.save( self.recordPath )
+        return perf
 
     def hasPositions( self ):
         hasPositions = False
@@ -260,7 +380,8 @@ class GMRE( TradingAlgorithm ):
         return hasPositions
 
     def sellPositions( self, date ):
-        oid = None
+        # Returns the oids of the sell orders
+        oids = []
         positions = self.portfolio.positions
 
         try:
@@ -284,23 +405,27 @@ class GMRE( TradingAlgorithm ):
                 limit = stop - priceSellLimit
 
                 if self.orderSellLimits is True:
-                    if self.logSell is True:
-                        print( '%s: SELL [%s] (%s) @ $%s (%s) STOP $%s LIMIT $%s' % ( date, p.sid, -amount, price, orderValue, stop, limit ) )
+                    self.eventLog.event( 'SELL', date, 'SELL [%s] (%s) @ $%s (%s) STOP $%s LIMIT $%s', p.sid, -amount, price, orderValue, stop, limit,
+                                         symbol = p.sid, amount = -amount, price = price, stop = stop, limit = limit )
                     oid = self.order( p.sid, -amount, limit_price = limit, stop_price = stop )
                 else:
-                    if self.logSell is True:
-                        print( '%s: SELL [%s] (%s) @ $%s (%s) MARKET' % ( date, p.sid, -amount, price, orderValue ) )
+                    self.eventLog.event( 'SELL', date, 'SELL [%s] (%s) @ $%s (%s) MARKET', p.sid, -amount, price, orderValue,
+                                         symbol = p.sid, amount = -amount, price = price )
                     oid = self.order( p.sid, -amount )
 
+                oids.append( self.orderManager.submit( oid ) )
                 self.sellCount += 1
 
-        return oid
+        return oids
 
-    def buyPositions( self, data, date ):
-        oid = None
+    def buyPositions( self, data, date, stocks = None ):
+        # Splits the cash evenly over the stocks (default nextStock) and
+        # returns the oids of the buy orders
+        oids = []
 
-        cash = self.portfolio.cash
-        s = self.nextStock
+        if stocks is None:
+            stocks = [self.nextStock]
+        cash = self.portfolio.cash / len( stocks )
 
         try:
             priceBuyFactor = self.priceBuyFactor
@@ -317,174 +442,165 @@ class GMRE( TradingAlgorithm ):
         except:
             priceBuyLimit = 0.0
 
-        price = data[s]['price']
-        amount = math.floor( cash / ( price + priceBuyFactor ) )
-        orderValue = price * amount
+        for s in stocks:
+            price = data[s]['price']
+            amount = math.floor( cash / ( price + priceBuyFactor ) )
+            orderValue = price * amount
 
-        stop = price + priceBuyStop
-        limit = stop + priceBuyLimit
+            stop = price + priceBuyStop
+            limit = stop + priceBuyLimit
 
-        # print('%s: BUY Cash $%s' % (date, self.portfolio.cash))
-        # print('%s: BUY Positions Value $%s' % (date, self.portfolio.positions_value))
+            # print('%s: BUY Cash $%s' % (date, self.portfolio.cash))
+            # print('%s: BUY Positions Value $%s' % (date, self.portfolio.positions_value))
 
-        if cash <= 0 or cash < orderValue:
-            print( '%s: BUY ABORT! cash $%s < orderValue $%s' % ( date, cash, orderValue ) )
-        else:
-            if self.logBuy is True:
+            if cash <= 0 or cash < orderValue:
+                self.eventLog.event( 'INFO', date, 'BUY ABORT! cash $%s < orderValue $%s', cash, orderValue, symbol = s, cash = cash )
+            else:
                 if self.orderBuyLimits is True:
-                    print( '%s: BUY [%s] %s @ $%s ($%s of $%s) STOP $%s LIMIT $%s' % ( date, s, amount, price, orderValue, cash, stop, limit ) )
+                    self.eventLog.event( 'BUY', date, 'BUY [%s] %s @ $%s ($%s of $%s) STOP $%s LIMIT $%s', s, amount, price, orderValue, cash, stop, limit,
+                                         symbol = s, amount = amount, price = price, cash = cash, stop = stop, limit = limit )
                 else:
-                    print( '%s: BUY [%s] %s @ $%s ($%s of $%s) MARKET' % ( date, s, amount, price, orderValue, cash ) )
+                    self.eventLog.event( 'BUY', date, 'BUY [%s] %s @ $%s ($%s of $%s) MARKET', s, amount, price, orderValue, cash,
+                                         symbol = s, amount = amount, price = price, cash = cash )
 
+                if self.orderBuyLimits is True:
+                    oid = self.order( s, amount, limit_price = limit, stop_price = stop )
+                else:
+                    oid = self.order( s, amount )
 
-            if self.orderBuyLimits is True:
-                oid = self.order( s, amount, limit_price = limit, stop_price = stop )
-            else:
-                oid = self.order( s, amount )
+                oids.append( self.orderManager.submit( oid, self.buyFilled ) )
+                self.buyCount += 1
 
-            self.buyCount += 1
+        return oids
+
+    def sellsFilled( self, data, dateStr ):
+        # Every sell of the rotation filled; buy the next holding
+        self.eventLog.event( 'SELL', dateStr, 'SELL ORDERS COMPLETED' )
+        self.buyPositions( data, dateStr )
+        self.currentStock = self.nextStock
+        self.nextStock = None
 
-        return oid
+    def buyFilled( self, oid, orderObj, data, dateStr ):
+        self.eventLog.event( 'BUY', dateStr, 'BUY ORDER COMPLETED [%s]', orderObj.sid, symbol = orderObj.sid )
 
     def handle_data( self, data ):
 
         # Default appears to be 100000.0 to start - trying to find way to set that...
         date = self.get_datetime()
-        month = int( date.month )
-        # day = int( date.day )
-        # year = int( date.year )
-        # dayNum = int(date.strftime("%j"))
+
+        if self.skipAhead and not self.orderManager.busy() and not self.scheduler.dueOn( date ):
+            # Nothing to rank or fill: mark to market only
+            self.recordBar( date )
+            self.tracker.update( date, self.portfolio.portfolio_value )
+            self.barReady( date )
+            return
+
         dateStr = date.strftime( '%Y-%m-%d' )
 
-        datapanel = self.accumulateData.handle_data( data )
+        window = self.dataWindow( date )
+
+        self.recordBar( date )
 
-        if datapanel is None:
+        if window is None:
             # There is insufficient data accumulated to process
-            if self.logWarn is True:
-                print( '%s: INSUFFICIENT DATA!' % dateStr )
+            self.eventLog.event( 'WARN', dateStr, 'INSUFFICIENT DATA!' )
             return
 
-        if self.logWarn is True and self.portfolio.cash < 0:
-            print( '%s: NEGATIVE CASH %s' % ( dateStr, self.portfolio.cash ) )
-
-        if self.oidSell is not None:
-            orderObj = self.blotter.orders[self.oidSell]
-            if orderObj.filled == orderObj.amount:
-                # Good to buy next holding
-                if self.logSell is True:
-                    print( '%s: SELL ORDER COMPLETED' % dateStr )
-                self.oidSell = None
-                self.oidBuy = self.buyPositions( data, dateStr )
-                self.currentStock = self.nextStock
-                self.nextStock = None
-            else:
-                if self.logSell is True:
-                    print( '%s: SELL ORDER *NOT* COMPLETED' % dateStr )
-                return
+        if self.portfolio.cash < 0:
+            self.eventLog.event( 'WARN', dateStr, 'NEGATIVE CASH %s', self.portfolio.cash, cash = self.portfolio.cash )
 
-        if self.oidBuy is not None:
-            orderObj = self.blotter.orders[self.oidBuy]
-            if orderObj.filled == orderObj.amount:
-                if self.logBuy is True:
-                    print( '%s: BUY ORDER COMPLETED' % dateStr )
-                self.oidBuy = None
-            else:
-                if self.logBuy is True:
-                    print( '%s: BUY ORDER *NOT* COMPLETED' % dateStr )
-                    print( '%s: [%s] PRICE %s' % ( dateStr, self.currentStock, data[self.currentStock]['price'] ) )
-                return
+        # Calls buyFilled/sellsFilled for the orders filled on this bar
+        self.orderManager.update( data, dateStr )
 
-        # if int(year) == 2013 and int(month) == 11 and int(day) > 25:
-        # print('CurrentDayNum %s, DayNum %s, Year %s, day %s, month %s' % (self.currentDayNum, dayNum, year, day, month))
-        # if self.currentDayNum != None:
-        #    print('PlusDaynum %s + 29 = %s' % (self.currentDayNum, (self.currentDayNum + 29)))
-
-        if not self.dateStart:
-            self.dateStart = date
-            self.cashStart = self.portfolio.cash
-
-        # if not self.currentDayNum or dayNum < self.currentDayNum or (self.currentDayNum + 29) <= dayNum or (year == 2013 and month == 11 and day == 27):
-        if not self.currentMonth or self.currentMonth != month:
-            # self.currentDayNum = dayNum
-            self.currentMonth = month
-            self.cagr()
-            self.period_performance()
-            self.period_start_portfolio_value = self.portfolio.portfolio_value
-        else:
+        self.tracker.update( date, self.portfolio.portfolio_value )
+
+        if self.orderManager.busy():
+            # No ranking until the rotation's orders have filled
+            if self.eventLog.enabled( 'WARN' ):
+                self.eventLog.event( 'WARN', dateStr, 'ORDERS *NOT* COMPLETED %s', self.orderManager.openOrders() )
+            return
+
+        self.barReady( date )
+
+        # Rebalance day of boundaryTrade (stays due while orders are open)
+        if not self.scheduler.due( dateStr ):
             return
 
+        self.scheduler.advance( dateStr )
+        self.periodStarted()
+
         # At this point the stocks need to be ranked
 
         # Ensure stocks are only traded if possible.
         # (e.g) EDV doesn't start trading until late 2007, without
         # this, any backtest run before that date would fail.
-        stocks = []
-        for s in self.basket.values():
-            # if date > s.security_start_date:
-            stocks.append( s )
+        if self.universe is not None:
+            stocks = self.universe.liveSymbols( dateStr, self.metricPeriod )
+        else:
+            stocks = list( self.basket.values() )
 
-        best = self.getBestStock( dateStr, datapanel, stocks )
+        if not stocks:
+            self.eventLog.event( 'WARN', dateStr, 'NO STOCKS LISTED' )
+            return
+
+        if self.allocation != 'BEST':
+            stockRanks, best = self.rankStocks( dateStr, window, stocks )
+            self.rebalance( data, dateStr, stocks, allocation.targetWeights( stockRanks, self.allocation, self.topCount ) )
+            self.record( buy = self.buyCount, sell = self.sellCount, cash = self.portfolio.cash, pnl = self.portfolio.pnl )
+            return
+
+        best = self.getBestStock( dateStr, window, stocks )
 
         if best is not None:
             if ( self.currentStock == best ):
                 # Hold current
-                if self.logHold is True:
-                    print( '%s: HOLD [%s]' % ( dateStr, self.currentStock ) )
+                self.eventLog.event( 'HOLD', dateStr, 'HOLD [%s]', self.currentStock, symbol = self.currentStock )
                 return
             elif ( self.currentStock is None ):
                 # Buy best
                 self.currentStock = best
                 self.nextStock = best
-                self.oidBuy = self.buyPositions( data, dateStr )
+                self.buyPositions( data, dateStr )
             else:
                 # Sell ALL and Buy best
                 self.nextStock = best
-                print( '%s: BUYING [%s]' % ( dateStr, best ) )
+                self.eventLog.event( 'INFO', dateStr, 'BUYING [%s]', best, symbol = best )
                 if self.hasPositions():
-                    self.oidSell = self.sellPositions( dateStr )
+                    self.orderManager.whenFilled( self.sellPositions( dateStr ), self.sellsFilled )
                 else:
-                    self.oidBuy = self.buyPositions( data, dateStr )
+                    self.buyPositions( data, dateStr )
         else:
-            print( '%s: COULD NOT FIND A BEST STOCK! BEST STOCK IS *NONE*' % dateStr )
+            self.eventLog.event( 'INFO', dateStr, 'COULD NOT FIND A BEST STOCK! BEST STOCK IS *NONE*' )
 
         # NOTE: record() can ONLY handle five elements in the graph. Any more than that will runtime error once 5 are exceeded.
+        # Set recordPath to keep any number of series with gmrelib.recorder.
         self.record( buy = self.buyCount, sell = self.sellCount, cash = self.portfolio.cash, pnl = self.portfolio.pnl )
 
-    def period_performance( self ):
-        if ( self.period_start_portfolio_value is not None and self.portfolio.portfolio_value > 0 ):
-            date = self.get_datetime()
-            dateStr = date.strftime( '%Y-%m-%d' )
-            performance = ( self.portfolio.portfolio_value / self.period_start_portfolio_value )
-            print( '%s: PREVIOUS PERIOD PERFORMANCE %s%%' % ( dateStr, ( ( performance - 1.0 ) * 100 ) ) )
-
-    def cagr( self ):
-
-        # Default appears to be 100000.0 to start - trying to find way to set that...
-        date = self.get_datetime()
-        dateStr = date.strftime( '%Y-%m-%d' )
+    def barReady( self, date ):
+        # Every bar with data and no open orders, rebalance day or not
+        pass
 
-        cagr_period = "Start"
-        inverse_period = 0
+    def periodStarted( self ):
+        # Rebalance day: log the CAGR and the period just ended
+        self.cagr()
+        self.period_performance()
 
-        # Calculate Compound Annual Growth Rate (CAGR)
-        dateDelta = date - self.dateStart
-        period = 365.2425
+    def period_performance( self ):
+        # Return of the period just ended; starts the next one
+        performance = self.tracker.startPeriod()
+        if ( performance is not None and self.portfolio.portfolio_value > 0 ):
+            dateStr = self.get_datetime().strftime( '%Y-%m-%d' )
+            self.eventLog.event( 'INFO', dateStr, 'PREVIOUS PERIOD PERFORMANCE %s%%', ( performance * 100 ), performance = performance )
 
-        if ( dateDelta.days > 365 ):
-            cagr_period = "Yearly"
-            inverse_period = 1.0 / ( dateDelta.days / period )
-        elif ( dateDelta.days > 0 ):
-            if ( dateDelta.days > 28 and dateDelta.days <= 365 ):
-                cagr_period = "Monthly"
-                inverse_period = 1.0 / ( dateDelta.days / ( period / 12 ) )
-            else:
-                cagr_period = "Daily"
-                inverse_period = 1.0 / ( dateDelta.days )
+    def cagr( self ):
 
-        performance = ( self.portfolio.portfolio_value / self.cashStart )
-        cagr = pow( performance, inverse_period ) - 1.0
+        # Compound Annual Growth Rate (CAGR) since the first bar with data
+        dateStr = self.get_datetime().strftime( '%Y-%m-%d' )
+        cagr_period, cagr = self.tracker.cagr()
+        cagr_period = cagr_period.capitalize()
 
-        print( '%s: %s CAGR %s%%, PNL $%s, CASH $%s, PORTFOLIO $%s' % ( dateStr, cagr_period, ( cagr * 100 ), self.portfolio.pnl, self.portfolio.cash, self.portfolio.portfolio_value ) )
+        self.eventLog.event( 'INFO', dateStr, '%s CAGR %s%%, PNL $%s, CASH $%s, PORTFOLIO $%s', cagr_period, ( cagr * 100 ),
+                             self.portfolio.pnl, self.portfolio.cash, self.portfolio.portfolio_value, cagr = cagr, portfolio = self.portfolio.portfolio_value )
 
         return cagr
 
@@ -497,12 +613,32 @@ class GMRE( TradingAlgorithm ):
 #    print("Couldn't %s :: %s" % (cmd, returnCode))
 #    sys.exit()
 
-start = datetime( *startDateTime )
-end = datetime( *endDateTime )
-
-data = load_bars_from_yahoo( stocks = basket, indexes = {}, start = start, end = end, adjusted = priceAdjusted )
-
-gmre = GMRE()
-perf = gmre.run( data )
-# Get the CAGR
-gmre.cagr()
+def loadData( stocks = None, start = None, end = None ):
+    # Bars of the stocks (default basket) from start to end (default
+    # startDateTime to endDateTime)
+    stocks = basket if stocks is None else stocks
+    start = datetime( *startDateTime ) if start is None else start
+    end = datetime( *endDateTime ) if end is None else end
+
+    if columnarPath is not None:
+        # Minute sessions are aggregated to daily bars
+        return columnar.loadPanel( columnar.ColumnarBars( columnarPath ), stocks, start, end )
+
+    if barStorePath is not None:
+        # Only the days missing from the store are downloaded
+        return barstore.loadBars( barstore.BarStore( barStorePath ), stocks, start, end, priceAdjusted, fetch = load_bars_from_yahoo )
+
+    return load_bars_from_yahoo( stocks = stocks, indexes = {}, start = start, end = end, adjusted = priceAdjusted )
+
+if __name__ == '__main__':
+    data = loadData()
+
+    gmre = GMRE()
+    gmre.universe = universe.fromPanel( data, listingDates, list( gmre.basket.values() ) )
+    if featurePath is not None:
+        gmre.featureStore = features.openFeatures( featurePath, data, gmre.metricPeriod, gmre.periodVolatility, gmre.algoVolatility,
+                                                   priceAdjusted )
+    perf = gmre.run( data )
+    # Get the CAGR
+    gmre.cagr()
+    gmre.eventLog.close()
@@ -0,0 +1,80 @@
+# Global Market Rotation Enhanced (GMRE) - Bar Ingestion
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# Fills the bar store (barStorePath of gmre.py) with the daily bars of
+# a whole universe at once (gmrelib.ingest), so the backtests then run
+# from the store.
+#
+# NOTE: Run with Python 3.7+ and aiohttp installed; gmre.py keeps
+# running on Python 2 and reads the store.
+#
+# Symbols come from symbolsPath (one per line) or the symbols list.
+# Only the days the store doesn't cover yet are downloaded.  Set
+# mockServer = True to ingest from gmrelib.barserver on localhost
+# (synthetic bars, nothing leaves the machine).
+
+from datetime import datetime
+
+import pytz
+
+from gmrelib import barserver
+from gmrelib import barstore
+from gmrelib import ingest
+
+barStorePath = 'gmre-bars'
+provider = 'YAHOO'  # YAHOO|QUANDL
+providerOptions = {}  # e.g. {'baseUrl': ..., 'apiKey': ..., 'codes': {'MDY': 'GOOG/NYSE_MDY'}}
+symbolsPath = None  # File with one symbol per line, or None for symbols
+symbols = ['MDY', 'IEV', 'EEM', 'ILF', 'EPP', 'EDV', 'ZIV', 'SHY']
+startDateTime = [2011, 1, 1, 0, 0, 0, 0, pytz.utc]
+endDateTime = [2014, 10, 20, 0, 0, 0, 0, pytz.utc]
+priceAdjusted = True
+
+concurrency = 32  # Parallel requests
+rate = 20  # Requests per second, None for no limit
+retries = 3
+mockServer = False
+
+
+def loadSymbols():
+    if symbolsPath is None:
+        return symbols
+    with open( symbolsPath ) as f:
+        return [line.strip().upper() for line in f if line.strip() and not line.startswith( '#' )]
+
+
+if __name__ == '__main__':
+    server = None
+    options = dict( providerOptions )
+    if mockServer:
+        server = barserver.BarServer().start()
+        options['baseUrl'] = server.url
+
+    universe = loadSymbols()
+    try:
+        errors = ingest.ingest( barstore.BarStore( barStorePath ), ingest.getProvider( provider, **options ), universe,
+                                datetime( *startDateTime ), datetime( *endDateTime ), priceAdjusted,
+                                concurrency = concurrency, rate = rate, retries = retries )
+    finally:
+        if server is not None:
+            server.stop()
+
+    for symbol in sorted( errors ):
+        for error in errors[symbol]:
+            print( 'FAILED %s' % error )
+    print( 'INGESTED %s OF %s SYMBOLS INTO %s' % ( len( universe ) - len( errors ), len( universe ), barStorePath ) )
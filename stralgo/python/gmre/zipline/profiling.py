@@ -0,0 +1,89 @@
+# Global Market Rotation Enhanced (GMRE) - Phase Profile
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# Runs the GMRE backtest of gmre.py (same data and settings) with its
+# handle_data phases timed from the outside (gmrelib.profiling), then
+# prints the time of each phase and a histogram of its call times:
+#   accumulate - dataWindow (the lookback window view)
+#   metrics    - getStockMetrics / the feature store lookup
+#   ranking    - rankStocks
+#   orders     - order updates, sells, buys and rebalances
+#   logging    - event log
+#   record     - recordBar and the recorder
+#   analytics  - the performance tracker
+# The self time of every phase stack is written to foldedPath for
+# flamegraph.pl or speedscope.  With cProfilePath the whole run is also
+# profiled by cProfile (pstats file for snakeviz, gprof2dot, ...).
+
+import cProfile
+
+from gmre import GMRE, loadData, featurePath, listingDates, priceAdjusted
+from gmrelib import features
+from gmrelib import profiling
+from gmrelib import universe
+
+foldedPath = 'gmre-phases.folded'  # or None
+cProfilePath = None  # e.g. 'gmre.prof', or None
+
+PHASES = {
+    'handle_data': 'handle_data',
+    'recordBar': 'record',
+    'dataWindow': 'accumulate',
+    'getStockMetrics': 'metrics',
+    'rankStocks': 'ranking',
+    'sellPositions': 'orders',
+    'buyPositions': 'orders',
+    'rebalance': 'orders',
+    'buyTargets': 'orders',
+}
+
+
+def instrumentGMRE( profiler, algo ):
+    # After configure() and the featureStore are set, they replace the
+    # instrumented objects
+    profiler.instrument( algo, PHASES )
+    profiler.instrument( algo.featureStore, {'metrics': 'metrics'} )
+    profiler.instrument( algo.orderManager, {'update': 'orders'} )
+    profiler.instrument( algo.eventLog, {'event': 'logging'} )
+    profiler.instrument( algo.recorder, {'record': 'record'} )
+    profiler.instrument( algo.tracker, {'update': 'analytics'} )
+
+
+if __name__ == '__main__':
+    data = loadData()
+
+    gmre = GMRE()
+    gmre.universe = universe.fromPanel( data, listingDates, list( gmre.basket.values() ) )
+    if featurePath is not None:
+        gmre.featureStore = features.openFeatures( featurePath, data, gmre.metricPeriod, gmre.periodVolatility, gmre.algoVolatility,
+                                                   priceAdjusted )
+
+    profiler = profiling.PhaseProfiler()
+    instrumentGMRE( profiler, gmre )
+
+    if cProfilePath is not None:
+        profile = cProfile.Profile()
+        profile.runcall( gmre.run, data )
+        profile.dump_stats( cProfilePath )
+    else:
+        gmre.run( data )
+
+    print( profiler.report() )
+
+    if foldedPath is not None:
+        profiler.writeFolded( foldedPath )
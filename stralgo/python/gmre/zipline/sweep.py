@@ -0,0 +1,157 @@
+# Global Market Rotation Enhanced (GMRE) - Parameter Sweep
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# Runs the GMRE backtest of gmre.py for every point of a parameter grid
+# on a process pool (gmrelib.sweep).  The bars are loaded once with the
+# settings of gmre.py (dates, basket, barStorePath) and shared with the
+# workers.  Each configuration adds a row of CAGR, final portfolio
+# value and trade counts to resultsPath.
+#
+# Any GMRE.initialize setting can be swept, e.g. factorPerformance,
+# factorVolatility, metricPeriod, periodVolatility, algoVolatility or
+# basket (a list of symbols that must be in the loaded bars).
+#
+# engine = 'FAST' screens the grid with gmrelib.backtest (rebalance days
+# only, no Zipline event loop); confirm the best rows with 'ZIPLINE'.
+#
+# Both engines use the listingDates and featurePath of gmre.py.  The
+# universe of every basket and the feature store of every metric setting
+# of the grid are built once, before the workers start (prepareSweep).
+
+from gmre import GMRE, loadData, featurePath, listingDates, priceAdjusted
+from gmrelib import backtest
+from gmrelib import features
+from gmrelib import sweep
+from gmrelib import universe
+
+resultsPath = 'gmre-sweep.csv'
+processes = None  # Worker processes, None for one per core
+engine = 'ZIPLINE'  # ZIPLINE|FAST
+
+grid = {
+    'factorPerformance': [0.5, 0.6, 0.7, 0.8, 0.9],
+    'factorVolatility': [0.1, 0.2, 0.3, 0.4, 0.5],
+    'metricPeriod': [42, 63, 84, 105],
+    'periodVolatility': [21],
+}
+
+# Settings applied to every configuration
+fixed = {
+    'logWarn': False,
+    'logBuy': False,
+    'logSell': False,
+    'logHold': False,
+    'logInfo': False,
+}
+
+
+def configureGMRE( params, shared = None ):
+    # GMRE with the settings of params and the universe and feature
+    # store prepared for them by prepareSweep()
+    algo = GMRE()
+    settings = dict( fixed )
+    settings.update( params )
+    algo.configure( **settings )
+
+    if shared is not None:
+        algo.universe = shared['universes'][tuple( algo.basket.values() )]
+        algo.featureStore = shared['featureStores'].get( featureKey( algo ) )
+    return algo
+
+
+def featureKey( algo ):
+    return ( algo.metricPeriod, algo.periodVolatility, algo.algoVolatility )
+
+
+def prepareSweep( grid, data ):
+    # One universe per basket and one feature store per (metricPeriod,
+    # periodVolatility, algoVolatility) of the grid, built by the parent
+    # before the workers start and shared with them as gmre.py sets them
+    universes = {}
+    featureStores = {}
+    for params in sweep.expandGrid( grid ):
+        algo = configureGMRE( params )
+        stocks = tuple( algo.basket.values() )
+        if stocks not in universes:
+            universes[stocks] = universe.fromPanel( data, listingDates, list( stocks ) )
+        key = featureKey( algo )
+        if featurePath is not None and key not in featureStores:
+            featureStores[key] = features.openFeatures( featurePath, data, algo.metricPeriod, algo.periodVolatility,
+                                                        algo.algoVolatility, priceAdjusted )
+
+    return {
+        'data': data,
+        'universes': universes,
+        'featureStores': featureStores,
+    }
+
+
+def runGMRE( params, shared ):
+    algo = configureGMRE( params, shared )
+
+    perf = algo.run( shared['data'] )
+
+    summary = algo.tracker.summary()
+
+    return {
+        'cagr': summary['cagr'],
+        'maxDrawdown': summary['maxDrawdown'],
+        'sharpe': summary['sharpe'],
+        'portfolioValue': perf['portfolio_value'][-1],
+        'buyCount': algo.buyCount,
+        'sellCount': algo.sellCount,
+    }
+
+
+def runFastGMRE( params, shared ):
+    algo = configureGMRE( params, shared )
+
+    stocks = list( algo.basket.values() )
+    result = backtest.backtestPanel( shared['data'], stocks, algo.factorPerformance, algo.factorVolatility, algo.metricPeriod,
+                                     algo.periodVolatility, algo.algoVolatility, algo.volatilityWeights,
+                                     featureStore = algo.featureStore, listingDates = listingDates, priceBuyFactor = algo.priceBuyFactor, boundaryTrade = algo.boundaryTrade,
+                                     boundaryDays = algo.boundaryDays )
+
+    return {
+        'cagr': result['cagr'],
+        'portfolioValue': result['portfolioValue'][-1],
+        'buyCount': result['buyCount'],
+        'sellCount': result['sellCount'],
+    }
+
+
+if __name__ == '__main__':
+    data = loadData()
+
+    # The workers share the parent's universes and feature stores
+    shared = prepareSweep( grid, data )
+
+    runner = runFastGMRE if engine == 'FAST' else runGMRE
+    rows = sweep.runSweep( runner, grid, shared, processes = processes )
+    sweep.writeTable( resultsPath, rows )
+
+    for row in rows:
+        if row['error']:
+            print( 'FAILED %s %s' % ( dict( ( k, row[k] ) for k in grid ), row['error'] ) )
+
+    succeeded = [r for r in rows if not r['error']]
+    if succeeded:
+        best = max( succeeded, key = lambda r: r['cagr'] )
+        print( 'BEST CAGR %s%% %s' % ( best['cagr'] * 100, dict( ( k, best[k] ) for k in grid ) ) )
+    else:
+        print( 'NO CONFIGURATION SUCCEEDED, SEE %s' % resultsPath )
@@ -0,0 +1,57 @@
+# Global Market Rotation Enhanced (GMRE) - Ranking Variants
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# The 3 volatility x 4 performance mode rankings of gmre-quandl.jl for
+# the basket and dates of gmre.py (gmrelib.variants).  Prints the 12
+# rankings of the last day, best first, and how often each variant
+# picked the same stock as GROUPING/CLOSE (GMRE's own ranking when
+# stride is periodVolatility) over every day with a full lookback.
+
+from gmre import GMRE, loadData
+from gmrelib import features
+from gmrelib import ranking
+from gmrelib import variants
+
+window = 20  # Bars of a volatility window
+stride = None  # Bars between GROUPING windows, None for window (Julia); GMRE uses periodVolatility
+
+
+if __name__ == '__main__':
+    data = loadData()
+
+    algo = GMRE()
+    stocks = list( algo.basket.values() )
+    prices = [features.panelPrices( data, field, stocks ) for field in features.FIELDS]
+    weights = [algo.volatilityWeights.get( s, 1.0 ) for s in stocks]
+
+    performance, volatility = variants.variantMetrics( *( prices + [window, algo.metricPeriod, stride] ) )
+    ranks = variants.rankVariants( performance, volatility, algo.factorPerformance, algo.factorVolatility, weights )
+    best = variants.bestVariants( ranks )
+
+    for v, vMode in enumerate( variants.VOLATILITY_MODES ):
+        for p, pMode in enumerate( variants.PERFORMANCE_MODES ):
+            last = ranks[v, p, -1]
+            print( '%s/%s %s' % ( vMode, pMode, [( stocks[i], round( float( last[i] ), 4 ) ) for i in ranking.rankOrder( last )] ) )
+
+    # Agreement with the GMRE ranking (GROUPING volatility, CLOSE performance)
+    days = best[0, 0] >= 0
+    gmre = best[variants.VOLATILITY_MODES.index( 'GROUPING' ), variants.PERFORMANCE_MODES.index( 'CLOSE' )]
+    for v, vMode in enumerate( variants.VOLATILITY_MODES ):
+        agree = [( best[v, p][days] == gmre[days] ).mean() for p in range( len( variants.PERFORMANCE_MODES ) )]
+        print( '%-8s SAME BEST AS GROUPING/CLOSE %s' % ( vMode, ' '.join( '%s %.0f%%' % ( m, a * 100 ) for m, a in
+                                                                          zip( variants.PERFORMANCE_MODES, agree ) ) ) )
@@ -0,0 +1,108 @@
+# Global Market Rotation Enhanced (GMRE) - Walk-Forward Optimization
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# TRADING PLATFORM: Quantopian's Zipline
+
+# ABOUT:
+# Walk-forward optimization of the GMRE ranking parameters
+# (gmrelib.walkforward).  Every fold fits factorPerformance,
+# factorVolatility and metricPeriod on inSample trading days with the
+# fast path and then runs GMRE in Zipline on the following outSample
+# days.  Folds run in parallel, one per core; one row per fold is
+# written to resultsPath.
+#
+# The Zipline run of a fold starts metricPeriod - 1 days before the
+# out-of-sample window so GMRE ranks on its first day.
+
+from gmre import GMRE, loadData, listingDates, priceAdjusted
+from gmrelib import features
+from gmrelib import sweep
+from gmrelib import universe
+from gmrelib import walkforward
+
+resultsPath = 'gmre-walkforward.csv'
+processes = None  # Worker processes, None for one per core
+
+inSample = 504  # 2 years of trading days
+outSample = 126  # 6 months of trading days
+featurePath = None  # Feature store root (gmrelib.features) kept between runs, or None
+
+grid = {
+    'factorPerformance': [0.5, 0.6, 0.7, 0.8, 0.9],
+    'factorVolatility': [0.1, 0.2, 0.3, 0.4, 0.5],
+    'metricPeriod': [42, 63, 84, 105],
+}
+
+# Settings applied to every Zipline run
+fixed = {
+    'logWarn': False,
+    'logBuy': False,
+    'logSell': False,
+    'logHold': False,
+    'logInfo': False,
+}
+
+
+def runOutOfSample( params, fold, data ):
+    start = max( fold['outStart'] - ( params['metricPeriod'] - 1 ), 0 )
+    panel = data['panel']
+    days = panel.major_axis[start:fold['outEnd']]
+    window = panel.ix[:, days, :]
+
+    algo = GMRE()
+    settings = dict( fixed )
+    settings.update( params )
+    algo.configure( **settings )
+
+    # Listing dates and features from the whole panel (the stores the
+    # in-sample fits already computed)
+    algo.universe = universe.fromPanel( panel, listingDates, list( algo.basket.values() ) )
+    if featurePath is not None:
+        algo.featureStore = features.openFeatures( featurePath, panel, algo.metricPeriod, algo.periodVolatility, algo.algoVolatility,
+                                                   priceAdjusted )
+
+    perf = algo.run( window )
+
+    summary = algo.tracker.summary()
+
+    return {
+        'cagr': summary['cagr'],
+        'maxDrawdown': summary['maxDrawdown'],
+        'sharpe': summary['sharpe'],
+        'portfolioValue': perf['portfolio_value'][-1],
+        'buyCount': algo.buyCount,
+        'sellCount': algo.sellCount,
+    }
+
+
+if __name__ == '__main__':
+    data = loadData()
+
+    algo = GMRE()
+    stocks = list( algo.basket.values() )
+
+    rows = walkforward.walkForward( data, stocks, grid, inSample, outSample, periodVolatility = algo.periodVolatility,
+                                    algoVolatility = algo.algoVolatility, volatilityWeights = algo.volatilityWeights,
+                                    outOfSample = runOutOfSample, featureRoot = featurePath, processes = processes,
+                                    adjusted = priceAdjusted, listingDates = listingDates, priceBuyFactor = algo.priceBuyFactor )
+    sweep.writeTable( resultsPath, rows )
+
+    for row in rows:
+        if row['error']:
+            print( 'FOLD %s FAILED %s' % ( row['fold'], row['error'] ) )
+            continue
+        print( '%s - %s: %s %s %s IN %s%% OUT %s%%' % ( row['outStartDate'], row['outEndDate'], row['factorPerformance'],
+                                                          row['factorVolatility'], row['metricPeriod'], row['inSampleCagr'] * 100,
+                                                          row['outCagr'] * 100 ) )
@@ -0,0 +1,22 @@
+# GMRE Library - Shared components for the Global Market Rotation Enhanced strategies
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Vectorized building blocks shared by the Zipline GMRE algorithms and
+# the research tooling.  Everything operates on NumPy arrays laid out
+# as symbols x bars so a whole basket is processed in one call.
+#
+# The stralgo/python project directory must be on the PYTHONPATH (PyDev
+# does this for the imported project) for 'import gmrelib' to resolve.
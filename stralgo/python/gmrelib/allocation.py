@@ -0,0 +1,108 @@
+# GMRE Library - Multi-Asset Target Weights and Rebalancing
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Turns the gmrelib.ranking ranks of a basket into target weights and
+# the orders that move the current positions to them, all as array
+# operations that stay linear in the basket size:
+#   BEST  - everything in the best rank (GMRE's single holding)
+#   TOP   - equal weights over the topCount best ranks
+#   SCORE - weights proportional to the rank over the topCount best
+#           (ranks are 0..1 combinations of the normalized metrics)
+# Unranked (NaN) symbols always get 0.
+#
+# rebalanceOrders() diffs target shares against the held shares;
+# trades smaller than band * portfolio value are skipped so drift alone
+# doesn't trade every rebalance.  affordableBuys() scales the buys down
+# to the cash available once the sells have filled.
+
+import numpy as np
+
+ALLOCATIONS = ['BEST', 'TOP', 'SCORE']
+
+
+def topMask( ranks, topCount ):
+    # True for the topCount best ranked symbols (argpartition, O(n))
+    ranks = np.asarray( ranks, dtype = np.float64 )
+    ranked = np.flatnonzero( ~np.isnan( ranks ) )
+    mask = np.zeros( len( ranks ), dtype = bool )
+    if len( ranked ) <= topCount:
+        mask[ranked] = True
+    elif topCount > 0:
+        top = np.argpartition( -ranks[ranked], topCount - 1 )[:topCount]
+        mask[ranked[top]] = True
+    return mask
+
+
+def targetWeights( ranks, allocation = 'BEST', topCount = 1 ):
+    # Weights (summing to 1, or all 0 when nothing is ranked)
+    ranks = np.asarray( ranks, dtype = np.float64 )
+    weights = np.zeros( len( ranks ) )
+
+    if allocation not in ALLOCATIONS:
+        raise ValueError( 'Unknown allocation %s, expected one of %s' % ( allocation, ALLOCATIONS ) )
+
+    ranked = ~np.isnan( ranks )
+    if not ranked.any():
+        return weights
+
+    if allocation == 'BEST':
+        # First of equal ranks, as ranking.rankBasket picks it
+        weights[np.argmax( np.where( ranked, ranks, -np.inf ) )] = 1.0
+        return weights
+
+    mask = topMask( ranks, topCount )
+    if allocation == 'TOP':
+        weights[mask] = 1.0
+    else:
+        weights[mask] = np.maximum( ranks[mask], 0.0 )
+        if weights.sum() == 0:
+            weights[mask] = 1.0
+
+    return weights / weights.sum()
+
+
+def rebalanceOrders( weights, prices, held, portfolioValue, priceBuyFactor = 0.0, band = 0.0 ):
+    # Share deltas (negative to sell) from the held shares to the target
+    # weights of portfolioValue at prices; 0 where nothing trades
+    weights = np.asarray( weights, dtype = np.float64 )
+    prices = np.asarray( prices, dtype = np.float64 )
+    held = np.asarray( held, dtype = np.float64 )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        target = np.floor( weights * portfolioValue / ( prices + priceBuyFactor ) )
+    target = np.where( np.isfinite( target ), target, 0.0 )
+
+    # A symbol without a price can't be traded either way
+    deltas = np.where( np.isnan( prices ), 0.0, target - held )
+
+    if band > 0:
+        with np.errstate( invalid = 'ignore' ):
+            small = np.abs( deltas * prices ) < band * portfolioValue
+        # Always close a position that leaves the targets entirely
+        small &= ~( ( target == 0 ) & ( held != 0 ) )
+        deltas = np.where( small, 0.0, deltas )
+
+    return deltas.astype( np.int64 )
+
+
+def affordableBuys( deltas, prices, cash, priceBuyFactor = 0.0 ):
+    # Positive deltas scaled down (floor) so their cost fits in cash
+    buys = np.maximum( np.asarray( deltas, dtype = np.float64 ), 0.0 )
+    with np.errstate( invalid = 'ignore' ):
+        cost = np.where( buys > 0, buys * ( np.asarray( prices, dtype = np.float64 ) + priceBuyFactor ), 0.0 ).sum()
+    if cost > cash:
+        buys = np.floor( buys * max( cash, 0.0 ) / cost )
+    return buys.astype( np.int64 )
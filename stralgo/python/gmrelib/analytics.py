@@ -0,0 +1,174 @@
+# GMRE Library - Incremental Performance Analytics
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Running performance state of a backtest, updated in O(1) per bar from
+# the portfolio value instead of recomputing from dateStart/cashStart:
+#   - equity curve (amortized O(1) appends)
+#   - peak, drawdown and maximum drawdown
+#   - CAGR, with GMRE.cagr()'s DAILY/MONTHLY/YEARLY annualization
+#   - Sharpe and Sortino ratios of the per bar returns (Welford running
+#     mean/variance, no risk free rate, sqrt(252) annualized)
+#   - monthly returns (month end over previous month end)
+#   - the return of the current rotation period (startPeriod())
+# At the end of the run summary() and the accessors answer from the
+# running state; no second pass over the portfolio history.
+
+import math
+
+import numpy as np
+
+YEAR_DAYS = 365.2425
+TRADING_DAYS = 252
+
+
+def cagrPeriod( days ):
+    # (name, exponent) GMRE.cagr() annualizes 'days' calendar days with
+    if days > 365:
+        return 'YEARLY', 1.0 / ( days / YEAR_DAYS )
+    if days > 28:
+        return 'MONTHLY', 1.0 / ( days / ( YEAR_DAYS / 12 ) )
+    if days > 0:
+        return 'DAILY', 1.0 / days
+    return 'START', 0
+
+
+class PerformanceTracker( object ):
+
+    def __init__( self, capacity = 1024 ):
+        self.bars = 0
+        self.dates = [None] * capacity
+        self.values = np.empty( capacity )
+
+        self.startDate = None
+        self.startValue = None
+        self.lastDate = None
+        self.lastValue = None
+
+        self.peak = None
+        self.drawdown = 0.0
+        self.maxDrawdown = 0.0
+        self.maxDrawdownDate = None
+
+        # Welford running mean / sum of squared deviations of the returns
+        self.returns = 0
+        self.meanReturn = 0.0
+        self.squaredDeviations = 0.0
+        self.downsideSquares = 0.0
+
+        self.monthKey = None
+        self.monthStartValue = None
+        self.monthly = []  # [((year, month), return), ...]
+
+        self.periodStartValue = None
+
+    def update( self, date, value ):
+        # One bar's (datetime) portfolio value
+        if self.bars == len( self.values ):
+            self.values = np.resize( self.values, 2 * len( self.values ) )
+            self.dates.extend( [None] * len( self.dates ) )
+        self.dates[self.bars] = date
+        self.values[self.bars] = value
+        self.bars += 1
+
+        if self.startValue is None:
+            self.startDate = date
+            self.startValue = value
+            self.peak = value
+            self.monthKey = ( date.year, date.month )
+            self.monthStartValue = value
+        else:
+            r = value / self.lastValue - 1.0
+            self.returns += 1
+            delta = r - self.meanReturn
+            self.meanReturn += delta / self.returns
+            self.squaredDeviations += delta * ( r - self.meanReturn )
+            if r < 0:
+                self.downsideSquares += r * r
+
+            month = ( date.year, date.month )
+            if month != self.monthKey:
+                # The previous bar closed the month
+                self.monthly.append( ( self.monthKey, self.lastValue / self.monthStartValue - 1.0 ) )
+                self.monthKey = month
+                self.monthStartValue = self.lastValue
+
+        if value > self.peak:
+            self.peak = value
+        self.drawdown = value / self.peak - 1.0
+        if self.drawdown < self.maxDrawdown:
+            self.maxDrawdown = self.drawdown
+            self.maxDrawdownDate = date
+
+        self.lastDate = date
+        self.lastValue = value
+
+    def startPeriod( self ):
+        # Return since the previous startPeriod() (None the first time)
+        # and start a new period at the last value
+        previous = self.periodStartValue
+        self.periodStartValue = self.lastValue
+        if previous is None or previous <= 0:
+            return None
+        return self.lastValue / previous - 1.0
+
+    def days( self ):
+        if self.startDate is None:
+            return 0
+        return ( self.lastDate - self.startDate ).days
+
+    def cagr( self ):
+        # (period name, CAGR) as GMRE.cagr() annualizes it
+        if self.startValue is None:
+            return 'START', 0.0
+        name, exponent = cagrPeriod( self.days() )
+        return name, pow( self.lastValue / self.startValue, exponent ) - 1.0
+
+    def sharpe( self ):
+        if self.returns < 2 or self.squaredDeviations <= 0:
+            return float( 'nan' )
+        deviation = math.sqrt( self.squaredDeviations / ( self.returns - 1 ) )
+        return self.meanReturn / deviation * math.sqrt( TRADING_DAYS )
+
+    def sortino( self ):
+        if self.returns < 2 or self.downsideSquares <= 0:
+            return float( 'nan' )
+        deviation = math.sqrt( self.downsideSquares / self.returns )
+        return self.meanReturn / deviation * math.sqrt( TRADING_DAYS )
+
+    def monthlyReturns( self ):
+        # [((year, month), return), ...] including the month in progress
+        if self.monthKey is None:
+            return []
+        return self.monthly + [( self.monthKey, self.lastValue / self.monthStartValue - 1.0 )]
+
+    def equity( self ):
+        # (dates, values) of every bar
+        return self.dates[:self.bars], self.values[:self.bars]
+
+    def summary( self ):
+        period, cagr = self.cagr()
+        return {
+            'startDate': self.startDate,
+            'endDate': self.lastDate,
+            'startValue': self.startValue,
+            'endValue': self.lastValue,
+            'cagr': cagr,
+            'cagrPeriod': period,
+            'maxDrawdown': self.maxDrawdown,
+            'maxDrawdownDate': self.maxDrawdownDate,
+            'sharpe': self.sharpe(),
+            'sortino': self.sortino(),
+        }
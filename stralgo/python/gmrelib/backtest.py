@@ -0,0 +1,236 @@
+# GMRE Library - Fast Path Rotation Backtest
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Replays the GMRE rotation of zipline/gmre.py without Zipline's per
+# bar event loop, for screening configurations in milliseconds before
+# confirming them in Zipline.  Only the rebalance days are visited; the
+# daily cash, holdings and portfolio value are filled in afterwards from
+# the trades.
+#
+# The order flow of GMRE.handle_data is kept:
+#   - the first ranking happens once metricPeriod bars are available,
+#     then on the rebalance days of the gmrelib.schedule rule (first
+#     trading day of every month by default)
+#   - rankings use the gmrelib.features metrics of that day
+#   - a switch sells everything; the buy is placed the day the sell is
+#     filled, sized floor(cash / (price + priceBuyFactor)) on that day's
+#     price
+#   - orders fill from the next bar on with Zipline's
+#     VolumeShareSlippage (volumeLimit of the bar volume per bar,
+#     price impact volumeShare^2 * priceImpact) and a per share
+#     commission (Zipline's default PerShare 0.03)
+#   - no ranking happens while an order is open
+# Market orders only; orderBuyLimits/orderSellLimits aren't modelled.
+
+import math
+
+import numpy as np
+
+from gmrelib import features
+from gmrelib import ranking
+from gmrelib import schedule as gmreSchedule
+from gmrelib import sweep
+from gmrelib import universe
+
+
+def rebalanceDays( dates, firstDay, boundaryTrade = 'MONTH', boundaryDays = 21 ):
+    # firstDay and the later rebalance days of the gmrelib.schedule rule
+    # (default the first trading day of every month)
+    later = gmreSchedule.rebalanceIndexes( dates, boundaryTrade, boundaryDays )
+    return np.concatenate( ( [firstDay], later[later > firstDay] ) ).astype( int )
+
+
+def fillOrder( amount, day, prices, volumes, volumeLimit = 1.0, priceImpact = 0.01 ):
+    # Fills [(day, shares, price), ...] of an order of 'amount' shares
+    # (negative to sell) placed on 'day', as VolumeShareSlippage fills it
+    direction = 1 if amount > 0 else -1
+    remaining = abs( amount )
+    fills = []
+
+    for d in range( day + 1, len( prices ) ):
+        if remaining <= 0:
+            break
+        price = prices[d]
+        volume = volumes[d]
+        if not volume > 0 or math.isnan( price ):
+            continue
+
+        shares = int( min( volumeLimit * volume, remaining ) )
+        if shares < 1:
+            continue
+
+        volumeShare = min( shares / float( volume ), volumeLimit )
+        impact = volumeShare ** 2 * math.copysign( priceImpact, direction ) * price
+        fills.append( ( d, direction * shares, price + impact ) )
+        remaining -= shares
+
+    return fills
+
+
+def runBacktest( dates, closePrices, volumes, performance, volatility, factorPerformance, factorVolatility, metricPeriod,
+                 volatilityWeights = None, capitalBase = 100000.0, priceBuyFactor = 0.0, volumeLimit = 1.0,
+                 priceImpact = 0.01, commissionPerShare = 0.03, firstDay = None, live = None, boundaryTrade = 'MONTH',
+                 boundaryDays = 21 ):
+    # closePrices/volumes are symbols x dates, performance/volatility
+    # dates x symbols (gmrelib.features.computeFeatures).  Returns a dict
+    # of daily 'portfolioValue', 'cash' and 'holding' (symbol index, -1
+    # for cash) arrays, the 'rebalances' [(day, best)], the 'trades'
+    # [(day, symbol, shares, price, commission)], buy/sell counts and
+    # the CAGR from the first ranking day.  firstDay (default
+    # metricPeriod - 1, the first full window) is the first ranking day;
+    # earlier when the metrics were computed over a longer history.
+    # live (dates x symbols bool, gmrelib.universe) leaves the symbols
+    # that aren't live on a day out of that day's ranking.
+    # boundaryTrade/boundaryDays select GMRE's rebalance rule.
+    closePrices = np.asarray( closePrices, dtype = np.float64 )
+    volumes = np.asarray( volumes, dtype = np.float64 )
+    symbols, days = closePrices.shape
+
+    cashDelta = np.zeros( days )
+    sharesDelta = np.zeros( ( days, symbols ) )
+    rebalances = []
+    trades = []
+    buyCount = 0
+    sellCount = 0
+
+    cash = capitalBase
+    current = -1
+    held = 0
+    ready = 0  # First day without an open order
+
+    def execute( symbol, amount, day ):
+        fills = fillOrder( amount, day, closePrices[symbol], volumes[symbol], volumeLimit, priceImpact )
+        value = 0.0
+        for d, shares, price in fills:
+            commission = abs( shares ) * commissionPerShare
+            cashDelta[d] -= shares * price + commission
+            sharesDelta[d, symbol] += shares
+            value -= shares * price + commission
+            trades.append( ( d, symbol, shares, price, commission ) )
+        filled = sum( f[1] for f in fills )
+        # An unfilled order stays open to the end of the data
+        end = fills[-1][0] if filled == amount else days
+        return value, filled, end
+
+    def buy( symbol, day, cash ):
+        price = closePrices[symbol, day]
+        if cash <= 0 or math.isnan( price ):
+            return 0.0, 0, day
+        amount = int( math.floor( cash / ( price + priceBuyFactor ) ) )
+        if amount < 1:
+            return 0.0, 0, day
+        return execute( symbol, amount, day )
+
+    if firstDay is None:
+        firstDay = metricPeriod - 1
+    if days <= firstDay:
+        schedule = []
+    else:
+        schedule = rebalanceDays( dates, firstDay, boundaryTrade, boundaryDays )
+
+    lastDay = -1
+    for day in schedule:
+        # GMRE.handle_data returns early until its orders are filled and
+        # ranks on the day they complete
+        day = max( int( day ), ready )
+        if day >= days or day <= lastDay:
+            continue
+        lastDay = day
+
+        dayPerformance = performance[day]
+        dayVolatility = volatility[day]
+        if live is not None:
+            # Not live symbols are left out of the normalization too
+            dayPerformance = np.where( live[day], dayPerformance, np.nan )
+            dayVolatility = np.where( live[day], dayVolatility, np.nan )
+
+        ranks, best = ranking.rankBasket( dayPerformance, dayVolatility, factorPerformance, factorVolatility, volatilityWeights )
+        best = -1 if best is None else best
+        rebalances.append( ( day, best ) )
+
+        if best < 0 or best == current:
+            continue
+
+        if current >= 0 and held > 0:
+            value, filled, end = execute( current, -held, day )
+            cash += value
+            held += filled
+            sellCount += 1
+            if held != 0:
+                ready = days
+                continue
+            day = end
+
+        current = best
+        value, held, ready = buy( best, day, cash )
+        cash += value
+        if held:
+            buyCount += 1
+
+    cashSeries = capitalBase + np.cumsum( cashDelta )
+    shares = np.cumsum( sharesDelta, axis = 0 )
+    with np.errstate( invalid = 'ignore' ):
+        positions = np.where( shares != 0, shares * closePrices.T, 0.0 ).sum( axis = 1 )
+    portfolioValue = cashSeries + positions
+
+    holding = np.where( ( shares != 0 ).any( axis = 1 ), np.argmax( shares != 0, axis = 1 ), -1 )
+
+    growth = 0.0
+    if len( schedule ):
+        dayDates = np.asarray( dates, dtype = 'datetime64[D]' )
+        elapsed = int( ( dayDates[-1] - dayDates[schedule[0]] ) / np.timedelta64( 1, 'D' ) )
+        growth = sweep.cagr( capitalBase, portfolioValue[-1], elapsed )
+
+    return {
+        'portfolioValue': portfolioValue,
+        'cash': cashSeries,
+        'holding': holding,
+        'rebalances': rebalances,
+        'trades': trades,
+        'buyCount': buyCount,
+        'sellCount': sellCount,
+        'cagr': growth,
+    }
+
+
+def backtestPanel( panel, stocks, factorPerformance, factorVolatility, metricPeriod, periodVolatility, algoVolatility = 'RS',
+                   volatilityWeights = None, featureStore = None, listingDates = None, **fills ):
+    # Fast path over a Zipline data panel (items are symbols).  Metrics
+    # come from the featureStore when given, else they are computed.
+    # With listingDates ({symbol: date}) a symbol is only ranked once it
+    # has metricPeriod bars of data since its listing.
+    dates = np.asarray( [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis], dtype = 'datetime64[D]' )
+    closePrices = features.panelPrices( panel, 'close', stocks )
+    volumes = features.panelPrices( panel, 'volume', stocks )
+
+    if featureStore is not None:
+        rows = [featureStore.dateIndex[str( d )] for d in dates]
+        cols = featureStore.columns( stocks )
+        performance = featureStore.performance[rows][:, cols]
+        volatility = featureStore.volatility[rows][:, cols]
+    else:
+        prices = [features.panelPrices( panel, field, stocks ) for field in features.FIELDS]
+        performance, volatility = features.computeFeatures( *( prices + [metricPeriod, periodVolatility, algoVolatility] ) )
+
+    if isinstance( volatilityWeights, dict ):
+        volatilityWeights = [volatilityWeights.get( s, 1.0 ) for s in stocks]
+
+    if listingDates is not None:
+        available = universe.availability( closePrices, dates, stocks, listingDates )
+        fills['live'] = universe.Universe( stocks, dates, available ).liveMasks( metricPeriod )
+
+    return runBacktest( dates, closePrices, volumes, performance, volatility, factorPerformance, factorVolatility, metricPeriod,
+                        volatilityWeights = volatilityWeights, **fills )
@@ -0,0 +1,141 @@
+# GMRE Library - Local Bar Server
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Stand-in for the Yahoo and Quandl bar APIs on localhost so
+# gmrelib.ingest runs offline (Python 3, standard library only):
+#   /table.csv?s=MDY&a=0&b=3&c=2011&d=...   Yahoo table.csv, newest first
+#   /api/v3/datasets/GOOG/NYSE_MDY.json?start_date=...&end_date=...
+# Every symbol exists; its bars are the gmrelib.synthetic random walk
+# seeded by the symbol name, so the same request always returns the
+# same bars.  failRate answers that fraction of requests with HTTP 503
+# and latency delays every response, to exercise the retries.
+#
+#   server = BarServer( failRate = 0.1 ).start()
+#   ingest( store, YahooCSV( server.url ), symbols, start, end )
+#   server.stop()
+
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from gmrelib import synthetic
+
+FIRST_DAY = '2000-01-03'
+DAYS = 6000
+
+
+def symbolBars( symbol, start, end ):
+    # (days, bars) of symbol between the start and end datetime64[D]
+    seed = zlib.crc32( symbol.encode( 'utf-8' ) ) & 0x7fffffff
+    days, bars = synthetic.dailyBars( 1, DAYS, seed, FIRST_DAY )
+    keep = ( days >= start ) & ( days <= end )
+    return days[keep], dict( ( field, bars[field][0][keep] ) for field in synthetic.FIELDS )
+
+
+def yahooCsv( days, bars ):
+    lines = ['Date,Open,High,Low,Close,Volume,Adj Close']
+    for i in range( len( days ) - 1, -1, -1 ):
+        lines.append( '%s,%.4f,%.4f,%.4f,%.4f,%d,%.4f' % ( days[i], bars['open'][i], bars['high'][i], bars['low'][i],
+                                                        bars['close'][i], bars['volume'][i], bars['close'][i] ) )
+    return ( '\n'.join( lines ) + '\n' ).encode( 'utf-8' )
+
+
+def quandlJson( code, days, bars ):
+    data = [[str( days[i] ), bars['open'][i], bars['high'][i], bars['low'][i], bars['close'][i], bars['volume'][i]]
+            for i in range( len( days ) )]
+    dataset = {'dataset_code': code, 'column_names': ['Date', 'Open', 'High', 'Low', 'Close', 'Volume'], 'data': data}
+    return json.dumps( {'dataset': dataset} ).encode( 'utf-8' )
+
+
+class BarHandler( BaseHTTPRequestHandler ):
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive for the pooled client
+
+    def do_GET( self ):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep( server.latency )
+        if random.random() < server.failRate:
+            return self.reply( 503, b'Service Unavailable', 'text/plain' )
+
+        url = urlparse( self.path )
+        query = dict( ( k, v[0] ) for k, v in parse_qs( url.query ).items() )
+        try:
+            if url.path == '/table.csv':
+                start = date( int( query['c'] ), int( query['a'] ) + 1, int( query['b'] ) )
+                end = date( int( query['f'] ), int( query['d'] ) + 1, int( query['e'] ) )
+                days, bars = symbolBars( query['s'], np.datetime64( start ), np.datetime64( end ) )
+                return self.reply( 200, yahooCsv( days, bars ), 'text/csv' )
+
+            if url.path.startswith( '/api/v3/datasets/' ) and url.path.endswith( '.json' ):
+                code = url.path[len( '/api/v3/datasets/' ):-len( '.json' )]
+                symbol = code.split( '/' )[-1].split( '_' )[-1]
+                days, bars = symbolBars( symbol, np.datetime64( query['start_date'] ), np.datetime64( query['end_date'] ) )
+                return self.reply( 200, quandlJson( code, days, bars ), 'application/json' )
+        except ( KeyError, ValueError ) as e:
+            return self.reply( 400, str( e ).encode( 'utf-8' ), 'text/plain' )
+
+        self.reply( 404, b'Not Found', 'text/plain' )
+
+    def reply( self, status, body, contentType ):
+        self.send_response( status )
+        self.send_header( 'Content-Type', contentType )
+        self.send_header( 'Content-Length', str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message( self, format, *args ):
+        pass
+
+
+class BarServer( object ):
+
+    def __init__( self, port = 0, failRate = 0.0, latency = 0.0 ):
+        # port 0 picks a free port (see url)
+        self.httpd = ThreadingHTTPServer( ( '127.0.0.1', port ), BarHandler )
+        self.httpd.daemon_threads = True
+        self.httpd.failRate = failRate
+        self.httpd.latency = latency
+        self.httpd.requests = 0
+        self.thread = None
+
+    @property
+    def url( self ):
+        return 'http://127.0.0.1:%s' % self.httpd.server_address[1]
+
+    @property
+    def requests( self ):
+        return self.httpd.requests
+
+    def start( self ):
+        self.thread = threading.Thread( target = self.httpd.serve_forever )
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop( self ):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
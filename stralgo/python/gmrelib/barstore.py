@@ -0,0 +1,232 @@
+# GMRE Library - Local Bar Store
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Content-addressed on-disk store of daily bars so a backtest doesn't
+# re-download every bar (or wipe ~/.zipline/data) on each run.
+#
+#   <root>/objects/<sha256>.npz   bars of one symbol; the file name is the
+#                                 checksum of its dates and columns
+#   <root>/manifest.json          'adjusted/MDY' -> object and the date
+#                                 range it covers
+#
+# The checksum is taken over the arrays, not the .npz file (whose zip
+# entries carry the write time), so identical bars always map to the
+# same object and re-ingesting unchanged bars writes nothing.  Objects
+# are verified against their checksum when read.  Missing days
+# are fetched and appended (merged into a new object), anything already
+# covered is read locally, so runs work offline once the range has been
+# ingested.  Yahoo style CSV files and Parquet files (needs pyarrow or
+# fastparquet for pandas.read_parquet) can be ingested directly.
+#
+# Bars use the load_bars_from_yahoo columns: open, high, low, close,
+# volume, price (price is the adjusted close).
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+import pandas
+import pytz
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'price']
+
+
+def storeKey( symbol, adjusted ):
+    return '%s/%s' % ( 'adjusted' if adjusted else 'raw', symbol )
+
+
+def dayString( date ):
+    return date.strftime( '%Y-%m-%d' )
+
+
+def barsChecksum( days, arrays ):
+    # sha256 of the datetime64[D] days and the COLUMNS arrays, in order
+    sha = hashlib.sha256()
+    sha.update( np.ascontiguousarray( days, dtype = 'datetime64[D]' ).view( np.int64 ).tobytes() )
+    for c in COLUMNS:
+        sha.update( c.encode( 'utf-8' ) )
+        sha.update( np.ascontiguousarray( arrays[c], dtype = np.float64 ).tobytes() )
+    return sha.hexdigest()
+
+
+def adjustBars( frame, adjusted ):
+    # Yahoo columns (Date, Open, High, Low, Close, Volume, Adj Close) to
+    # store columns, adjusting O/H/L/C as load_bars_from_yahoo does
+    frame = frame.rename( columns = lambda c: c.strip().lower().replace( ' ', '_' ) )
+    if 'date' in frame.columns:
+        frame = frame.set_index( 'date' )
+    frame.index = pandas.to_datetime( frame.index )
+    if frame.index.tz is None:
+        frame.index = frame.index.tz_localize( pytz.utc )
+
+    if 'price' not in frame.columns:
+        frame['price'] = frame['adj_close'] if 'adj_close' in frame.columns else frame['close']
+
+    if adjusted:
+        ratio = ( frame['price'] / frame['close'] ).fillna( 0 ).values
+        for col in ['open', 'high', 'low', 'close']:
+            frame[col] = frame[col] * ratio
+
+    return frame[COLUMNS].sort_index()
+
+
+class BarStore( object ):
+
+    def __init__( self, root ):
+        self.root = root
+        self.objects = os.path.join( root, 'objects' )
+        self.manifestPath = os.path.join( root, 'manifest.json' )
+
+        if not os.path.isdir( self.objects ):
+            os.makedirs( self.objects )
+
+        self.superseded = []  # Objects to delete once the manifest no longer names them
+        self.manifest = {}
+        if os.path.exists( self.manifestPath ):
+            with open( self.manifestPath ) as f:
+                self.manifest = json.load( f )
+
+    def saveManifest( self ):
+        fd, path = tempfile.mkstemp( dir = self.root )
+        with os.fdopen( fd, 'w' ) as f:
+            json.dump( self.manifest, f, indent = 1, sort_keys = True )
+        os.rename( path, self.manifestPath )
+
+        # Only now nothing on disk refers to the superseded objects; drop
+        # them unless another key still uses them
+        used = set( e['object'] for e in self.manifest.values() )
+        for checksum in self.superseded:
+            path = os.path.join( self.objects, checksum + '.npz' )
+            if checksum not in used and os.path.exists( path ):
+                os.remove( path )
+        self.superseded = []
+
+    def writeObject( self, frame ):
+        days = frame.index.tz_convert( pytz.utc ).tz_localize( None ).values.astype( 'datetime64[D]' )
+        arrays = dict( ( c, frame[c].values.astype( np.float64 ) ) for c in COLUMNS )
+
+        checksum = barsChecksum( days, arrays )
+        target = os.path.join( self.objects, checksum + '.npz' )
+        if os.path.exists( target ):
+            # Same bars already stored
+            return checksum
+
+        fd, path = tempfile.mkstemp( dir = self.objects, suffix = '.npz' )
+        os.close( fd )
+        np.savez_compressed( path, dates = days, **arrays )
+        os.rename( path, target )
+
+        return checksum
+
+    def readObject( self, checksum ):
+        path = os.path.join( self.objects, checksum + '.npz' )
+        with np.load( path ) as bars:
+            days = bars['dates']
+            arrays = dict( ( c, bars[c] ) for c in COLUMNS )
+
+        if barsChecksum( days, arrays ) != checksum:
+            raise ValueError( 'Bar store object %s failed checksum validation' % path )
+
+        index = pandas.DatetimeIndex( days.astype( 'datetime64[ns]' ) ).tz_localize( pytz.utc )
+        return pandas.DataFrame( arrays, index = index, columns = COLUMNS )
+
+    def coverage( self, symbol, adjusted ):
+        # (start, end) 'YYYY-MM-DD' range ingested for the symbol or None
+        entry = self.manifest.get( storeKey( symbol, adjusted ) )
+        if entry is None:
+            return None
+        return entry['start'], entry['end']
+
+    def missing( self, symbol, start, end, adjusted ):
+        # Date ranges within [start, end] that still have to be fetched
+        covered = self.coverage( symbol, adjusted )
+        if covered is None:
+            return [( start, end )]
+
+        ranges = []
+        first = pandas.Timestamp( covered[0] ).to_pydatetime().replace( tzinfo = start.tzinfo )
+        last = pandas.Timestamp( covered[1] ).to_pydatetime().replace( tzinfo = end.tzinfo )
+        if start < first:
+            ranges.append( ( start, first - timedelta( days = 1 ) ) )
+        if end > last:
+            ranges.append( ( last + timedelta( days = 1 ), end ) )
+        return ranges
+
+    def ingest( self, symbol, frame, start, end, adjusted, save = True ):
+        # Merge bars covering [start, end] into the symbol's object.
+        # New bars replace stored bars for the same day.  Bulk ingestion
+        # passes save = False and calls saveManifest() once in a while.
+        key = storeKey( symbol, adjusted )
+        entry = self.manifest.get( key )
+        frame = frame[COLUMNS]
+
+        if entry is not None:
+            stored = self.readObject( entry['object'] )
+            frame = pandas.concat( [stored[~stored.index.isin( frame.index )], frame] ).sort_index()
+            start = min( dayString( start ), entry['start'] )
+            end = max( dayString( end ), entry['end'] )
+        else:
+            start = dayString( start )
+            end = dayString( end )
+
+        self.manifest[key] = {'object': self.writeObject( frame ), 'start': start, 'end': end}
+        if entry is not None:
+            # Deleted by saveManifest() once the saved manifest no longer names it
+            self.superseded.append( entry['object'] )
+        if save:
+            self.saveManifest()
+
+    def ingestFile( self, path, symbol = None, adjusted = True ):
+        # Ingest a Yahoo style CSV or a Parquet file; the symbol defaults
+        # to the file name (e.g. MDY.csv)
+        if symbol is None:
+            symbol = os.path.splitext( os.path.basename( path ) )[0].upper()
+
+        if path.lower().endswith( '.parquet' ):
+            frame = pandas.read_parquet( path )
+        else:
+            frame = pandas.read_csv( path )
+
+        frame = adjustBars( frame, adjusted )
+        self.ingest( symbol, frame, frame.index[0].to_pydatetime(), frame.index[-1].to_pydatetime(), adjusted )
+
+    def load( self, symbol, start, end, adjusted ):
+        entry = self.manifest[storeKey( symbol, adjusted )]
+        bars = self.readObject( entry['object'] )
+        return bars[( bars.index >= start ) & ( bars.index <= end )]
+
+
+def loadBars( store, stocks, start, end, adjusted = True, fetch = None ):
+    # Panel of the stocks like load_bars_from_yahoo.  Days the store
+    # doesn't cover are fetched with fetch (e.g. load_bars_from_yahoo,
+    # called with the same keyword arguments) and ingested; without fetch
+    # the store must already cover the range.
+    pending = {}
+    for s in stocks:
+        for r in store.missing( s, start, end, adjusted ):
+            pending.setdefault( r, [] ).append( s )
+
+    for ( first, last ), symbols in sorted( pending.items() ):
+        if fetch is None:
+            raise ValueError( 'Bar store %s is missing %s from %s to %s' % ( store.root, symbols, dayString( first ), dayString( last ) ) )
+        panel = fetch( stocks = symbols, indexes = {}, start = first, end = last, adjusted = adjusted )
+        for s in symbols:
+            store.ingest( s, panel[s], first, last, adjusted )
+
+    return pandas.Panel( dict( ( s, store.load( s, start, end, adjusted ) ) for s in stocks ) )
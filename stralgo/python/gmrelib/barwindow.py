@@ -0,0 +1,97 @@
+# GMRE Library - Sliding Bar Window
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Lookback windows of the loaded bars (the Zipline source panel, e.g.
+# from gmrelib.barstore) in place of a batch_transform DataPanel.  The
+# bars are copied once into one contiguous fields x days x symbols
+# array and a window is a view of it: the length days ending at the
+# current bar (the bar itself included, as batch_transform), None until
+# there are that many.  Nothing is copied or allocated per bar beyond
+# the view, and any number of lengths can be taken from the same bar
+# (e.g. a performance and a volatility lookback).
+#
+# The current bar is found by moving a day pointer forward, so bars can
+# be skipped (skipAhead) and each call stays O(1) over a run.
+#
+#   bars = fromPanel( data, symbols = ['MDY', 'EDV'] )
+#   window = bars.window( date, 63 )                 # fields x 63 x symbols view
+#   performance, volatility = bars.windows( date, ( 63, 21 ) )
+#   bars.prices( window, 'close', ['MDY'] )          # symbols x days
+
+import numpy as np
+
+from gmrelib import features
+
+
+class BarWindow( object ):
+
+    def __init__( self, dates, symbols, bars, fields = features.FIELDS ):
+        # bars: fields x dates x symbols
+        self.dates = np.asarray( dates, dtype = 'datetime64[D]' )
+        self.days = self.dates.tolist()  # datetime.date
+        self.symbols = list( symbols )
+        self.fields = list( fields )
+        self.bars = np.ascontiguousarray( bars, dtype = np.float64 )
+        self.fieldIndex = dict( ( f, i ) for i, f in enumerate( self.fields ) )
+        self.symbolIndex = dict( ( s, i ) for i, s in enumerate( self.symbols ) )
+        self.end = 0  # Days up to and including the current bar
+
+    def moveTo( self, date ):
+        # Current bar is the last day on or before date (a datetime);
+        # returns the number of days up to it
+        day = date.date()
+        days = self.days
+        end = self.end
+        if end > 0 and days[end - 1] > day:
+            # Moved back (a new run): search from the start
+            end = 0
+        while end < len( days ) and days[end] <= day:
+            end += 1
+        self.end = end
+        return end
+
+    def window( self, date, length ):
+        # fields x length x symbols view ending at date, None if fewer days
+        end = self.moveTo( date )
+        if end < length:
+            return None
+        return self.bars[:, end - length:end]
+
+    def windows( self, date, lengths ):
+        # One view per length, None if there are fewer days than the longest
+        end = self.moveTo( date )
+        if end < max( lengths ):
+            return None
+        return [self.bars[:, end - length:end] for length in lengths]
+
+    def columns( self, symbols ):
+        return [self.symbolIndex[s] for s in symbols]
+
+    def prices( self, window, field, symbols = None ):
+        # symbols x days of field from a window; a view for all symbols
+        prices = window[self.fieldIndex[field]].T
+        if symbols is None or symbols == self.symbols:
+            return prices
+        return prices[self.columns( symbols )]
+
+
+def fromPanel( panel, symbols = None, fields = features.FIELDS ):
+    # BarWindow over a Zipline data panel (items are symbols)
+    if symbols is None:
+        symbols = list( panel.items )
+    dates = [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis]
+    bars = np.array( [features.panelPrices( panel, field, symbols ).T for field in fields] )
+    return BarWindow( dates, symbols, bars, fields )
@@ -0,0 +1,141 @@
+# GMRE Library - Benchmark Timing and Baselines
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Times a benchmark case and compares it to a JSON baseline:
+#   - best and median wall time of repeat calls (after one warm-up call)
+#   - throughput in items (e.g. symbol bars) per second of the best time
+#   - peak memory allocated during one call (tracemalloc, which numpy
+#     reports its arrays to; the process peak RSS where tracemalloc
+#     isn't available, i.e. Python 2)
+# A case is a regression when its best time is more than tolerance
+# slower than the baseline's; peak memory is reported, not gated.
+#
+#   results = [measure( 'rank', lambda: rank( data ), items = 500 )]
+#   regressions = compare( results, loadBaseline( path ), 0.25 )
+#   writeBaseline( path, results, {'symbols': 500} )
+
+import gc
+import json
+import platform
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+clock = getattr( time, 'perf_counter', time.time )
+
+
+def peakMemory( function ):
+    # Bytes allocated at the peak of one call
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    function()
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on OS X
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss * scale
+
+
+def measure( name, function, items = 1, repeat = 5 ):
+    # Times function() repeat times; returns the case's result dict
+    function()
+
+    times = []
+    for i in range( repeat ):
+        start = clock()
+        function()
+        times.append( clock() - start )
+    times.sort()
+
+    best = times[0]
+    return {
+        'name': name,
+        'items': items,
+        'repeat': repeat,
+        'best': best,
+        'median': times[len( times ) // 2],
+        'throughput': items / best if best > 0 else None,
+        'peakMemory': peakMemory( function ),
+    }
+
+
+def skipped( name, reason ):
+    return {'name': name, 'skipped': reason}
+
+
+def compare( results, baseline, tolerance = 0.25 ):
+    # [(name, best, baseline best)] of the cases more than tolerance
+    # slower than the baseline; cases missing on either side are ignored
+    previous = dict( ( r['name'], r ) for r in baseline.get( 'results', [] ) if 'best' in r )
+    regressions = []
+    for r in results:
+        if 'best' in r and r['name'] in previous:
+            before = previous[r['name']]['best']
+            if r['best'] > before * ( 1.0 + tolerance ):
+                regressions.append( ( r['name'], r['best'], before ) )
+    return regressions
+
+
+def loadBaseline( path ):
+    try:
+        with open( path ) as f:
+            return json.load( f )
+    except IOError:
+        return {}
+
+
+def writeBaseline( path, results, sizes ):
+    baseline = {
+        'created': time.strftime( '%Y-%m-%dT%H:%M:%S' ),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'results': results,
+    }
+    with open( path, 'w' ) as f:
+        json.dump( baseline, f, indent = 2, sort_keys = True )
+
+
+def report( results, regressions = () ):
+    # One line per case
+    slow = dict( ( r[0], r ) for r in regressions )
+    lines = []
+    for r in results:
+        if 'skipped' in r:
+            lines.append( '%-24s SKIPPED (%s)' % ( r['name'], r['skipped'] ) )
+            continue
+        memory = '-' if r['peakMemory'] is None else '%.1f MB' % ( r['peakMemory'] / 1e6 )
+        line = '%-24s %10.3f ms  %14.0f items/s  %10s' % ( r['name'], r['best'] * 1e3, r['throughput'] or 0, memory )
+        if r['name'] in slow:
+            line += '  REGRESSION (baseline %.3f ms)' % ( slow[r['name']][2] * 1e3 )
+        lines.append( line )
+    return '\n'.join( lines )
@@ -0,0 +1,271 @@
+# GMRE Library - Memory-Mapped Columnar OHLCV Bars
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Fixed width, memory-mapped OHLCV format for multi-year minute (or
+# daily) histories of a whole basket.  Each field is one .npy file of
+# float64 shaped symbols x days x barsPerDay (390 for minute bars, 1 for
+# daily) so any day or window of days is a view into the mapped file
+# rather than a copy.  Bars that don't exist are NaN.
+#
+#   <path>/open.npy, high.npy, low.npy, close.npy, volume.npy, price.npy
+#   <path>/dates.npy     datetime64[D] session dates (days)
+#   <path>/index.npy     per-symbol [first, last + 1) day with data
+#   <path>/meta.json     symbols, fields, barsPerDay
+#
+# Minute bars are placed by minute of the regular session (09:31 to
+# 16:00 US/Eastern is slot 0 to 389), so DST shifts don't move them.
+# convertFiles() builds the format from Yahoo/Quandl daily CSV files or
+# minute CSV/Parquet files (a timestamp column, then open, high, low,
+# close, volume), reading the dates of every file and then one file at
+# a time.  price is the adjusted close as in gmrelib.barstore (the close
+# of minute bars).
+#
+# loadPanel() is the data source of gmre.py (columnarPath): the daily
+# bars of the basket as load_bars_from_yahoo returns them, minute
+# sessions aggregated to daily bars (gmrelib.resample) a block of days
+# at a time, so a multi-year minute history is never read whole.
+
+import json
+import os
+
+import numpy as np
+import pandas
+import pytz
+
+from gmrelib import barstore
+from gmrelib import resample
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+COLUMNS = FIELDS + ['price']  # price: the adjusted close (Yahoo's Adj Close)
+MINUTE_BARS = 390
+SESSION_OPEN = 9 * 60 + 31  # First minute bar, US/Eastern
+
+# Days of minute bars aggregated at once by dailyBars()
+CHUNK_DAYS = 64
+
+
+def sessionSlots( index, barsPerDay ):
+    # Slot of each timestamp within its trading day
+    if barsPerDay == 1:
+        return np.zeros( len( index ), dtype = int )
+    local = index.tz_convert( 'US/Eastern' )
+    return np.asarray( local.hour * 60 + local.minute - SESSION_OPEN, dtype = int )
+
+
+def sessionDates( index, barsPerDay ):
+    if barsPerDay > 1:
+        index = index.tz_convert( 'US/Eastern' )
+    return np.asarray( index.strftime( '%Y-%m-%d' ), dtype = 'datetime64[D]' )
+
+
+def writeColumnar( path, days, load, barsPerDay = MINUTE_BARS ):
+    # days: symbol -> session dates (sessionDates()) and load(symbol) its
+    # DataFrame with a tz aware DatetimeIndex and the COLUMNS.  The days
+    # are the union of every symbol's sessions; the symbols are read and
+    # written one at a time.
+    if not os.path.isdir( path ):
+        os.makedirs( path )
+
+    symbols = sorted( days )
+    dates = np.unique( np.concatenate( [days[s] for s in symbols] ) )
+
+    columns = {}
+    for field in COLUMNS:
+        columns[field] = np.lib.format.open_memmap( os.path.join( path, field + '.npy' ), mode = 'w+', dtype = np.float64,
+                                                    shape = ( len( symbols ), len( dates ), barsPerDay ) )
+
+    index = np.zeros( ( len( symbols ), 2 ), dtype = np.int64 )
+    for i, s in enumerate( symbols ):
+        frame = load( s )
+        day = np.searchsorted( dates, sessionDates( frame.index, barsPerDay ) )
+        slot = sessionSlots( frame.index, barsPerDay )
+        inSession = ( slot >= 0 ) & ( slot < barsPerDay )
+
+        for field in COLUMNS:
+            columns[field][i] = np.nan
+            columns[field][i, day[inSession], slot[inSession]] = frame[field].values[inSession]
+
+        if len( day ):
+            index[i] = day.min(), day.max() + 1
+
+    for field in COLUMNS:
+        columns[field].flush()
+
+    np.save( os.path.join( path, 'dates.npy' ), dates )
+    np.save( os.path.join( path, 'index.npy' ), index )
+    with open( os.path.join( path, 'meta.json' ), 'w' ) as f:
+        json.dump( {'symbols': [str( s ) for s in symbols], 'fields': COLUMNS, 'barsPerDay': barsPerDay}, f, sort_keys = True )
+
+    return ColumnarBars( path )
+
+
+def minuteBars( frame ):
+    # Minute bars from a file frame: the first column is the timestamp
+    # (US/Eastern when it has no time zone), then the FIELDS columns.
+    # Minute files aren't adjusted: the price is the close.
+    frame.columns = [str( c ).strip().lower() for c in frame.columns]
+    index = minuteIndex( frame.iloc[:, 0] )
+    bars = frame[FIELDS].astype( np.float64 )
+    bars.index = index
+    bars['price'] = bars['close']
+    return bars.sort_index()
+
+
+def minuteIndex( timestamps ):
+    index = pandas.DatetimeIndex( pandas.to_datetime( timestamps ) )
+    if index.tz is None:
+        index = index.tz_localize( 'US/Eastern' )
+    return index
+
+
+def readFile( f, firstColumn = False ):
+    # Frame of a CSV or Parquet file, or only its first column
+    if f.lower().endswith( '.parquet' ):
+        frame = pandas.read_parquet( f )
+        return frame.iloc[:, :1] if firstColumn else frame
+    return pandas.read_csv( f, usecols = [0] if firstColumn else None )
+
+
+def fileDates( f, barsPerDay ):
+    # Session dates of a file from its first (date or timestamp) column
+    timestamps = readFile( f, firstColumn = True ).iloc[:, 0]
+    if barsPerDay > 1:
+        index = minuteIndex( timestamps )
+    else:
+        index = pandas.DatetimeIndex( pandas.to_datetime( timestamps ) )
+    return np.unique( sessionDates( index, barsPerDay ) )
+
+
+def convertFiles( path, files, adjusted = True, barsPerDay = 1 ):
+    # Daily columnar bars from Yahoo (Date, Open, High, Low, Close, Volume,
+    # Adj Close) or Quandl GOOG/ (Date, Open, High, Low, Close, Volume) CSV
+    # or Parquet files, or minute bars (barsPerDay = MINUTE_BARS, see
+    # minuteBars(); adjusted doesn't apply).  The symbol is taken from the
+    # file name.  The dates are read first, then one file at a time.
+    paths = dict( ( os.path.splitext( os.path.basename( f ) )[0].upper(), f ) for f in files )
+
+    def load( symbol ):
+        frame = readFile( paths[symbol] )
+        if barsPerDay > 1:
+            return minuteBars( frame )
+        return barstore.adjustBars( frame, adjusted )
+
+    days = dict( ( s, fileDates( paths[s], barsPerDay ) ) for s in paths )
+    return writeColumnar( path, days, load, barsPerDay = barsPerDay )
+
+
+def convertBarStore( path, store, stocks, start, end, adjusted = True ):
+    # Daily columnar bars from a gmrelib.barstore.BarStore, one symbol in
+    # memory at a time
+    def load( symbol ):
+        return store.load( symbol, start, end, adjusted )
+
+    days = dict( ( s, sessionDates( load( s ).index, 1 ) ) for s in stocks )
+    return writeColumnar( path, days, load, barsPerDay = 1 )
+
+
+class ColumnarBars( object ):
+
+    def __init__( self, path ):
+        self.path = path
+
+        with open( os.path.join( path, 'meta.json' ) ) as f:
+            meta = json.load( f )
+
+        self.symbols = meta['symbols']
+        self.fields = meta['fields']
+        self.barsPerDay = meta['barsPerDay']
+        self.dates = np.load( os.path.join( path, 'dates.npy' ) )
+        self.index = np.load( os.path.join( path, 'index.npy' ) )
+
+        self.columns = dict( ( f, np.load( os.path.join( path, f + '.npy' ), mmap_mode = 'r' ) ) for f in self.fields )
+
+        self.symbolIndex = dict( ( s, i ) for i, s in enumerate( self.symbols ) )
+        self.dateIndex = dict( ( str( d ), i ) for i, d in enumerate( self.dates ) )
+
+    def dayNumber( self, date ):
+        # Day offset of 'YYYY-MM-DD' (or a date/datetime)
+        if hasattr( date, 'strftime' ):
+            date = date.strftime( '%Y-%m-%d' )
+        return self.dateIndex[date]
+
+    def day( self, date ):
+        # field -> symbols x barsPerDay view of one day
+        d = self.dayNumber( date )
+        return dict( ( f, self.columns[f][:, d, :] ) for f in self.fields )
+
+    def window( self, start, end ):
+        # field -> symbols x days x barsPerDay view of [start, end]
+        first = self.dayNumber( start )
+        last = self.dayNumber( end ) + 1
+        return dict( ( f, self.columns[f][:, first:last, :] ) for f in self.fields )
+
+    def lastDays( self, end, days ):
+        # field -> symbols x days x barsPerDay view of the 'days' sessions ending at 'end'
+        last = self.dayNumber( end ) + 1
+        return dict( ( f, self.columns[f][:, max( last - days, 0 ):last, :] ) for f in self.fields )
+
+    def dayRange( self, start, end ):
+        # [first, last) day offsets of the sessions within [start, end] (datetimes)
+        first = int( np.searchsorted( self.dates, np.datetime64( start.strftime( '%Y-%m-%d' ), 'D' ) ) )
+        last = int( np.searchsorted( self.dates, np.datetime64( end.strftime( '%Y-%m-%d' ), 'D' ), 'right' ) )
+        return first, last
+
+    def dailyBars( self, start, end, symbols = None ):
+        # (dates, field -> symbols x days) daily bars of [start, end];
+        # minute sessions are aggregated CHUNK_DAYS days at a time
+        first, last = self.dayRange( start, end )
+        rows = slice( None ) if symbols is None else [self.symbolIndex[s] for s in symbols]
+        count = len( self.symbols ) if symbols is None else len( rows )
+        fields = [f for f in COLUMNS if f in self.fields]
+        daily = dict( ( f, np.nan * np.ones( ( count, last - first ) ) ) for f in fields )
+
+        step = CHUNK_DAYS if self.barsPerDay > 1 else max( last - first, 1 )
+        for day in range( first, last, step ):
+            stop = min( day + step, last )
+            block = dict( ( f, self.columns[f][rows, day:stop] ) for f in fields )
+            if self.barsPerDay > 1:
+                ochlv, nanCounts = resample.aggregateBars( block['close'], block['high'], block['low'], block['volume'],
+                                                           block['open'] )
+                if 'price' in block:
+                    # The price of the last minute with a bar
+                    ochlv['price'] = resample.firstFinite( block['price'], reverse = True )
+                block = ochlv
+            else:
+                block = dict( ( f, block[f][..., 0] ) for f in fields )
+            for f in fields:
+                daily[f][:, day - first:stop - first] = block[f]
+
+        return self.dates[first:last], daily
+
+    def symbolDays( self, symbol ):
+        # [first, last) day offsets holding data for the symbol
+        first, last = self.index[self.symbolIndex[symbol]]
+        return int( first ), int( last )
+
+
+def loadPanel( bars, stocks, start, end ):
+    # Panel of the stocks like load_bars_from_yahoo (daily bars, price is
+    # the adjusted close the bars were converted with) from ColumnarBars
+    if 'price' not in bars.fields:
+        raise ValueError( 'Columnar bars %s have no price; convert them again' % bars.path )
+
+    dates, daily = bars.dailyBars( start, end, stocks )
+    index = pandas.DatetimeIndex( dates.astype( 'datetime64[ns]' ) ).tz_localize( pytz.utc )
+    frames = {}
+    for i, s in enumerate( stocks ):
+        frames[s] = pandas.DataFrame( dict( ( f, daily[f][i] ) for f in COLUMNS ), index = index, columns = COLUMNS )
+    return pandas.Panel( frames )
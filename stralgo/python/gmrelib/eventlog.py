@@ -0,0 +1,80 @@
+# GMRE Library - Level Gated Event Log
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Replaces the '%s: ...' % (...) prints of the algorithms.  Every event
+# has a category (the logWarn, logBuy, ... flags) and the message is
+# only formatted when its category is enabled, so a disabled category
+# costs one set lookup.  Diagnostics that need extra work (e.g. NaN
+# scans) should check enabled() first.
+#
+# Two sinks:
+#   text - 'date: message' lines on stdout, as the prints were
+#   JSON - one JSON object per line (date, category, message and the
+#          event's fields, e.g. symbol, amount, price) appended to
+#          jsonPath for later analysis
+
+import json
+import sys
+
+# INFO is the CAGR/period reports and trade decisions printed always
+CATEGORIES = ['INFO', 'WARN', 'BUY', 'SELL', 'HOLD', 'RANK', 'DEBUG']
+
+
+class EventLog( object ):
+
+    def __init__( self, enabled = ( 'INFO', 'WARN' ), text = True, jsonPath = None ):
+        for category in enabled:
+            if category not in CATEGORIES:
+                raise ValueError( 'Unknown log category %s' % category )
+
+        self.categories = frozenset( enabled )
+        self.text = text
+        self.jsonPath = jsonPath
+        self.jsonFile = None
+
+    def enabled( self, category ):
+        return category in self.categories
+
+    def event( self, category, date, message, *args, **fields ):
+        # message % args, formatted only when the category is enabled
+        if category not in self.categories:
+            return
+
+        if args:
+            message = message % args
+
+        if self.text:
+            # sys.stdout at write time; sweep workers redirect it
+            sys.stdout.write( '%s: %s\n' % ( date, message ) )
+
+        if self.jsonPath is not None:
+            if self.jsonFile is None:
+                self.jsonFile = open( self.jsonPath, 'a' )
+            record = {'date': str( date ), 'category': category, 'message': message}
+            record.update( fields )
+            self.jsonFile.write( json.dumps( record, sort_keys = True, default = str ) + '\n' )
+
+    def close( self ):
+        if self.jsonFile is not None:
+            self.jsonFile.close()
+            self.jsonFile = None
+
+
+def fromFlags( algo, jsonPath = None, text = True ):
+    # EventLog of the categories whose log<Category> flag (logWarn,
+    # logBuy, ...) is True on algo; INFO unless logInfo is False
+    enabled = [c for c in CATEGORIES if getattr( algo, 'log' + c.capitalize(), c == 'INFO' ) is True]
+    return EventLog( enabled, text = text, jsonPath = jsonPath )
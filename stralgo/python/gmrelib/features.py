@@ -0,0 +1,171 @@
+# GMRE Library - Precomputed Feature Store
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Computes the GMRE per-date, per-symbol performance and volatility
+# once over the loaded bars and stores them as memory-mapped .npy
+# columns so a backtest reads them instead of recomputing from the raw
+# bars on every rebalance.  Row t holds the metrics GMRE.getStockMetrics
+# returns for the metricPeriod window ending at (and including) bar t;
+# rows without a full window are NaN.
+#
+# A store lives in its own directory, named after the parameters that
+# change the features (algoVolatility, metricPeriod, periodVolatility
+# and adjusted or raw prices):
+#   <root>/RS-63-21-ADJ/dates.npy        datetime64[D] (dates)
+#   <root>/RS-63-21-ADJ/symbols.npy      symbol names (symbols)
+#   <root>/RS-63-21-ADJ/performance.npy  float64 (dates x symbols)
+#   <root>/RS-63-21-ADJ/volatility.npy   float64 (dates x symbols)
+#   <root>/RS-63-21-ADJ/meta.json
+# meta.json keeps a checksum of the input bars, so a store is only
+# reused for the same bars; bars that were re-ingested or revised
+# rebuild it.  Sweeps over factorPerformance/factorVolatility reuse the
+# same store.
+
+import hashlib
+import json
+import os
+import numpy as np
+
+from gmrelib import volatility as gmreVolatility
+
+FIELDS = ['open', 'close', 'high', 'low']
+
+# Windows evaluated per chunk; bounds the temporary window arrays
+CHUNK_DATES = 256
+
+
+def featureName( algoVolatility, metricPeriod, periodVolatility, adjusted = True ):
+    return '%s-%s-%s-%s' % ( algoVolatility.upper(), metricPeriod, periodVolatility, 'ADJ' if adjusted else 'RAW' )
+
+
+def pricesChecksum( dates, symbols, prices ):
+    # sha256 of the dates, symbols and price arrays a store is computed from
+    sha = hashlib.sha256()
+    sha.update( np.ascontiguousarray( dates, dtype = 'datetime64[D]' ).view( np.int64 ) )
+    sha.update( '\n'.join( symbols ).encode( 'utf-8' ) )
+    for p in prices:
+        sha.update( np.ascontiguousarray( p, dtype = np.float64 ) )
+    return sha.hexdigest()
+
+
+def panelPrices( panel, field, symbols = None ):
+    # symbols x dates prices from a Zipline/pandas Panel (items are symbols)
+    if symbols is None:
+        symbols = list( panel.items )
+    return np.array( [panel[s][field].values for s in symbols], dtype = np.float64 )
+
+
+def windows( prices, length ):
+    # Read-only view of every 'length' bar window: (dates - length + 1) x symbols x length
+    prices = np.ascontiguousarray( prices )
+    symbols, dates = prices.shape
+    step = prices.strides
+    return np.lib.stride_tricks.as_strided( prices, shape = ( dates - length + 1, symbols, length ),
+                                            strides = ( step[1], step[0], step[1] ), writeable = False )
+
+
+def computeFeatures( openPrices, closePrices, highPrices, lowPrices, metricPeriod, periodVolatility, algoVolatility = 'RS' ):
+    # Prices are symbols x dates.  Returns performance and volatility as
+    # dates x symbols with the same arithmetic as GMRE.getStockMetrics.
+    prices = [gmreVolatility.asPrices( p ) for p in ( openPrices, closePrices, highPrices, lowPrices )]
+    symbols, dates = prices[1].shape
+
+    performance = np.nan * np.ones( ( dates, symbols ) )
+    volatility = np.nan * np.ones( ( dates, symbols ) )
+    if dates < metricPeriod:
+        return performance, volatility
+
+    C = prices[1]
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        start = C[:, :dates - metricPeriod + 1]
+        performance[metricPeriod - 1:] = ( ( C[:, metricPeriod - 1:] - start ) / start ).T
+
+    views = [windows( p, metricPeriod ) for p in prices]
+    for i in range( 0, len( views[0] ), CHUNK_DATES ):
+        O, C, H, L = [v[i:i + CHUNK_DATES] for v in views]
+        j = metricPeriod - 1 + i
+        volatility[j:j + len( O )] = gmreVolatility.blockVolatility( algoVolatility, metricPeriod, periodVolatility, O, C, H, L )
+
+    return performance, volatility
+
+
+def writeFeatures( path, dates, symbols, performance, volatility, meta ):
+    if not os.path.isdir( path ):
+        os.makedirs( path )
+
+    np.save( os.path.join( path, 'dates.npy' ), np.asarray( dates, dtype = 'datetime64[D]' ) )
+    np.save( os.path.join( path, 'symbols.npy' ), np.asarray( [str( s ) for s in symbols] ) )
+    np.save( os.path.join( path, 'performance.npy' ), performance )
+    np.save( os.path.join( path, 'volatility.npy' ), volatility )
+
+    # Written last; a store without meta.json is incomplete
+    with open( os.path.join( path, 'meta.json' ), 'w' ) as f:
+        json.dump( meta, f, sort_keys = True )
+
+
+def openFeatures( root, panel, metricPeriod, periodVolatility, algoVolatility = 'RS', adjusted = True ):
+    # Open the store for these parameters, computing it from the panel
+    # the first time.  A store computed from other bars is rebuilt.
+    path = os.path.join( root, featureName( algoVolatility, metricPeriod, periodVolatility, adjusted ) )
+    symbols = [str( s ) for s in panel.items]
+    dates = np.asarray( [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis], dtype = 'datetime64[D]' )
+    prices = [panelPrices( panel, field ) for field in FIELDS]
+    checksum = pricesChecksum( dates, symbols, prices )
+
+    if os.path.exists( os.path.join( path, 'meta.json' ) ):
+        store = FeatureStore( path )
+        if store.meta.get( 'checksum' ) == checksum and store.meta.get( 'adjusted' ) == bool( adjusted ):
+            return store
+
+    performance, volatility = computeFeatures( *( prices + [metricPeriod, periodVolatility, algoVolatility] ) )
+
+    meta = {
+        'algoVolatility': algoVolatility.upper(),
+        'metricPeriod': metricPeriod,
+        'periodVolatility': periodVolatility,
+        'adjusted': bool( adjusted ),
+        'checksum': checksum,
+    }
+    writeFeatures( path, dates, symbols, performance, volatility, meta )
+
+    return FeatureStore( path )
+
+
+class FeatureStore( object ):
+
+    def __init__( self, path ):
+        self.path = path
+
+        with open( os.path.join( path, 'meta.json' ) ) as f:
+            self.meta = json.load( f )
+
+        self.dates = np.load( os.path.join( path, 'dates.npy' ) )
+        self.symbols = list( np.load( os.path.join( path, 'symbols.npy' ) ) )
+        self.performance = np.load( os.path.join( path, 'performance.npy' ), mmap_mode = 'r' )
+        self.volatility = np.load( os.path.join( path, 'volatility.npy' ), mmap_mode = 'r' )
+
+        # O(1) row/column lookups by 'YYYY-MM-DD' and symbol
+        self.dateIndex = dict( ( str( d ), i ) for i, d in enumerate( self.dates ) )
+        self.symbolIndex = dict( ( s, i ) for i, s in enumerate( self.symbols ) )
+
+    def columns( self, stocks ):
+        return [self.symbolIndex[s] for s in stocks]
+
+    def metrics( self, date, stocks ):
+        # Performance and volatility of the stocks on 'YYYY-MM-DD'
+        row = self.dateIndex[date]
+        cols = self.columns( stocks )
+        return self.performance[row, cols], self.volatility[row, cols]
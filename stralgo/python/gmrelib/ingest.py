@@ -0,0 +1,227 @@
+# GMRE Library - Concurrent Bar Ingestion
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Downloads the daily bars of many symbols at once into a
+# gmrelib.barstore, instead of one symbol after the other as
+# load_bars_from_yahoo and gmre-quandl.jl do.
+#
+# NOTE: Needs Python 3.7+ and aiohttp.  The Zipline scripts stay on
+# Python 2; they read the bar store this fills (barStorePath).
+#
+# Symbols are fetched by concurrency workers over one pooled aiohttp
+# session (keep-alive connections), limited to rate requests per second
+# overall.  Timeouts, connection errors, HTTP 429 and 5xx are retried
+# retries times with exponential backoff; other HTTP errors fail the
+# symbol.  Only the ranges the store doesn't cover yet are requested.
+# Responses are parsed and written to the store by one writer thread as
+# they arrive, off the event loop; the manifest is saved every saveEvery
+# symbols and at the end.
+#
+# Providers turn a symbol and date range into a URL and the response
+# into store bars:
+#   YAHOO  - Yahoo table.csv (Date, Open, High, Low, Close, Volume, Adj Close)
+#   QUANDL - Quandl v3 dataset JSON (e.g. GOOG/NYSE_MDY of gmre-quandl.jl)
+# Others are added with registerProvider().  gmrelib.barserver serves
+# both formats locally for offline runs.
+#
+#   errors = ingest( BarStore( path ), getProvider( 'YAHOO' ), symbols, start, end )
+
+import asyncio
+import io
+from abc import ABC, abstractmethod
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+from gmrelib import barstore
+
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class Provider( ABC ):
+    # Symbol and date range to a request, response body to store bars
+
+    def __init__( self, baseUrl, apiKey = None ):
+        self.baseUrl = baseUrl.rstrip( '/' )
+        self.apiKey = apiKey
+
+    @abstractmethod
+    def request( self, symbol, start, end ):
+        # (url, query parameters)
+        pass
+
+    @abstractmethod
+    def parse( self, symbol, body, adjusted ):
+        # barstore.COLUMNS frame indexed by UTC day
+        pass
+
+
+class YahooCSV( Provider ):
+
+    def __init__( self, baseUrl = 'http://ichart.finance.yahoo.com', apiKey = None ):
+        Provider.__init__( self, baseUrl, apiKey )
+
+    def request( self, symbol, start, end ):
+        # Months are 0 based
+        params = {
+            's': symbol,
+            'a': start.month - 1, 'b': start.day, 'c': start.year,
+            'd': end.month - 1, 'e': end.day, 'f': end.year,
+            'g': 'd', 'ignore': '.csv',
+        }
+        return self.baseUrl + '/table.csv', params
+
+    def parse( self, symbol, body, adjusted ):
+        return barstore.adjustBars( pandas.read_csv( io.BytesIO( body ) ), adjusted )
+
+
+class QuandlJSON( Provider ):
+
+    def __init__( self, baseUrl = 'https://www.quandl.com', apiKey = None, database = 'GOOG/NYSE', codes = None ):
+        # Dataset of a symbol: codes[symbol] or '<database>_<symbol>'
+        Provider.__init__( self, baseUrl, apiKey )
+        self.database = database
+        self.codes = codes or {}
+
+    def request( self, symbol, start, end ):
+        code = self.codes.get( symbol, '%s_%s' % ( self.database, symbol ) )
+        params = {'start_date': barstore.dayString( start ), 'end_date': barstore.dayString( end ), 'order': 'asc'}
+        if self.apiKey is not None:
+            params['api_key'] = self.apiKey
+        return '%s/api/v3/datasets/%s.json' % ( self.baseUrl, code ), params
+
+    def parse( self, symbol, body, adjusted ):
+        dataset = json.loads( body.decode( 'utf-8' ) )['dataset']
+        # 'Adj. Close' (WIKI) and 'Adj_Close' (EOD) to adjustBars' adj_close
+        columns = [c.replace( '.', '' ) for c in dataset['column_names']]
+        return barstore.adjustBars( pandas.DataFrame( dataset['data'], columns = columns ), adjusted )
+
+
+PROVIDERS = {
+    'YAHOO': YahooCSV,
+    'QUANDL': QuandlJSON,
+}
+
+
+def registerProvider( name, provider ):
+    PROVIDERS[name] = provider
+
+
+def getProvider( name, **options ):
+    if name not in PROVIDERS:
+        raise ValueError( 'Unknown provider %s, expected one of %s' % ( name, sorted( PROVIDERS ) ) )
+    return PROVIDERS[name]( **options )
+
+
+class FetchError( Exception ):
+    pass
+
+
+class RateLimiter( object ):
+    # At most rate acquire() per second over all workers (None: no limit)
+
+    def __init__( self, rate ):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next = 0.0
+
+    async def acquire( self ):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        wait = self.next - now
+        self.next = max( now, self.next ) + self.interval
+        if wait > 0:
+            await asyncio.sleep( wait )
+
+
+async def fetchBody( session, provider, symbol, start, end, limiter, retries = 3, backoff = 0.5 ):
+    # Response body of the symbol's bars
+    import aiohttp
+
+    url, params = provider.request( symbol, start, end )
+    for attempt in range( retries + 1 ):
+        await limiter.acquire()
+        try:
+            async with session.get( url, params = params ) as response:
+                if response.status == 200:
+                    return await response.read()
+                error = 'HTTP %s' % response.status
+                if response.status not in RETRY_STATUS:
+                    break
+        except ( aiohttp.ClientError, asyncio.TimeoutError ) as e:
+            error = '%s %s' % ( type( e ).__name__, e )
+
+        if attempt < retries:
+            # Exponential backoff with jitter so retries don't arrive together
+            await asyncio.sleep( backoff * ( 2 ** attempt ) * ( 0.5 + random.random() ) )
+
+    raise FetchError( '%s from %s to %s: %s' % ( symbol, barstore.dayString( start ), barstore.dayString( end ), error ) )
+
+
+async def ingestAsync( store, provider, symbols, start, end, adjusted = True, concurrency = 32, rate = None,
+                       retries = 3, backoff = 0.5, timeout = 60, saveEvery = 100 ):
+    # {symbol: [error, ...]} of the symbols that failed, one error per
+    # failed date range (empty when all were ingested)
+    import aiohttp
+
+    jobs = asyncio.Queue()
+    for s in symbols:
+        for first, last in store.missing( s, start, end, adjusted ):
+            jobs.put_nowait( ( s, first, last ) )
+
+    errors = {}
+    written = [0]
+    limiter = RateLimiter( rate )
+    writer = ThreadPoolExecutor( max_workers = 1 )
+    loop = asyncio.get_running_loop()
+
+    def write( symbol, body, first, last ):
+        frame = provider.parse( symbol, body, adjusted )
+        store.ingest( symbol, frame, first, last, adjusted, save = False )
+        written[0] += 1
+        if written[0] % saveEvery == 0:
+            store.saveManifest()
+
+    async def worker( session ):
+        while True:
+            try:
+                symbol, first, last = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                body = await fetchBody( session, provider, symbol, first, last, limiter, retries, backoff )
+                await loop.run_in_executor( writer, write, symbol, body, first, last )
+            except Exception as e:
+                errors.setdefault( symbol, [] ).append( str( e ) )
+
+    connector = aiohttp.TCPConnector( limit = concurrency )
+    try:
+        async with aiohttp.ClientSession( connector = connector, timeout = aiohttp.ClientTimeout( total = timeout ) ) as session:
+            await asyncio.gather( *[worker( session ) for i in range( concurrency )] )
+    finally:
+        writer.shutdown( wait = True )
+        store.saveManifest()
+
+    return errors
+
+
+def ingest( store, provider, symbols, start, end, adjusted = True, **options ):
+    # Blocking ingestAsync(); options: concurrency, rate, retries,
+    # backoff, timeout, saveEvery
+    return asyncio.run( ingestAsync( store, provider, symbols, start, end, adjusted, **options ) )
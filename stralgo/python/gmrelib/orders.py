@@ -0,0 +1,79 @@
+# GMRE Library - Order Lifecycle Tracking
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Tracks any number of open orders and calls back when they fill,
+# instead of handle_data polling one oidSell/oidBuy per bar.
+#
+#   manager = OrderManager( lambda oid: blotter.orders[oid] )  # or get_order
+#   manager.submit( order( sid, amount ), onFilled )  # onFilled( oid, order, *args )
+#   manager.whenFilled( [oid, ...], callback )         # callback( *args )
+#   manager.update( data, date )                      # once per bar
+#
+# update() checks every open order once (filled == amount, as GMRE
+# did), then calls the filled orders' callbacks and then the callbacks
+# of groups whose orders have all filled.  Callbacks may submit new
+# orders (e.g. the buys once the sells of a rotation filled); those are
+# checked from the next update() on.
+
+class OrderManager( object ):
+
+    def __init__( self, getOrder ):
+        self.getOrder = getOrder
+        self.open = {}  # oid -> onFilled or None
+        self.groups = []  # [pending oids, callback]
+
+    def submit( self, oid, onFilled = None ):
+        # Track an order; None (no order placed) is ignored
+        if oid is not None:
+            self.open[oid] = onFilled
+        return oid
+
+    def whenFilled( self, oids, callback ):
+        # callback( *args ) once every order of oids has filled
+        pending = set()
+        for oid in oids:
+            if oid is not None:
+                self.open.setdefault( oid, None )
+                pending.add( oid )
+        self.groups.append( [pending, callback] )
+
+    def busy( self ):
+        return len( self.open ) > 0 or len( self.groups ) > 0
+
+    def openOrders( self ):
+        return list( self.open )
+
+    def update( self, *args ):
+        # Returns the oids filled since the last update
+        filled = []
+        for oid in list( self.open ):
+            o = self.getOrder( oid )
+            if o.filled == o.amount:
+                filled.append( ( oid, o, self.open.pop( oid ) ) )
+
+        for oid, o, onFilled in filled:
+            if onFilled is not None:
+                onFilled( oid, o, *args )
+
+        oids = set( f[0] for f in filled )
+        for group in self.groups:
+            group[0] -= oids
+        complete = [g for g in self.groups if not g[0]]
+        self.groups = [g for g in self.groups if g[0]]
+        for pending, callback in complete:
+            callback( *args )
+
+        return [f[0] for f in filled]
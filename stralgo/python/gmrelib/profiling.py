@@ -0,0 +1,159 @@
+# GMRE Library - Per Phase Profiling
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Where the time of a backtest goes, by phase (data accumulation,
+# metrics, ranking, orders, logging, ...).  instrument() replaces
+# methods of an object with timed wrappers from the outside, so the
+# strategy isn't edited:
+#   profiler = PhaseProfiler()
+#   profiler.instrument( algo, {'rankStocks': 'ranking', ...} )
+#   algo.run( data )
+#   print( profiler.report() )
+#
+# Each call costs two clock reads and a few additions.  Per phase the
+# calls, total (inclusive) and self (exclusive of nested phases) time,
+# maximum and a log2 histogram of the call times (1us, 2us, 4us, ...)
+# are kept.  writeFolded() writes the self time of every phase stack in
+# the folded format of flamegraph.pl / speedscope ('a;b;c microseconds').
+
+import math
+import time
+
+clock = getattr( time, 'perf_counter', time.time )
+
+
+class PhaseStats( object ):
+
+    def __init__( self, name ):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+        self.maximum = 0.0
+        self.buckets = []  # buckets[i] calls taking < 2^i microseconds
+
+    def add( self, elapsed, own ):
+        self.calls += 1
+        self.total += elapsed
+        self.own += own
+        if elapsed > self.maximum:
+            self.maximum = elapsed
+
+        bucket = max( 0, math.frexp( elapsed * 1e6 )[1] )
+        if bucket >= len( self.buckets ):
+            self.buckets.extend( [0] * ( bucket + 1 - len( self.buckets ) ) )
+        self.buckets[bucket] += 1
+
+    def percentile( self, fraction ):
+        # Upper bound (seconds) of the bucket holding the fraction-th call
+        count = 0
+        for i, n in enumerate( self.buckets ):
+            count += n
+            if count >= fraction * self.calls:
+                return min( ( 2 ** i ) / 1e6, self.maximum )
+        return self.maximum
+
+
+class PhaseProfiler( object ):
+
+    def __init__( self ):
+        self.phases = {}
+        self.stack = []  # [phase, nested seconds] of the running calls
+        self.folded = {}
+
+    def timed( self, phase, function ):
+        # function wrapped to account its calls to phase
+        stats = self.phases.get( phase )
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats( phase )
+        stack = self.stack
+
+        def wrapper( *args, **kwargs ):
+            frame = [phase, 0.0]
+            stack.append( frame )
+            start = clock()
+            try:
+                return function( *args, **kwargs )
+            finally:
+                elapsed = clock() - start
+                own = elapsed - frame[1]
+                key = ';'.join( f[0] for f in stack )
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                stats.add( elapsed, own )
+                self.folded[key] = self.folded.get( key, 0.0 ) + own
+
+        wrapper.__name__ = getattr( function, '__name__', phase )
+        wrapper.profiled = function
+        return wrapper
+
+    def instrument( self, obj, methods ):
+        # Times obj.<attribute> as phase for every {attribute: phase};
+        # missing attributes (e.g. a None featureStore) are skipped
+        for attribute, phase in methods.items():
+            function = getattr( obj, attribute, None )
+            if function is not None and not hasattr( function, 'profiled' ):
+                setattr( obj, attribute, self.timed( phase, function ) )
+
+    def summary( self ):
+        # One dict per phase, most self time first
+        rows = []
+        for stats in sorted( self.phases.values(), key = lambda s: -s.own ):
+            rows.append( {
+                'phase': stats.name,
+                'calls': stats.calls,
+                'total': stats.total,
+                'self': stats.own,
+                'mean': stats.total / stats.calls if stats.calls else 0.0,
+                'max': stats.maximum,
+                'p50': stats.percentile( 0.5 ),
+                'p99': stats.percentile( 0.99 ),
+            } )
+        return rows
+
+    def report( self, width = 40 ):
+        # Table of the phases plus a histogram of each one's call times
+        lines = ['%-12s %8s %10s %10s %10s %10s %10s' % ( 'PHASE', 'CALLS', 'TOTAL s', 'SELF s', 'MEAN ms', 'P99 ms', 'MAX ms' )]
+        for r in self.summary():
+            lines.append( '%-12s %8d %10.3f %10.3f %10.3f %10.3f %10.3f' % ( r['phase'], r['calls'], r['total'], r['self'],
+                                                                            r['mean'] * 1e3, r['p99'] * 1e3, r['max'] * 1e3 ) )
+
+        for r in self.summary():
+            stats = self.phases[r['phase']]
+            if not stats.calls:
+                continue
+            lines.append( '' )
+            lines.append( '%s call times' % stats.name )
+            most = max( stats.buckets )
+            for i, n in enumerate( stats.buckets ):
+                if n:
+                    lines.append( '  < %10s %8d %s' % ( duration( 2 ** i ), n, '#' * max( 1, n * width // most ) ) )
+        return '\n'.join( lines )
+
+    def writeFolded( self, path ):
+        # flamegraph.pl / speedscope input, microseconds of self time
+        with open( path, 'w' ) as f:
+            for key in sorted( self.folded ):
+                f.write( '%s %d\n' % ( key, round( self.folded[key] * 1e6 ) ) )
+
+
+def duration( microseconds ):
+    if microseconds >= 1e6:
+        return '%gs' % ( microseconds / 1e6 )
+    if microseconds >= 1e3:
+        return '%gms' % ( microseconds / 1e3 )
+    return '%gus' % microseconds
@@ -0,0 +1,75 @@
+# GMRE Library - Cross-Sectional Basket Ranking
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Vectorized version of the GMRE.getBestStock ranking.  Performance and
+# volatility arrive as one value per symbol; volatility weights replace
+# the hardcoded EDV 50% haircut (Frank Grossman: EDV has a medium 20-day
+# volatility roughly 50% higher than the global market ETFs).
+#
+# Performance and volatility are normalized to [0..1] over the basket
+# (volatility inverted since a low volatility should be weighted highly)
+# and combined as:
+#   rank = p * factorPerformance + (v * weight) * factorVolatility
+#
+# Symbols with a NaN normalized value get a NaN rank and are never the
+# best, as the None ranks were skipped before.  NaN metrics are left out
+# of the basket min/max.
+
+import numpy as np
+
+
+def normalizeMetrics( performances, volatilities ):
+    p = np.asarray( performances, dtype = np.float64 )
+    v = np.asarray( volatilities, dtype = np.float64 )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        minP, maxP = minMax( p )
+        minV, maxV = minMax( v )
+
+        pNorm = ( p - minP ) / ( maxP - minP )
+        vNorm = ( 1 - ( v - minV ) / ( maxV - minV ) )
+
+    return pNorm, vNorm
+
+
+def minMax( values ):
+    finite = values[~np.isnan( values )]
+    if len( finite ) == 0:
+        return np.nan, np.nan
+    return finite.min(), finite.max()
+
+
+def rankBasket( performances, volatilities, factorPerformance, factorVolatility, volatilityWeights = None ):
+    # Returns the ranks (one per symbol, NaN when unranked) and the index
+    # of the best ranked symbol or None when nothing could be ranked
+    pNorm, vNorm = normalizeMetrics( performances, volatilities )
+
+    if volatilityWeights is not None:
+        vNorm = vNorm * np.asarray( volatilityWeights, dtype = np.float64 )
+
+    ranks = ( pNorm * factorPerformance ) + ( vNorm * factorVolatility )
+
+    ranked = ~np.isnan( ranks )
+    if not ranked.any():
+        return ranks, None
+
+    return ranks, int( np.argmax( np.where( ranked, ranks, -np.inf ) ) )
+
+
+def rankOrder( ranks ):
+    # Indexes of the ranked symbols, best first (ties keep basket order)
+    ranked = np.flatnonzero( ~np.isnan( ranks ) )
+    return ranked[np.argsort( -ranks[ranked], kind = 'mergesort' )]
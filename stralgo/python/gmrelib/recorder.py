@@ -0,0 +1,102 @@
+# GMRE Library - Columnar Run Recorder
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Zipline/Quantopian record() only keeps five series.  Recorder keeps
+# any number of named per-bar metrics in preallocated float64 columns
+# (one row per bar, doubled when full) and writes them to one
+# compressed .npz at the end of the run, so post-run analysis doesn't
+# need another backtest with different record() choices.
+#
+# A value is a scalar or a fixed length array, e.g. the rank of every
+# basket symbol; label() names the entries of an array column.  Bars a
+# column wasn't recorded on are NaN.
+#
+#   run = Recorder()
+#   run.record( date, cash = 1.0, rank = ranks )
+#   run.save( 'run.npz' )
+#   columns = load( 'run.npz' )  # 'dates', 'cash', 'rank', 'rank@labels'
+
+import numpy as np
+
+
+def barTime( date ):
+    # datetime64[m] of a date, datetime or 'YYYY-MM-DD[THH:MM]'
+    if hasattr( date, 'strftime' ):
+        date = date.strftime( '%Y-%m-%dT%H:%M' )
+    return np.datetime64( date, 'm' )
+
+
+class Recorder( object ):
+
+    def __init__( self, capacity = 1024 ):
+        self.capacity = capacity
+        self.rows = 0
+        self.dates = np.empty( capacity, dtype = 'datetime64[m]' )
+        self.columns = {}
+        self.labels = {}
+
+    def grow( self ):
+        self.capacity *= 2
+        self.dates = np.resize( self.dates, self.capacity )
+        for name, column in self.columns.items():
+            grown = np.empty( ( self.capacity, ) + column.shape[1:] )
+            grown[:] = np.nan
+            grown[:self.rows] = column[:self.rows]
+            self.columns[name] = grown
+
+    def label( self, name, labels ):
+        self.labels[name] = [str( l ) for l in labels]
+
+    def record( self, date, **values ):
+        # Values of the bar 'date'; later calls for the same bar add to
+        # (or overwrite) its row
+        when = barTime( date )
+        if self.rows == 0 or self.dates[self.rows - 1] != when:
+            if self.rows == self.capacity:
+                self.grow()
+            self.dates[self.rows] = when
+            self.rows += 1
+
+        row = self.rows - 1
+        for name, value in values.items():
+            column = self.columns.get( name )
+            if column is None:
+                column = np.empty( ( self.capacity, ) + np.shape( value ) )
+                column[:] = np.nan
+                self.columns[name] = column
+            column[row] = value
+
+    def __getitem__( self, name ):
+        # View of the recorded rows of a column ('dates' for the bars)
+        if name == 'dates':
+            return self.dates[:self.rows]
+        return self.columns[name][:self.rows]
+
+    def names( self ):
+        return sorted( self.columns )
+
+    def save( self, path ):
+        arrays = dict( ( name, self[name] ) for name in self.columns )
+        arrays['dates'] = self['dates']
+        for name, labels in self.labels.items():
+            arrays[name + '@labels'] = np.asarray( labels )
+        np.savez_compressed( path, **arrays )
+
+
+def load( path ):
+    # name -> array of a saved run
+    with np.load( path ) as f:
+        return dict( ( name, f[name] ) for name in f.files )
@@ -0,0 +1,64 @@
+# GMRE Library - Minute to Daily OHLCV Aggregation
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Vectorized replacement for getFiniteBars/basketPeriodOchlv in
+# gmre-minute.py.  A symbols x minutes block (or symbols x days x
+# minutes, e.g. ColumnarBars.window()) is reduced over its LAST axis in
+# one pass, skipping NaN bars:
+#   open   - first finite open (first finite close when no opens are
+#            given, as basketPeriodOchlv did)
+#   close  - last finite close
+#   high   - max of the finite highs
+#   low    - min of the finite lows
+#   volume - sum of the finite volumes
+# A period without any finite bar gives NaN (volume 0).  The NaN count
+# of every field comes back as a side output instead of a second scan.
+
+import numpy as np
+
+
+def firstFinite( values, reverse = False ):
+    # First (or last) finite value along the last axis, NaN if none
+    finite = ~np.isnan( values )
+    if reverse:
+        i = values.shape[-1] - 1 - finite[..., ::-1].argmax( axis = -1 )
+    else:
+        i = finite.argmax( axis = -1 )
+    return np.take_along_axis( values, i[..., np.newaxis], axis = -1 )[..., 0]
+
+
+def aggregateBars( closePrices, highPrices, lowPrices, volumes, openPrices = None ):
+    # Returns (ochlv, nanCounts); both are dicts of field -> array with
+    # the last axis reduced away
+    C = np.asarray( closePrices, dtype = np.float64 )
+    H = np.asarray( highPrices, dtype = np.float64 )
+    L = np.asarray( lowPrices, dtype = np.float64 )
+    V = np.asarray( volumes, dtype = np.float64 )
+    O = C if openPrices is None else np.asarray( openPrices, dtype = np.float64 )
+
+    ochlv = {
+        'open': firstFinite( O ),
+        'close': firstFinite( C, reverse = True ),
+        # fmax/fmin ignore NaN and return NaN only for an all NaN period
+        'high': np.fmax.reduce( H, axis = -1 ),
+        'low': np.fmin.reduce( L, axis = -1 ),
+        'volume': np.where( np.isnan( V ), 0.0, V ).sum( axis = -1 ),
+    }
+
+    fields = {'open': O, 'close': C, 'high': H, 'low': L, 'volume': V}
+    nanCounts = dict( ( f, np.isnan( fields[f] ).sum( axis = -1 ) ) for f in fields )
+
+    return ochlv, nanCounts
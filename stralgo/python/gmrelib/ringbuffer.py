@@ -0,0 +1,58 @@
+# GMRE Library - Fixed Size Ring Buffer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Preallocated ring buffer of rows (e.g. one day of symbols x fields
+# OHLCV) with O(1) push and zero-copy windows.  Every row is written
+# twice, at slot i and i + capacity, so the last n rows are always one
+# contiguous slice of the backing array: window() returns a view in
+# oldest to newest order and memory stays constant however long the
+# run.  Unfilled rows are NaN.
+
+import numpy as np
+
+# Field order of the daily OHLCV rows
+OHLCV = ['open', 'close', 'high', 'low', 'volume']
+
+
+class RingBuffer( object ):
+
+    def __init__( self, capacity, shape, dtype = np.float64 ):
+        self.capacity = capacity
+        self.buffer = np.empty( ( 2 * capacity, ) + tuple( shape ), dtype = dtype )
+        self.buffer[:] = np.nan
+        self.count = 0
+
+    def __len__( self ):
+        return min( self.count, self.capacity )
+
+    def full( self ):
+        return self.count >= self.capacity
+
+    def push( self, row ):
+        i = self.count % self.capacity
+        self.buffer[i] = row
+        self.buffer[i + self.capacity] = row
+        self.count += 1
+
+    def window( self, n = None ):
+        # View of the last n rows (default all held rows), oldest first
+        if n is None or n > len( self ):
+            n = len( self )
+        end = self.count % self.capacity + self.capacity
+        return self.buffer[end - n:end]
+
+    def last( self ):
+        return self.window( 1 )[0]
@@ -0,0 +1,193 @@
+# GMRE Library - Rolling Rogers & Satchell Volatility
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Rolling RS volatility built from running sums of the per-bar RS
+# terms.  Three flavours are produced in one pass (see the Julia
+# volatility("sliding"|"grouping"|"all", ...) in gmre-quandl.jl):
+#
+#   sliding  - mean of every 'window' bar volatility inside the lookback
+#   grouped  - mean of 'blocks' windows spaced 'stride' bars apart
+#              from the start of the lookback (GMRE: window 20,
+#              stride 21, lookback 63)
+#   whole    - one volatility over the whole lookback
+#
+# Every window volatility uses the same scaling as
+# gmrelib.volatility.rsVolatility, so grouped equals rsBlockVolatility
+# on the same bars.
+#
+# rollingVolatility() computes the three series for a whole history at
+# once.  RollingVolatility keeps the state for bar by bar updates in
+# O(1) per symbol.
+
+import math
+import numpy as np
+
+from gmrelib.volatility import TRADING_DAYS, asPrices, rsTerms
+
+
+def rsScale( period ):
+    return math.sqrt( TRADING_DAYS // period )
+
+
+def defaultGrouping( window, lookback, stride, blocks ):
+    if stride is None:
+        stride = window
+    if blocks is None:
+        blocks = max( ( lookback - window ) // stride + 1, 1 )
+    if ( blocks - 1 ) * stride + window > lookback:
+        raise ValueError( '%s blocks of %s bars every %s bars exceed the %s bar lookback' % ( blocks, window, stride, lookback ) )
+    return stride, blocks
+
+
+def windowSums( values, window ):
+    # Sum of each trailing 'window' values along the last axis; the first
+    # window - 1 positions are NaN.  A NaN only poisons the windows that
+    # contain it rather than every later prefix sum.
+    missing = np.isnan( values )
+    shape = values.shape[:-1] + ( values.shape[-1] + 1, )
+
+    cs = np.zeros( shape )
+    np.cumsum( np.where( missing, 0.0, values ), axis = -1, out = cs[..., 1:] )
+    nanCount = np.zeros( shape, dtype = int )
+    np.cumsum( missing, axis = -1, out = nanCount[..., 1:] )
+
+    sums = np.empty( values.shape )
+    sums[..., :window - 1] = np.nan
+    sums[..., window - 1:] = np.where( nanCount[..., window:] > nanCount[..., :-window], np.nan, cs[..., window:] - cs[..., :-window] )
+
+    return sums
+
+
+def rollingVolatility( openPrices, closePrices, highPrices, lowPrices, window, lookback, stride = None, blocks = None ):
+    # Returns sliding, grouped and whole volatility for every bar of the
+    # history (symbols x bars, NaN until enough bars are available)
+    stride, blocks = defaultGrouping( window, lookback, stride, blocks )
+
+    terms = rsTerms( asPrices( openPrices ), asPrices( closePrices ), asPrices( highPrices ), asPrices( lowPrices ) )
+
+    with np.errstate( invalid = 'ignore' ):
+        vols = np.sqrt( windowSums( terms, window ) / window ) * rsScale( window )
+        whole = np.sqrt( windowSums( terms, lookback ) / lookback ) * rsScale( lookback )
+
+    # Every window inside the lookback
+    sliding = windowSums( vols, lookback - window + 1 ) / ( lookback - window + 1 )
+
+    # Windows starting at the lookback start, then every 'stride' bars
+    grouped = np.zeros( vols.shape )
+    for k in range( blocks ):
+        shift = lookback - window - k * stride
+        if shift > 0:
+            grouped[..., shift:] += vols[..., :-shift]
+            grouped[..., :shift] = np.nan
+        else:
+            grouped += vols
+    grouped /= blocks
+
+    return sliding, grouped, whole
+
+
+class RunningSum( object ):
+
+    # Pushes between exact recomputation of the sum to stop floating
+    # point drift from the add/subtract updates
+    resyncCount = 1024
+
+    def __init__( self, length, symbols ):
+        # Sum of the last 'length' rows pushed.  NaN entries are counted
+        # instead of summed so they drop out once they leave the window.
+        self.length = length
+        self.values = np.zeros( ( length, symbols ) )
+        self.missing = np.zeros( ( length, symbols ), dtype = bool )
+        self.total = np.zeros( symbols )
+        self.nanCount = np.zeros( symbols, dtype = int )
+        self.count = 0
+
+    def push( self, row ):
+        i = self.count % self.length
+        bad = np.isnan( row )
+        row = np.where( bad, 0.0, row )
+
+        self.total += row - self.values[i]
+        self.nanCount += bad.astype( int ) - self.missing[i]
+        self.values[i] = row
+        self.missing[i] = bad
+        self.count += 1
+
+        if self.count % self.resyncCount == 0:
+            self.total = self.values.sum( axis = 0 )
+
+    def get( self, age ):
+        # Row pushed 'age' pushes ago (0 is the latest)
+        i = ( self.count - 1 - age ) % self.length
+        return np.where( self.missing[i], np.nan, self.values[i] )
+
+    def sum( self ):
+        return np.where( self.nanCount > 0, np.nan, self.total )
+
+
+class RollingVolatility( object ):
+
+    def __init__( self, symbols, window, lookback, stride = None, blocks = None ):
+        self.symbols = symbols
+        self.window = window
+        self.lookback = lookback
+        self.stride, self.blocks = defaultGrouping( window, lookback, stride, blocks )
+
+        # Number of sliding windows inside the lookback
+        self.slides = lookback - window + 1
+        self.windowScale = rsScale( window )
+        self.wholeScale = rsScale( lookback )
+
+        self.windowTerms = RunningSum( window, symbols )
+        self.wholeTerms = RunningSum( lookback, symbols )
+        self.vols = RunningSum( self.slides, symbols )  # window volatilities
+
+        self.count = 0
+
+    def push( self, openPrices, closePrices, highPrices, lowPrices ):
+        # Add one bar (one price per symbol) and update every running sum
+        term = rsTerms( openPrices, closePrices, highPrices, lowPrices )
+
+        self.windowTerms.push( term )
+        self.wholeTerms.push( term )
+        self.count += 1
+
+        if self.count >= self.window:
+            with np.errstate( invalid = 'ignore' ):
+                self.vols.push( np.sqrt( self.windowTerms.sum() / self.window ) * self.windowScale )
+
+    def missing( self ):
+        return np.nan * np.ones( self.symbols )
+
+    def sliding( self ):
+        if self.count < self.lookback:
+            return self.missing()
+        return self.vols.sum() / self.slides
+
+    def grouped( self ):
+        # Windows starting at the lookback start, then every 'stride' bars
+        if self.count < self.lookback:
+            return self.missing()
+        total = 0
+        for k in range( self.blocks ):
+            total = total + self.vols.get( self.slides - 1 - k * self.stride )
+        return total / self.blocks
+
+    def whole( self ):
+        if self.count < self.lookback:
+            return self.missing()
+        with np.errstate( invalid = 'ignore' ):
+            return np.sqrt( self.wholeTerms.sum() / self.lookback ) * self.wholeScale
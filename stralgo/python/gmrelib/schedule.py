@@ -0,0 +1,130 @@
+# GMRE Library - Rebalance Schedule
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Rebalance days computed once from the trading calendar (the days of
+# the loaded bars, or tradingDays() for weekdays minus holidays)
+# instead of comparing the month on every bar:
+#   MONTH      - first trading day of every month
+#   WEEK       - first trading day of every week
+#   DAYS       - every 'every' trading days from the first day
+#   MONTH_DAYS - MONTH plus the first trading day 'every' calendar days
+#                after the previous rebalance of the month (maxyield's
+#                mid-month rotation, across year ends too)
+# Other rules are added with registerRule( name, rule ), where
+# rule( days, every ) returns the indexes of the rebalance days.
+#
+# Scheduler walks the rebalance days with a pointer: due( dateStr ) is
+# one string compare per bar (dueOn( date ) one date compare).  A rebalance that can't happen on its day
+# (open orders) stays due until advance() is called, as the month
+# check did.
+
+import numpy as np
+
+
+def tradingDays( start, end, holidays = () ):
+    # Weekdays in [start, end] without the holidays (datetime64[D])
+    calendar = np.busdaycalendar( holidays = [np.datetime64( str( h )[:10], 'D' ) for h in holidays] )
+    days = np.arange( np.datetime64( str( start )[:10], 'D' ), np.datetime64( str( end )[:10], 'D' ) + 1 )
+    return days[np.is_busday( days, busdaycal = calendar )]
+
+
+def periodStarts( days, unit ):
+    # Indexes of the first day of every unit ('M' month, 'W' week)
+    if unit == 'W':
+        # datetime64[W] weeks start on Thursday (1970-01-01), use Mondays
+        periods = ( days - np.datetime64( '1970-01-05', 'D' ) ).astype( np.int64 ) // 7
+    else:
+        periods = days.astype( 'datetime64[%s]' % unit )
+    return np.concatenate( ( [0], np.flatnonzero( periods[1:] != periods[:-1] ) + 1 ) )
+
+
+def monthRule( days, every ):
+    return periodStarts( days, 'M' )
+
+
+def weekRule( days, every ):
+    return periodStarts( days, 'W' )
+
+
+def daysRule( days, every ):
+    return np.arange( 0, len( days ), every )
+
+
+def monthDaysRule( days, every ):
+    months = set( periodStarts( days, 'M' ).tolist() )
+    indexes = []
+    last = None
+    for i, day in enumerate( days ):
+        if i in months or ( day - last ).astype( int ) >= every:
+            indexes.append( i )
+            last = day
+    return np.asarray( indexes, dtype = int )
+
+
+RULES = {
+    'MONTH': monthRule,
+    'WEEK': weekRule,
+    'DAYS': daysRule,
+    'MONTH_DAYS': monthDaysRule,
+}
+
+
+def registerRule( name, rule ):
+    RULES[name] = rule
+
+
+def rebalanceIndexes( days, rule = 'MONTH', every = 21 ):
+    # Indexes into days (sorted trading days) of the rebalance days
+    if rule not in RULES:
+        raise ValueError( 'Unknown rebalance rule %s, expected one of %s' % ( rule, sorted( RULES ) ) )
+    days = np.asarray( days, dtype = 'datetime64[D]' )
+    if len( days ) == 0:
+        return np.zeros( 0, dtype = int )
+    return np.asarray( RULES[rule]( days, every ), dtype = int )
+
+
+class Scheduler( object ):
+
+    def __init__( self, days, rule = 'MONTH', every = 21 ):
+        days = np.asarray( days, dtype = 'datetime64[D]' )[rebalanceIndexes( days, rule, every )]
+        # 'YYYY-MM-DD' strings compare in date order
+        self.dates = [str( d ) for d in days]
+        self.days = days.tolist()  # datetime.date
+        self.next = 0
+
+    def due( self, dateStr ):
+        # A rebalance day on or before dateStr hasn't been done yet
+        return self.next < len( self.dates ) and self.dates[self.next] <= dateStr
+
+    def dueOn( self, date ):
+        # due() for a datetime (get_datetime()) without formatting it
+        return self.next < len( self.days ) and self.days[self.next] <= date.date()
+
+    def advance( self, dateStr ):
+        # Mark the rebalance days up to dateStr done
+        while self.next < len( self.dates ) and self.dates[self.next] <= dateStr:
+            self.next += 1
+
+    def nextDate( self ):
+        # Next rebalance day ('YYYY-MM-DD') or None after the last
+        if self.next < len( self.dates ):
+            return self.dates[self.next]
+        return None
+
+
+def fromPanel( panel, rule = 'MONTH', every = 21 ):
+    # Scheduler over the trading days of a Zipline data panel
+    return Scheduler( [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis], rule, every )
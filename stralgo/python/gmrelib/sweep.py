@@ -0,0 +1,104 @@
+# GMRE Library - Parallel Parameter Sweeps
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Runs one backtest per point of a parameter grid across a process
+# pool and collects the results into one table.
+#
+# The bar data (and anything prepared from it, e.g. feature stores) is
+# loaded once by the parent and handed to the workers through the pool
+# initializer.  With the default 'fork' start method on Linux the
+# workers share the parent's pages copy-on-write, so the data is never
+# pickled or copied per configuration; the runner must treat it as
+# read-only.
+#
+# A runner is a module level (picklable) function runner(params, data)
+# returning a dict of results, e.g. gmre/zipline/sweep.py runGMRE.
+
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+
+# Set in every worker by initWorker()
+sharedData = None
+
+
+def expandGrid( grid ):
+    # {'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    names = sorted( grid )
+    return [dict( zip( names, values ) ) for values in itertools.product( *[grid[n] for n in names] )]
+
+
+def initWorker( data, quiet ):
+    global sharedData
+    sharedData = data
+
+    # Backtests print every trade; keep the workers quiet
+    if quiet:
+        sys.stdout = open( os.devnull, 'w' )
+
+
+def runOne( task ):
+    runner, params = task
+    try:
+        results = runner( params, sharedData )
+        results['error'] = ''
+    except Exception as e:
+        results = {'error': '%s: %s' % ( type( e ).__name__, e )}
+
+    row = dict( params )
+    row.update( results )
+    return row
+
+
+def runSweep( runner, grid, data, processes = None, quiet = True, chunksize = 1 ):
+    # Returns one row (parameters and results) per grid point in grid
+    # order.  A failing configuration records its error instead of
+    # stopping the sweep.
+    if isinstance( grid, dict ):
+        grid = expandGrid( grid )
+
+    pool = multiprocessing.Pool( processes, initializer = initWorker, initargs = ( data, quiet ) )
+    try:
+        rows = pool.map( runOne, [( runner, params ) for params in grid], chunksize )
+    finally:
+        pool.close()
+        pool.join()
+
+    return rows
+
+
+def cagr( startValue, endValue, days ):
+    # Compound Annual Growth Rate over 'days' calendar days
+    if days <= 0 or startValue <= 0:
+        return 0.0
+    return pow( endValue / startValue, 365.2425 / days ) - 1.0
+
+
+def writeTable( path, rows ):
+    # CSV with the parameter/result columns of every row
+    columns = sorted( set( itertools.chain( *[row.keys() for row in rows] ) ) )
+    if sys.version_info[0] < 3:
+        f = open( path, 'wb' )
+    else:
+        # No translated line endings: csv writes '\r\n' itself
+        f = open( path, 'w', newline = '' )
+    with f:
+        writer = csv.DictWriter( f, columns )
+        writer.writeheader()
+        for row in rows:
+            writer.writerow( row )
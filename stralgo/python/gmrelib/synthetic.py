@@ -0,0 +1,91 @@
+# GMRE Library - Synthetic OHLCV Bars
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Reproducible random walk OHLCV bars of any size (symbols x days, or
+# symbols x minutes for one day) for benchmarks and offline runs.  The
+# same seed always gives the same bars.  Every bar is consistent:
+# low <= open, close <= high, volume > 0.  nanFraction blanks random
+# bars the way thinly traded minutes arrive from Quantopian.
+#
+#   dates, bars = dailyBars( 500, 2520 )       # bars['close'] is 500 x 2520
+#   minutes = minuteBars( 500, 390, nanFraction = 0.01 )
+#   data = panel( dates, symbols( 500 ), bars )  # Zipline's data panel
+
+import numpy as np
+
+FIELDS = ['open', 'close', 'high', 'low', 'volume']
+
+
+def symbols( count ):
+    return ['S%04d' % i for i in range( count )]
+
+
+def businessDays( start, count ):
+    # count weekdays from start (datetime64[D])
+    return np.busday_offset( np.datetime64( start, 'D' ), np.arange( count ), roll = 'forward' )
+
+
+def randomBars( symbolCount, barCount, volatility, seed = 0, nanFraction = 0.0, startPrice = 100.0 ):
+    # symbols x bars OHLCV of a geometric random walk
+    rng = np.random.RandomState( seed )
+    shape = ( symbolCount, barCount )
+
+    drift = rng.normal( 0.0, volatility / 50, ( symbolCount, 1 ) )
+    closes = startPrice * np.exp( np.cumsum( rng.normal( drift, volatility, shape ), axis = 1 ) )
+    opens = np.empty( shape )
+    opens[:, 0] = startPrice
+    opens[:, 1:] = closes[:, :-1]
+    opens *= np.exp( rng.normal( 0.0, volatility / 4, shape ) )
+
+    spread = np.abs( rng.normal( 0.0, volatility, ( 2, ) + shape ) )
+    bars = {
+        'open': opens,
+        'close': closes,
+        'high': np.maximum( opens, closes ) * np.exp( spread[0] ),
+        'low': np.minimum( opens, closes ) * np.exp( -spread[1] ),
+        'volume': rng.randint( 1000, 1000000, shape ).astype( np.float64 ),
+    }
+
+    if nanFraction > 0:
+        missing = rng.random_sample( shape ) < nanFraction
+        for field in FIELDS:
+            bars[field][missing] = np.nan
+
+    return bars
+
+
+def dailyBars( symbolCount, days, seed = 0, start = '2011-01-03', nanFraction = 0.0 ):
+    # (dates, {field: symbols x days}) of daily bars
+    return businessDays( start, days ), randomBars( symbolCount, days, 0.012, seed, nanFraction )
+
+
+def minuteBars( symbolCount, minutes = 390, seed = 0, nanFraction = 0.0 ):
+    # {field: symbols x minutes} of one trading day
+    return randomBars( symbolCount, minutes, 0.0006, seed, nanFraction )
+
+
+def panel( dates, names, bars ):
+    # Zipline's data panel (items are symbols, minor axis the fields as
+    # load_bars_from_yahoo has them); needs a pandas with Panel (Zipline's)
+    import pandas as pd
+
+    index = pd.DatetimeIndex( dates.astype( 'datetime64[ns]' ) ).tz_localize( 'UTC' )
+    frames = {}
+    for i, name in enumerate( names ):
+        columns = dict( ( field, bars[field][i] ) for field in FIELDS )
+        columns['price'] = bars['close'][i]
+        frames[name] = pd.DataFrame( columns, index = index, columns = FIELDS + ['price'] )
+    return pd.Panel( frames )
@@ -0,0 +1,91 @@
+# GMRE Library - Universe Availability Mask
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Which symbols of a (large) universe can be ranked on a date.  A
+# symbols x dates boolean mask is built once from the listing dates
+# (Quantopian's security_start_date) and the data coverage (a finite
+# close), so baskets with staggered inception dates no longer need
+# every symbol to exist over the whole range.
+#
+# A symbol is live on a date with a lookback when it was available on
+# every one of the lookback bars ending at that date (e.g. metricPeriod
+# for GMRE's ranking).  Running counts of available bars make that one
+# subtraction per symbol:
+#   universe = fromPanel( data, listingDates = {'EDV': '2007-12-10'} )
+#   stocks = universe.liveSymbols( '2008-01-02', 63 )
+
+import numpy as np
+
+from gmrelib import features
+
+
+class Universe( object ):
+
+    def __init__( self, symbols, dates, available ):
+        # available: symbols x dates bool
+        self.symbols = list( symbols )
+        self.dates = np.asarray( dates, dtype = 'datetime64[D]' )
+        self.available = np.asarray( available, dtype = bool )
+
+        # counts[:, d] available bars before date d
+        self.counts = np.zeros( ( len( self.symbols ), len( self.dates ) + 1 ), dtype = np.int32 )
+        np.cumsum( self.available, axis = 1, out = self.counts[:, 1:] )
+
+        self.dateIndex = dict( ( str( d ), i ) for i, d in enumerate( self.dates ) )
+        self.symbolIndex = dict( ( s, i ) for i, s in enumerate( self.symbols ) )
+
+    def dayNumber( self, date ):
+        if hasattr( date, 'strftime' ):
+            date = date.strftime( '%Y-%m-%d' )
+        return self.dateIndex[date]
+
+    def mask( self, date, lookback = 1 ):
+        # Symbols available on each of the lookback bars ending at date
+        d = self.dayNumber( date ) + 1
+        if d < lookback:
+            return np.zeros( len( self.symbols ), dtype = bool )
+        return self.counts[:, d] - self.counts[:, d - lookback] == lookback
+
+    def liveSymbols( self, date, lookback = 1 ):
+        return [self.symbols[i] for i in np.flatnonzero( self.mask( date, lookback ) )]
+
+    def liveMasks( self, lookback = 1 ):
+        # dates x symbols mask of every date at once (ranking all dates)
+        live = np.zeros( ( len( self.dates ), len( self.symbols ) ), dtype = bool )
+        if lookback <= len( self.dates ):
+            window = self.counts[:, lookback:] - self.counts[:, :-lookback]
+            live[lookback - 1:] = ( window == lookback ).T
+        return live
+
+
+def availability( closePrices, dates, symbols, listingDates = None ):
+    # symbols x dates mask of finite closes on or after the listing date
+    available = np.isfinite( np.asarray( closePrices, dtype = np.float64 ) )
+    if listingDates:
+        dates = np.asarray( dates, dtype = 'datetime64[D]' )
+        for i, s in enumerate( symbols ):
+            if s in listingDates:
+                available[i] &= dates >= np.datetime64( str( listingDates[s] )[:10], 'D' )
+    return available
+
+
+def fromPanel( panel, listingDates = None, symbols = None ):
+    # Universe of a Zipline data panel (items are symbols)
+    if symbols is None:
+        symbols = [str( s ) for s in panel.items]
+    dates = np.asarray( [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis], dtype = 'datetime64[D]' )
+    closePrices = features.panelPrices( panel, 'close', symbols )
+    return Universe( symbols, dates, availability( closePrices, dates, symbols, listingDates ) )
@@ -0,0 +1,108 @@
+# GMRE Library - Ranking Variant Matrix
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Port of the research matrix of gmre-quandl.jl: every volatility mode
+# x performance mode ranking of a basket, for every bar, in one pass
+# instead of 12 volatility/performance/rank_basket calls.
+#
+#   volatility  SLIDING  - mean of every window volatility in the lookback
+#               GROUPING - mean of the windows every stride bars
+#               ALL      - one volatility over the whole lookback
+#   performance OPEN      - first open to last open of the lookback
+#               CLOSE     - first close to last close
+#               OPENCLOSE - first open to last close
+#               CLOSEOPEN - first close to last open
+#
+# The RS terms are computed once and the three volatility modes come
+# from their running sums (gmrelib.rolling); the four performance modes
+# share the two begin and two end price slices.  Windows are in bars
+# (GMRE's 20 of 63), not Julia's calendar days.
+#
+# Ranks are rank_basket's: performance and volatility normalized over
+# the basket, combined 0.7/0.3 with the volatility weights (EDV 0.5)
+# and the ranks normalized to [0..1].  The volatility is inverted as in
+# gmrelib.ranking so a low volatility ranks high (the Julia code has
+# both versions, the inverted one commented out).  NaN metrics are left
+# out of the basket min/max and get a NaN rank.
+#
+#   performance, volatility = variantMetrics( O, C, H, L )  # 4|3 x bars x symbols
+#   ranks = rankVariants( performance, volatility )         # 3 x 4 x bars x symbols
+#   ranks[:, :, -1]                                         # 3 x 4 x symbols of the last bar
+
+import warnings
+
+import numpy as np
+
+from gmrelib import rolling
+from gmrelib.volatility import asPrices
+
+VOLATILITY_MODES = ['SLIDING', 'GROUPING', 'ALL']
+PERFORMANCE_MODES = ['OPEN', 'CLOSE', 'OPENCLOSE', 'CLOSEOPEN']
+
+# (begin, end) price of each performance mode, 0 open, 1 close
+PERFORMANCE_PRICES = [( 0, 0 ), ( 1, 1 ), ( 0, 1 ), ( 1, 0 )]
+
+
+def variantMetrics( openPrices, closePrices, highPrices, lowPrices, window = 20, lookback = 63, stride = None, blocks = None ):
+    # Prices are symbols x bars.  Returns performance (4 x bars x symbols)
+    # and volatility (3 x bars x symbols), NaN until lookback bars
+    O = asPrices( openPrices )
+    C = asPrices( closePrices )
+    symbols, bars = C.shape
+
+    sliding, grouped, whole = rolling.rollingVolatility( O, C, highPrices, lowPrices, window, lookback, stride, blocks )
+    volatility = np.stack( [sliding.T, grouped.T, whole.T] )
+
+    performance = np.nan * np.ones( ( len( PERFORMANCE_MODES ), bars, symbols ) )
+    if bars >= lookback:
+        prices = ( O, C )
+        begins = [p[:, :bars - lookback + 1] for p in prices]
+        ends = [p[:, lookback - 1:] for p in prices]
+        with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+            for m, ( b, e ) in enumerate( PERFORMANCE_PRICES ):
+                performance[m, lookback - 1:] = ( ( ends[e] - begins[b] ) / begins[b] ).T
+
+    return performance, volatility
+
+
+def normalize( values ):
+    # Min-max over the last (symbols) axis, NaN left out
+    with warnings.catch_warnings():
+        warnings.simplefilter( 'ignore', RuntimeWarning )
+        low = np.nanmin( values, axis = -1, keepdims = True )
+        high = np.nanmax( values, axis = -1, keepdims = True )
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        return ( values - low ) / ( high - low )
+
+
+def rankVariants( performance, volatility, factorPerformance = 0.7, factorVolatility = 0.3, volatilityWeights = None ):
+    # Ranks of every volatility x performance mode (3 x 4 x ... x symbols)
+    # from variantMetrics() output or one bar of it (4|3 x symbols)
+    p = normalize( np.asarray( performance, dtype = np.float64 ) )
+    v = 1 - normalize( np.asarray( volatility, dtype = np.float64 ) )
+
+    if volatilityWeights is not None:
+        v = v * np.asarray( volatilityWeights, dtype = np.float64 )
+
+    ranks = ( p * factorPerformance )[np.newaxis] + ( v * factorVolatility )[:, np.newaxis]
+    return normalize( ranks )
+
+
+def bestVariants( ranks ):
+    # Index of the best symbol of every variant (-1 when none is ranked)
+    ranked = ~np.isnan( ranks )
+    best = np.argmax( np.where( ranked, ranks, -np.inf ), axis = -1 )
+    return np.where( ranked.any( axis = -1 ), best, -1 )
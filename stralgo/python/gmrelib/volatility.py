@@ -0,0 +1,203 @@
+# GMRE Library - Volatility Estimators
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Vectorized volatility estimators over whole OHLC arrays.  Prices may
+# be 1-D (bars) or 2-D (symbols x bars); bars are always the LAST axis.
+#
+# Estimators are registered by name so a strategy selects one with a
+# config string (e.g. self.algoVolatility = 'RS'):
+#   RS - Rogers and Satchell (1991)
+#   GK - Garman and Klass (1980)
+#   PA - Parkinson (1980)
+#   DV - Classical daily volatility (H - L) / (H + L)
+#   YZ - Yang and Zhang (2000)
+# http://www.tsresearch.com/public/volatility/historical/
+#
+# An estimator takes (open, close, high, low) arrays and returns the
+# per-bar (daily) volatility over all the bars it was given, one value
+# per symbol.  RS, GK, PA and DV are sqrt(mean(per-bar variance)) so a
+# single bar gives the same 'daily' value as getVolatility in
+# gmre-minute.py.  registerEstimator() adds new ones.
+#
+# rsVolatility() reproduces the per-bar loop used by GMRE.rsVolatility
+# to within the last bit of np.log against math.log:
+#   - the per-bar terms are summed sequentially (cumsum) rather than
+#     with NumPy's pairwise sum, matching Python's sum() ordering.
+#   - the annualization uses integer division 252 // period, which is
+#     what math.sqrt(252 / period) evaluated to under Python 2.
+
+import math
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def asPrices( prices ):
+    # Accept lists, pandas Series/DataFrame values or ndarrays
+    return np.asarray( prices, dtype = np.float64 )
+
+
+def rsTerms( openPrices, closePrices, highPrices, lowPrices ):
+    # Per-bar Rogers and Satchell terms: ln(H/C)ln(H/O) + ln(L/C)ln(L/O)
+    O = asPrices( openPrices )
+    C = asPrices( closePrices )
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        a = np.log( H / C )
+        b = np.log( H / O )
+        c = np.log( L / C )
+        d = np.log( L / O )
+
+    return a * b + c * d
+
+
+def gkTerms( openPrices, closePrices, highPrices, lowPrices ):
+    # Per-bar Garman and Klass terms
+    O = asPrices( openPrices )
+    C = asPrices( closePrices )
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        a = 0.511 * np.log( H / L ) ** 2
+        b = 0.019 * np.log( C / O ) * np.log( ( H * L ) / O ** 2 )
+        c = 2.0 * np.log( H / O ) * np.log( L / O )
+
+    return a - b - c
+
+
+def paTerms( openPrices, closePrices, highPrices, lowPrices ):
+    # Per-bar Parkinson terms
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        return ( 1 / ( 4 * math.log( 2 ) ) ) * np.log( H / L ) ** 2
+
+
+def dvTerms( openPrices, closePrices, highPrices, lowPrices ):
+    # Per-bar classical daily volatility, squared
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    return ( ( H - L ) / ( H + L ) ) ** 2
+
+
+def sequentialSum( values ):
+    # Left to right sum over the last axis (same ordering as sum())
+    if values.shape[-1] == 0:
+        return np.zeros( values.shape[:-1] )
+    return np.cumsum( values, axis = -1 )[..., -1]
+
+
+def termEstimator( terms ):
+    # Build an estimator from a per-bar variance function
+    def estimator( openPrices, closePrices, highPrices, lowPrices ):
+        r = terms( openPrices, closePrices, highPrices, lowPrices )
+        with np.errstate( invalid = 'ignore' ):
+            return np.sqrt( sequentialSum( r ) / r.shape[-1] )
+
+    return estimator
+
+
+def yzEstimator( openPrices, closePrices, highPrices, lowPrices ):
+    # Yang and Zhang (2000).  The first bar only supplies the previous
+    # close for the overnight return so n bars give n - 1 observations.
+    O = asPrices( openPrices )
+    C = asPrices( closePrices )
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    n = O.shape[-1] - 1
+    if n < 2:
+        return np.nan * np.ones( O.shape[:-1] )
+
+    with np.errstate( invalid = 'ignore', divide = 'ignore' ):
+        overnight = np.log( O[..., 1:] / C[..., :-1] )
+        openClose = np.log( C[..., 1:] / O[..., 1:] )
+        rs = rsTerms( O[..., 1:], C[..., 1:], H[..., 1:], L[..., 1:] )
+
+        k = 0.34 / ( 1.34 + ( n + 1.0 ) / ( n - 1.0 ) )
+        variance = overnight.var( axis = -1, ddof = 1 ) + k * openClose.var( axis = -1, ddof = 1 ) + ( 1 - k ) * rs.mean( axis = -1 )
+
+        return np.sqrt( variance )
+
+
+ESTIMATORS = {}
+
+
+def registerEstimator( name, estimator ):
+    ESTIMATORS[name.upper()] = estimator
+
+
+def getEstimator( name ):
+    try:
+        return ESTIMATORS[name.upper()]
+    except KeyError:
+        raise ValueError( 'Unknown volatility estimator %s (%s)' % ( name, '|'.join( sorted( ESTIMATORS ) ) ) )
+
+
+registerEstimator( 'RS', termEstimator( rsTerms ) )
+registerEstimator( 'GK', termEstimator( gkTerms ) )
+registerEstimator( 'PA', termEstimator( paTerms ) )
+registerEstimator( 'DV', termEstimator( dvTerms ) )
+registerEstimator( 'YZ', yzEstimator )
+
+
+def estimateVolatility( algo, period, openPrices, closePrices, highPrices, lowPrices ):
+    # Estimator 'algo' over the first 'period' bars of each row, scaled by
+    # the square root of the number of trading days in a year over the
+    # period.  Returns a float for 1-D input or an array for 2-D.
+    estimator = getEstimator( algo )
+    vol = estimator( asPrices( openPrices )[..., :period], asPrices( closePrices )[..., :period],
+                     asPrices( highPrices )[..., :period], asPrices( lowPrices )[..., :period] )
+    vol = vol * math.sqrt( TRADING_DAYS // period )
+
+    if np.ndim( vol ) == 0:
+        return float( vol )
+    return vol
+
+
+def rsVolatility( period, openPrices, closePrices, highPrices, lowPrices ):
+    # Rogers and Satchell (1991)
+    return estimateVolatility( 'RS', period, openPrices, closePrices, highPrices, lowPrices )
+
+
+def blockVolatility( algo, metricPeriod, periodVolatility, openPrices, closePrices, highPrices, lowPrices ):
+    # Mean of the (periodVolatility - 1) bar volatilities taken from
+    # consecutive periodVolatility blocks starting metricPeriod bars back.
+    # This is the volatility half of GMRE.getStockMetrics for a basket.
+    O = asPrices( openPrices )
+    C = asPrices( closePrices )
+    H = asPrices( highPrices )
+    L = asPrices( lowPrices )
+
+    volDays = periodVolatility - 1
+    periodRange = metricPeriod // volDays
+
+    total = 0
+    for i in range( -periodRange, 0 ):
+        x = i * periodVolatility
+        y = x + volDays
+        total = total + estimateVolatility( algo, volDays, O[..., x:y], C[..., x:y], H[..., x:y], L[..., x:y] )
+
+    return total / periodRange
+
+
+def rsBlockVolatility( metricPeriod, periodVolatility, openPrices, closePrices, highPrices, lowPrices ):
+    return blockVolatility( 'RS', metricPeriod, periodVolatility, openPrices, closePrices, highPrices, lowPrices )
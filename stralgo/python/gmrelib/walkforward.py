@@ -0,0 +1,180 @@
+# GMRE Library - Walk-Forward Optimization
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Re-fits the GMRE ranking parameters (factorPerformance,
+# factorVolatility, metricPeriod) over time instead of keeping the
+# published 0.7/0.3 and 63/21 day settings.  The history is split into
+# rolling folds of inSample days followed by outSample days; each fold
+# picks the best in-sample CAGR of the grid with the fast path
+# (gmrelib.backtest) and then runs the winner out-of-sample.
+#
+# The features of every metricPeriod of the grid are computed once over
+# the whole history (or opened from a gmrelib.features store) and
+# sliced per fold; a feature row only depends on its trailing window so
+# a slice equals the features of that fold's bars.  The folds run in
+# parallel with gmrelib.sweep.
+#
+# With listingDates a stock is only ranked once it has metricPeriod bars
+# since its listing, as in gmrelib.backtest.backtestPanel.
+#
+# The out-of-sample runner is outOfSample(params, fold, data) returning
+# a dict of results; by default the fast path, zipline/walkforward.py
+# runs GMRE itself.
+
+import numpy as np
+
+from gmrelib import backtest
+from gmrelib import features
+from gmrelib import sweep
+from gmrelib import universe
+
+# Parameters fitted in-sample
+FITTED = ['factorPerformance', 'factorVolatility', 'metricPeriod']
+
+
+def splitFolds( days, inSample, outSample, step = None ):
+    # Rolling [inStart, inEnd) in-sample and [outStart, outEnd) out-of-
+    # sample day ranges; folds advance by 'step' days (default outSample)
+    if step is None:
+        step = outSample
+
+    folds = []
+    start = 0
+    while start + inSample < days:
+        outStart = start + inSample
+        folds.append( {
+            'fold': len( folds ),
+            'inStart': start,
+            'inEnd': outStart,
+            'outStart': outStart,
+            'outEnd': min( outStart + outSample, days ),
+        } )
+        start += step
+
+    return folds
+
+
+def featureCache( panel, stocks, metricPeriods, periodVolatility, algoVolatility = 'RS', featureRoot = None, adjusted = True ):
+    # metricPeriod -> (performance, volatility) dates x stocks
+    cache = {}
+    prices = None
+    for metricPeriod in sorted( set( metricPeriods ) ):
+        if featureRoot is not None:
+            store = features.openFeatures( featureRoot, panel, metricPeriod, periodVolatility, algoVolatility, adjusted )
+            cols = store.columns( stocks )
+            cache[metricPeriod] = ( np.asarray( store.performance[:, cols] ), np.asarray( store.volatility[:, cols] ) )
+        else:
+            if prices is None:
+                prices = [features.panelPrices( panel, field, stocks ) for field in features.FIELDS]
+            cache[metricPeriod] = features.computeFeatures( *( prices + [metricPeriod, periodVolatility, algoVolatility] ) )
+
+    return cache
+
+
+def backtestDays( params, data, start, end ):
+    # Fast path over days [start, end) with the cached features
+    metricPeriod = params['metricPeriod']
+    performance, volatility = data['features'][metricPeriod]
+
+    # Rank from the first day with a full window of history
+    firstDay = max( metricPeriod - 1 - start, 0 )
+
+    live = None
+    if data['live'] is not None:
+        live = data['live'][metricPeriod][start:end]
+
+    return backtest.runBacktest( data['dates'][start:end], data['close'][:, start:end], data['volume'][:, start:end],
+                                 performance[start:end], volatility[start:end], params['factorPerformance'],
+                                 params['factorVolatility'], metricPeriod, volatilityWeights = data['volatilityWeights'],
+                                 firstDay = firstDay, live = live, **data['fills'] )
+
+
+def fitInSample( fold, data ):
+    # Best in-sample grid point by CAGR (first one on ties)
+    best = None
+    bestCagr = None
+    for params in data['grid']:
+        growth = backtestDays( params, data, fold['inStart'], fold['inEnd'] )['cagr']
+        if bestCagr is None or growth > bestCagr:
+            best = params
+            bestCagr = growth
+
+    return best, bestCagr
+
+
+def fastOutOfSample( params, fold, data ):
+    result = backtestDays( params, data, fold['outStart'], fold['outEnd'] )
+    return {
+        'cagr': result['cagr'],
+        'portfolioValue': result['portfolioValue'][-1],
+        'buyCount': result['buyCount'],
+        'sellCount': result['sellCount'],
+    }
+
+
+def runFold( fold, data ):
+    # gmrelib.sweep runner: one fold's fit and out-of-sample run
+    params, inSampleCagr = fitInSample( fold, data )
+
+    results = dict( params )
+    results['inSampleCagr'] = inSampleCagr
+    results['inStartDate'] = str( data['dates'][fold['inStart']] )
+    results['outStartDate'] = str( data['dates'][fold['outStart']] )
+    results['outEndDate'] = str( data['dates'][fold['outEnd'] - 1] )
+
+    outOfSample = data['outOfSample']( params, fold, data )
+    for name in outOfSample:
+        results['out' + name[0].upper() + name[1:]] = outOfSample[name]
+
+    return results
+
+
+def walkForward( panel, stocks, grid, inSample, outSample, step = None, periodVolatility = 21, algoVolatility = 'RS',
+                 volatilityWeights = None, outOfSample = None, featureRoot = None, processes = None, adjusted = True,
+                 listingDates = None, **fills ):
+    # Returns one row per fold: the fold dates, fitted parameters,
+    # in-sample CAGR and the out-of-sample results prefixed with 'out'
+    if isinstance( grid, dict ):
+        grid = sweep.expandGrid( grid )
+    if isinstance( volatilityWeights, dict ):
+        volatilityWeights = [volatilityWeights.get( s, 1.0 ) for s in stocks]
+
+    dates = np.asarray( [d.strftime( '%Y-%m-%d' ) for d in panel.major_axis], dtype = 'datetime64[D]' )
+
+    closePrices = features.panelPrices( panel, 'close', stocks )
+
+    # metricPeriod -> dates x stocks live masks with listingDates (gmrelib.universe)
+    live = None
+    if listingDates is not None:
+        listed = universe.Universe( stocks, dates, universe.availability( closePrices, dates, stocks, listingDates ) )
+        live = dict( ( p['metricPeriod'], listed.liveMasks( p['metricPeriod'] ) ) for p in grid )
+
+    data = {
+        'panel': panel,
+        'stocks': stocks,
+        'grid': grid,
+        'dates': dates,
+        'close': closePrices,
+        'live': live,
+        'volume': features.panelPrices( panel, 'volume', stocks ),
+        'features': featureCache( panel, stocks, [p['metricPeriod'] for p in grid], periodVolatility, algoVolatility, featureRoot,
+                                  adjusted ),
+        'volatilityWeights': volatilityWeights,
+        'fills': fills,
+        'outOfSample': fastOutOfSample if outOfSample is None else outOfSample,
+    }
+
+    return sweep.runSweep( runFold, splitFolds( len( dates ), inSample, outSample, step ), data, processes = processes )
@@ -0,0 +1,77 @@
+# GMRE Library - Bar Store Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import numpy as np
+import pandas
+import pytz
+
+from gmrelib import barstore
+from gmrelib import synthetic
+
+
+def barsFrame( days, seed ):
+    dates, bars = synthetic.dailyBars( 1, days, seed = seed )
+    index = pandas.DatetimeIndex( dates.astype( 'datetime64[ns]' ) ).tz_localize( pytz.utc )
+    columns = dict( ( f, bars[f][0] ) for f in synthetic.FIELDS )
+    columns['price'] = bars['close'][0] * 0.9
+    return pandas.DataFrame( columns, index = index, columns = barstore.COLUMNS )
+
+
+def test_round_trip( tmp_path ):
+    root = str( tmp_path )
+    frame = barsFrame( 120, 8 )
+    start, end = frame.index[0].to_pydatetime(), frame.index[-1].to_pydatetime()
+
+    store = barstore.BarStore( root )
+    store.ingest( 'MDY', frame, start, end, True )
+    loaded = barstore.BarStore( root ).load( 'MDY', start, end, True )
+
+    pandas.testing.assert_frame_equal( loaded, frame, check_freq = False )
+    assert store.coverage( 'MDY', True ) == ( str( start )[:10], str( end )[:10] )
+    assert store.coverage( 'MDY', False ) is None
+
+
+def test_same_bars_same_object( tmp_path ):
+    root = str( tmp_path )
+    frame = barsFrame( 60, 9 )
+    start, end = frame.index[0].to_pydatetime(), frame.index[-1].to_pydatetime()
+
+    store = barstore.BarStore( root )
+    store.ingest( 'MDY', frame, start, end, True )
+    first = store.manifest[barstore.storeKey( 'MDY', True )]['object']
+    store.ingest( 'MDY', frame, start, end, True )
+
+    assert store.manifest[barstore.storeKey( 'MDY', True )]['object'] == first
+    assert os.listdir( os.path.join( root, 'objects' ) ) == [first + '.npz']
+
+
+def test_merge_replaces_overlapping_days( tmp_path ):
+    root = str( tmp_path )
+    frame = barsFrame( 100, 10 )
+    older, newer = frame.iloc[:70], frame.iloc[50:].copy()
+    newer['close'] *= 2
+
+    store = barstore.BarStore( root )
+    store.ingest( 'EDV', older, older.index[0].to_pydatetime(), older.index[-1].to_pydatetime(), True )
+    store.ingest( 'EDV', newer, newer.index[0].to_pydatetime(), newer.index[-1].to_pydatetime(), True )
+
+    loaded = store.load( 'EDV', frame.index[0].to_pydatetime(), frame.index[-1].to_pydatetime(), True )
+    assert len( loaded ) == 100
+    assert np.array_equal( loaded['close'].values[:50], frame['close'].values[:50] )
+    assert np.array_equal( loaded['close'].values[50:], newer['close'].values )
+    # The superseded object is removed with the manifest save
+    assert len( os.listdir( os.path.join( root, 'objects' ) ) ) == 1
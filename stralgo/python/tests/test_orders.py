@@ -0,0 +1,98 @@
+# GMRE Library - Order Manager Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gmrelib import orders
+
+
+class Order( object ):
+
+    def __init__( self, sid, amount ):
+        self.sid = sid
+        self.amount = amount
+        self.filled = 0
+
+
+class Blotter( object ):
+
+    def __init__( self ):
+        self.orders = {}
+
+    def order( self, sid, amount ):
+        oid = len( self.orders )
+        self.orders[oid] = Order( sid, amount )
+        return oid
+
+    def fill( self, oid ):
+        self.orders[oid].filled = self.orders[oid].amount
+
+
+def test_group_calls_back_once_all_filled():
+    blotter = Blotter()
+    manager = orders.OrderManager( lambda oid: blotter.orders[oid] )
+    calls = []
+
+    sells = [manager.submit( blotter.order( 'MDY', -10 ), lambda oid, o, *args: calls.append( ( 'sold', o.sid ) ) ),
+             manager.submit( blotter.order( 'EDV', -5 ) )]
+    manager.whenFilled( sells, lambda *args: calls.append( ( 'group', args ) ) )
+
+    assert manager.update( 'data', '2011-01-03' ) == []
+    assert manager.busy()
+
+    blotter.fill( sells[0] )
+    assert manager.update( 'data', '2011-01-04' ) == [sells[0]]
+    assert calls == [( 'sold', 'MDY' )]
+    assert manager.busy()
+
+    blotter.fill( sells[1] )
+    assert manager.update( 'data', '2011-01-05' ) == [sells[1]]
+    assert calls == [( 'sold', 'MDY' ), ( 'group', ( 'data', '2011-01-05' ) )]
+    assert not manager.busy()
+
+    # Called once
+    manager.update( 'data', '2011-01-06' )
+    assert len( calls ) == 2
+
+
+def test_orders_submitted_by_callbacks_wait_for_next_update():
+    blotter = Blotter()
+    manager = orders.OrderManager( lambda oid: blotter.orders[oid] )
+    buys = []
+
+    def buy( *args ):
+        oid = blotter.order( 'SHY', 7 )
+        blotter.fill( oid )  # Already filled, but only checked next bar
+        buys.append( manager.submit( oid ) )
+
+    sell = manager.submit( blotter.order( 'MDY', -10 ) )
+    manager.whenFilled( [sell], buy )
+    blotter.fill( sell )
+
+    assert manager.update() == [sell]
+    assert manager.openOrders() == buys
+    assert manager.update() == buys
+    assert not manager.busy()
+
+
+def test_empty_group_and_missing_orders():
+    blotter = Blotter()
+    manager = orders.OrderManager( lambda oid: blotter.orders[oid] )
+    calls = []
+
+    assert manager.submit( None ) is None
+    manager.whenFilled( [None], lambda *args: calls.append( args ) )
+    assert manager.busy()
+    manager.update( 1 )
+    assert calls == [( 1, )]
+    assert not manager.busy()
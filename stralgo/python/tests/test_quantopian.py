@@ -0,0 +1,206 @@
+# GMRE Library - Quantopian Mirror Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ABOUT:
+# Quantopian can't import gmrelib, so gmre/quantopian/gmre.py and
+# gmre-minute.py inline the parts they use.  These run the inlined
+# copies and gmrelib side by side on the same synthetic bars.
+
+import os
+
+import numpy as np
+import pandas
+import pytest
+
+from gmrelib import orders
+from gmrelib import profiling
+from gmrelib import resample
+from gmrelib import ringbuffer
+from gmrelib import synthetic
+from gmrelib import volatility
+
+quantopianPath = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), '..', 'gmre', 'quantopian' )
+
+
+def loadScript( name ):
+    # The script with the two Quantopian names its module level needs,
+    # as gmre/zipline/benchmark.py loads gmre-minute.py
+    path = os.path.join( quantopianPath, name )
+    namespace = {
+        '__name__': os.path.splitext( name )[0],
+        'batch_transform': lambda **kwargs: ( lambda function: function ),
+        'log': None,
+    }
+    with open( path ) as f:
+        exec( compile( f.read(), path, 'exec' ), namespace )
+    return namespace
+
+
+@pytest.fixture( scope = 'module', params = ['gmre.py', 'gmre-minute.py'] )
+def scripts( request ):
+    return loadScript( request.param )
+
+
+@pytest.fixture( scope = 'module' )
+def minuteScript():
+    return loadScript( 'gmre-minute.py' )
+
+
+class Order( object ):
+
+    def __init__( self, sid, amount ):
+        self.sid = sid
+        self.amount = amount
+        self.filled = 0
+
+
+def orderEvents( OrderManager ):
+    # Callbacks and busy() of one rotation: two sells, then the buys
+    # submitted by the group callback
+    blotter = {}
+    events = []
+    manager = OrderManager( lambda oid: blotter[oid] )
+
+    def order( sid, amount ):
+        oid = len( blotter )
+        blotter[oid] = Order( sid, amount )
+        return oid
+
+    def filled( oid, o, *args ):
+        events.append( ( 'filled', o.sid ) + args )
+
+    def sold( *args ):
+        events.append( ( 'sold', ) + args )
+        manager.submit( order( 'SHY', 3 ), filled )
+        manager.submit( order( 'EDV', 4 ), filled )
+
+    sells = [manager.submit( order( 'MDY', -10 ), filled ), manager.submit( order( 'IEV', -5 ) ), None]
+    manager.whenFilled( sells, sold )
+
+    for bar in range( 6 ):
+        if bar < len( blotter ):
+            blotter[bar].filled = blotter[bar].amount
+        manager.update( 'data', bar )
+        events.append( ( 'busy', manager.busy() ) )
+
+    return events
+
+
+def test_OrderManager( scripts ):
+    assert orderEvents( scripts['OrderManager'] ) == orderEvents( orders.OrderManager )
+
+
+def test_PhaseProfiler( scripts ):
+    def rank( x ):
+        return x * 2
+
+    def fail():
+        raise ValueError( 'no bars' )
+
+    mirror = scripts['PhaseProfiler']()
+    names = {'rank': rank, 'fail': fail}
+    mirror.instrument( names, {'rank': 'ranking', 'fail': 'orders'} )
+
+    profiler = profiling.PhaseProfiler()
+    timedRank = profiler.timed( 'ranking', rank )
+    timedFail = profiler.timed( 'orders', fail )
+
+    for x in range( 5 ):
+        assert names['rank']( x ) == timedRank( x ) == rank( x )
+    for timed in ( names['fail'], timedFail ):
+        with pytest.raises( ValueError ):
+            timed()
+
+    for phase in ( 'ranking', 'orders' ):
+        calls, total, buckets = mirror.phases[phase]
+        assert calls == profiler.phases[phase].calls
+        assert sum( buckets ) == calls
+    assert len( mirror.report() ) == 2
+
+
+def test_rsVolatility():
+    script = loadScript( 'gmre.py' )
+    dates, bars = synthetic.dailyBars( 5, 63, seed = 12 )
+    for period in ( 5, 20, 63 ):
+        for s in range( 5 ):
+            prices = [bars[f][s] for f in ( 'open', 'close', 'high', 'low' )]
+            assert script['rsVolatility']( period, *prices ) == volatility.rsVolatility( period, *prices )
+
+
+def test_RingBuffer( minuteScript ):
+    mirror = minuteScript['RingBuffer']( 4, ( 3, 5 ) )
+    buffer = ringbuffer.RingBuffer( 4, ( 3, 5 ) )
+    rng = np.random.RandomState( 13 )
+
+    assert np.array_equal( mirror.window(), buffer.window() )
+    for i in range( 11 ):
+        row = rng.normal( size = ( 3, 5 ) )
+        mirror.push( row )
+        buffer.push( row )
+        assert len( mirror ) == len( buffer )
+        for n in ( None, 1, 3, 6 ):
+            assert np.array_equal( mirror.window( n ), buffer.window( n ) )
+    assert minuteScript['OHLCV'] == ringbuffer.OHLCV
+
+
+def test_estimators( minuteScript ):
+    dates, bars = synthetic.dailyBars( 6, 63, seed = 14 )
+    prices = dict( ( f, bars[f] ) for f in ( 'open', 'close', 'high', 'low' ) )
+    single = [prices[f][..., np.newaxis] for f in ( 'open', 'close', 'high', 'low' )]
+
+    class Context( object ):
+        pass
+
+    context = Context()
+    for name in ( 'RS', 'GK', 'PA', 'DV' ):
+        # A one bar estimate is the 'daily' volatility of the bar
+        context.algoVolatility = name
+        expected = volatility.getEstimator( name )( *single )
+        assert np.allclose( minuteScript['getVolatility']( context, prices ), expected, rtol = 1e-14, atol = 0 )
+
+
+def test_firstFinite( minuteScript ):
+    values = synthetic.minuteBars( 8, 390, seed = 15, nanFraction = 0.3 )['close']
+    values[2] = np.nan
+    for reverse in ( False, True ):
+        np.testing.assert_array_equal( minuteScript['firstFinite']( values, reverse ), resample.firstFinite( values, reverse ) )
+
+
+def test_basketPeriodOchlv( minuteScript ):
+    symbols = 12
+    bars = synthetic.minuteBars( symbols, 390, seed = 16, nanFraction = 0.05 )
+
+    class Security( object ):
+        def __init__( self, sid ):
+            self.sid = sid
+
+    class Context( object ):
+        pass
+
+    # Every other symbol active, as after a listing date check
+    context = Context()
+    context.sids = list( range( symbols ) )
+    context.sidIndex = dict( ( sid, i ) for i, sid in enumerate( context.sids ) )
+    context.basketStocksActive = [Security( sid ) for sid in context.sids[::2]]
+    context.logWarn = False
+    context.bars = dict( ( item, pandas.DataFrame( bars[field].T, columns = context.sids ) ) for item, field in
+                         [( 'close_price', 'close' ), ( 'high', 'high' ), ( 'low', 'low' ), ( 'volume', 'volume' )] )
+
+    day = minuteScript['basketPeriodOchlv']( context )
+
+    ochlv, nanCounts = resample.aggregateBars( bars['close'], bars['high'], bars['low'], bars['volume'] )
+    for i, field in enumerate( ringbuffer.OHLCV ):
+        np.testing.assert_array_equal( day[::2, i], ochlv[field][::2] )
+        assert np.isnan( day[1::2, i] ).all()
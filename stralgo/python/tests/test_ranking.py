@@ -0,0 +1,64 @@
+# GMRE Library - Ranking Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy as np
+
+from gmrelib import ranking
+
+
+def loopRank( stocks, performances, volatilities, factorPerformance, factorVolatility ):
+    # GMRE.getBestStock before gmrelib.ranking (EDV volatility at 50%)
+    minP, maxP = min( performances.values() ), max( performances.values() )
+    minV, maxV = min( volatilities.values() ), max( volatilities.values() )
+
+    stockRanks = {}
+    for s in stocks:
+        p = ( performances[s] - minP ) / ( maxP - minP )
+        v = ( 1 - ( volatilities[s] - minV ) / ( maxV - minV ) )
+        if math.isnan( p ) or math.isnan( v ):
+            continue
+        if s == 'EDV':
+            stockRanks[s] = ( p * factorPerformance ) + ( ( v * 0.5 ) * factorVolatility )
+        else:
+            stockRanks[s] = ( p * factorPerformance ) + ( v * factorVolatility )
+
+    return stockRanks, max( stockRanks, key = stockRanks.get )
+
+
+def test_rankBasket_matches_loop():
+    stocks = ['MDY', 'IEV', 'EEM', 'ILF', 'EPP', 'EDV', 'ZIV', 'SHY']
+    weights = [0.5 if s == 'EDV' else 1.0 for s in stocks]
+    rng = np.random.RandomState( 11 )
+    for trial in range( 50 ):
+        p = rng.normal( 0.02, 0.1, len( stocks ) )
+        v = rng.uniform( 0.05, 0.4, len( stocks ) )
+        ranks, best = ranking.rankBasket( p, v, 0.7, 0.3, weights )
+
+        expected, expectedBest = loopRank( stocks, dict( zip( stocks, p ) ), dict( zip( stocks, v ) ), 0.7, 0.3 )
+        assert stocks[best] == expectedBest
+        for i, s in enumerate( stocks ):
+            assert np.isclose( ranks[i], expected[s], rtol = 1e-12, atol = 1e-15 )
+
+
+def test_rankBasket_skips_unranked():
+    ranks, best = ranking.rankBasket( [0.1, np.nan, 0.3, 0.2], [0.2, 0.1, np.nan, 0.3], 0.7, 0.3 )
+    assert np.isnan( ranks[1] ) and np.isnan( ranks[2] )
+    assert best == 3
+    assert list( ranking.rankOrder( ranks ) ) == [3, 0]
+
+    ranks, best = ranking.rankBasket( [np.nan, np.nan], [0.1, 0.2], 0.7, 0.3 )
+    assert best is None
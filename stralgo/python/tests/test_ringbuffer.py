@@ -0,0 +1,38 @@
+# GMRE Library - Ring Buffer Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from gmrelib import ringbuffer
+
+
+def test_wraparound_windows():
+    rows = np.arange( 36, dtype = np.float64 ).reshape( 12, 3 )
+    buffer = ringbuffer.RingBuffer( 5, ( 3, ) )
+
+    for i, row in enumerate( rows ):
+        buffer.push( row )
+        held = rows[max( i - 4, 0 ):i + 1]
+        assert len( buffer ) == len( held )
+        assert buffer.full() == ( i >= 4 )
+        assert np.array_equal( buffer.window(), held )
+        assert np.array_equal( buffer.window( 2 ), held[-2:] )
+        assert np.array_equal( buffer.last(), row )
+
+    # Windows are views of the buffer, contiguous after wrapping around
+    window = buffer.window( 5 )
+    assert np.shares_memory( window, buffer.buffer )
+    assert window.flags['C_CONTIGUOUS']
+    assert np.array_equal( buffer.window( 10 ), rows[-5:] )
@@ -0,0 +1,68 @@
+# GMRE Library - Rolling Volatility Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from gmrelib import rolling
+from gmrelib import synthetic
+from gmrelib import volatility
+
+
+def windowVolatility( bars, s, end, length ):
+    # RS volatility of the length bars of symbol s ending at bar end
+    start = end - length + 1
+    return volatility.rsVolatility( length, bars['open'][s, start:end + 1], bars['close'][s, start:end + 1],
+                                    bars['high'][s, start:end + 1], bars['low'][s, start:end + 1] )
+
+
+def test_rollingVolatility_matches_windows():
+    window, lookback, stride = 20, 63, 21
+    dates, bars = synthetic.dailyBars( 3, 150, seed = 5 )
+    sliding, grouped, whole = rolling.rollingVolatility( bars['open'], bars['close'], bars['high'], bars['low'], window, lookback,
+                                                         stride )
+
+    assert np.isnan( sliding[:, :lookback - 1] ).all()
+    assert np.isnan( grouped[:, :lookback - 1] ).all()
+    assert np.isnan( whole[:, :lookback - 1] ).all()
+
+    for s in range( 3 ):
+        for end in range( lookback - 1, 150 ):
+            first = end - lookback + 1
+            windows = [windowVolatility( bars, s, w, window ) for w in range( first + window - 1, end + 1 )]
+            blocks = [windowVolatility( bars, s, first + k * stride + window - 1, window ) for k in range( 3 )]
+
+            assert np.isclose( sliding[s, end], np.mean( windows ), rtol = 1e-10 )
+            assert np.isclose( grouped[s, end], np.mean( blocks ), rtol = 1e-10 )
+            assert np.isclose( whole[s, end], windowVolatility( bars, s, end, lookback ), rtol = 1e-10 )
+
+
+def test_grouped_matches_rsBlockVolatility():
+    dates, bars = synthetic.dailyBars( 4, 100, seed = 6 )
+    sliding, grouped, whole = rolling.rollingVolatility( bars['open'], bars['close'], bars['high'], bars['low'], 20, 63, 21 )
+    blocks = volatility.rsBlockVolatility( 63, 21, bars['open'], bars['close'], bars['high'], bars['low'] )
+    assert np.allclose( grouped[:, -1], blocks, rtol = 1e-10, atol = 0 )
+
+
+def test_RollingVolatility_matches_history():
+    dates, bars = synthetic.dailyBars( 3, 90, seed = 7 )
+    sliding, grouped, whole = rolling.rollingVolatility( bars['open'], bars['close'], bars['high'], bars['low'], 20, 63, 21 )
+
+    running = rolling.RollingVolatility( 3, 20, 63, 21 )
+    for day in range( 90 ):
+        running.push( bars['open'][:, day], bars['close'][:, day], bars['high'][:, day], bars['low'][:, day] )
+        if day >= 62:
+            assert np.allclose( running.sliding(), sliding[:, day], rtol = 1e-10 )
+            assert np.allclose( running.grouped(), grouped[:, day], rtol = 1e-10 )
+            assert np.allclose( running.whole(), whole[:, day], rtol = 1e-10 )
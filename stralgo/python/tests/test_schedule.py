@@ -0,0 +1,77 @@
+# GMRE Library - Schedule Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from gmrelib import schedule
+from gmrelib import synthetic
+
+
+def loopMonths( dates ):
+    # The month check GMRE.handle_data did on every bar
+    rebalances = []
+    month = None
+    for date in dates:
+        if date[5:7] != month:
+            month = date[5:7]
+            rebalances.append( date )
+    return rebalances
+
+
+def walk( scheduler, dates ):
+    rebalances = []
+    for date in dates:
+        if scheduler.due( date ):
+            rebalances.append( date )
+            scheduler.advance( date )
+    return rebalances
+
+
+def test_month_due_matches_loop():
+    dates = [str( d ) for d in synthetic.businessDays( '2011-01-03', 400 )]
+    assert walk( schedule.Scheduler( dates, 'MONTH' ), dates ) == loopMonths( dates )
+
+
+def test_days_due_every_n():
+    dates = [str( d ) for d in synthetic.businessDays( '2011-01-03', 100 )]
+    assert walk( schedule.Scheduler( dates, 'DAYS', 21 ), dates ) == [dates[i] for i in range( 0, 100, 21 )]
+
+
+def test_due_until_advanced():
+    dates = [str( d ) for d in synthetic.businessDays( '2011-01-03', 60 )]
+    scheduler = schedule.Scheduler( dates, 'MONTH' )
+
+    assert scheduler.due( '2011-01-03' )
+    scheduler.advance( '2011-01-03' )
+    assert not scheduler.due( '2011-01-31' )
+    assert scheduler.nextDate() == '2011-02-01'
+
+    # Open orders on the rebalance day: still due on the following days
+    assert scheduler.due( '2011-02-01' )
+    assert scheduler.due( '2011-02-03' )
+    scheduler.advance( '2011-02-03' )
+    assert not scheduler.due( '2011-02-04' )
+    assert scheduler.nextDate() == '2011-03-01'
+
+
+def test_dueOn_matches_due():
+    dates = [str( d ) for d in synthetic.businessDays( '2011-01-03', 300 )]
+    scheduler = schedule.Scheduler( dates, 'MONTH_DAYS', 15 )
+    for date in dates:
+        day = datetime.datetime.strptime( date, '%Y-%m-%d' )
+        assert scheduler.dueOn( day ) == scheduler.due( date )
+        if scheduler.due( date ):
+            scheduler.advance( date )
+    assert scheduler.nextDate() is None
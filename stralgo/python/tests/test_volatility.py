@@ -0,0 +1,66 @@
+# GMRE Library - Volatility Tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy as np
+
+from gmrelib import synthetic
+from gmrelib import volatility
+
+
+def loopRsVolatility( period, openPrices, closePrices, highPrices, lowPrices ):
+    # GMRE.rsVolatility before gmrelib.volatility (252 / period was
+    # integer division under Python 2)
+    r = []
+    for i in range( 0, period ):
+        a = math.log( highPrices[i] / closePrices[i] )
+        b = math.log( highPrices[i] / openPrices[i] )
+        c = math.log( lowPrices[i] / closePrices[i] )
+        d = math.log( lowPrices[i] / openPrices[i] )
+        r.append( a * b + c * d )
+
+    return math.sqrt( sum( r ) / period ) * math.sqrt( 252 // period )
+
+
+def loopBlockVolatility( metricPeriod, periodVolatility, O, C, H, L ):
+    # GMRE.getStockMetrics volatility before gmrelib.volatility
+    volDays = periodVolatility - 1
+    periodRange = metricPeriod // volDays
+    v = []
+    for i in range( -periodRange, 0 ):
+        x = i * periodVolatility
+        y = x + volDays
+        v.append( loopRsVolatility( volDays, O[x:y], C[x:y], H[x:y], L[x:y] ) )
+    return sum( v ) / periodRange
+
+
+def test_rsVolatility_matches_loop():
+    dates, bars = synthetic.dailyBars( 6, 120, seed = 3 )
+    for period in ( 1, 5, 20, 63 ):
+        vols = volatility.rsVolatility( period, bars['open'], bars['close'], bars['high'], bars['low'] )
+        for s in range( 6 ):
+            expected = loopRsVolatility( period, bars['open'][s], bars['close'][s], bars['high'][s], bars['low'][s] )
+            # np.log and math.log may round the last bit differently
+            assert np.isclose( vols[s], expected, rtol = 1e-15, atol = 0 )
+            assert volatility.rsVolatility( period, bars['open'][s], bars['close'][s], bars['high'][s], bars['low'][s] ) == vols[s]
+
+
+def test_rsBlockVolatility_matches_loop():
+    dates, bars = synthetic.dailyBars( 6, 63, seed = 4 )
+    vols = volatility.rsBlockVolatility( 63, 21, bars['open'], bars['close'], bars['high'], bars['low'] )
+    for s in range( 6 ):
+        expected = loopBlockVolatility( 63, 21, bars['open'][s], bars['close'][s], bars['high'][s], bars['low'][s] )
+        assert np.isclose( vols[s], expected, rtol = 1e-14, atol = 0 )